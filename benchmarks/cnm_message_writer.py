@@ -0,0 +1,122 @@
+"""Micro-benchmark: CNM message serialization with json.dumps of the whole message vs the
+pre-serialized template.
+
+Messages are written for a page of granules (the sample granules repeated, with s3 urls
+added) with the test message config and a cumulus collection config, whose files list
+is padded to --collection-files entries since real collection configs list more files than
+the test one.  The template writer is run with json, and with orjson if it's installed.
+
+    poetry run python benchmarks/cnm_message_writer.py [--page-size 2000] [--repeat 5]
+"""
+
+import argparse
+import copy
+import json
+import time
+
+from podaac.hitide_backfill_tool import cnm_message_writer
+from podaac.hitide_backfill_tool.cmr.cmr_granule import CmrGranule
+from podaac.hitide_backfill_tool.cnm_message_writer import CnmMessageWriter
+from podaac.hitide_backfill_tool.config import get_message_config
+from podaac.hitide_backfill_tool.file_util import load_json_file, make_absolute
+
+from granule_record import with_cloud_urls  # pylint: disable=import-error,wrong-import-order
+
+
+class DumpsMessageWriter(CnmMessageWriter):
+    """The previous writer: a copy of the template with the granule's fields added, passed
+    whole to json.dumps"""
+
+    # pylint: disable=too-few-public-methods
+
+    def write(self, granule, needs_footprint, needs_image, needs_dmrpp, skip_cmr_opendap_update):
+        """Return a CNM message string given granule information."""
+        message = dict(self.template)
+        s3_info = granule.s3_bucket_info()
+        message["payload"] = {
+            "granules": [{
+                "cmrConceptId": granule.concept_id(),
+                "granuleId": granule.native_id(),
+                "dataType": self.collection_name,
+                "files": [{
+                    "bucket": s3_info["bucket"],
+                    "key": s3_info["key"],
+                    "fileName": s3_info["filename"],
+                    "type": "data",
+                    "size": granule.size(s3_info["filename"])
+                }]
+            }]
+        }
+        message["forge"] = needs_footprint
+        message["tig"] = needs_image
+        message["dmrpp"] = needs_dmrpp
+        message["skip_cmr_opendap_update"] = skip_cmr_opendap_update
+        message["cli_params"] = {
+            "uuid": self.cli_execution_id,
+            "collection_short_name": self.collection_name,
+            "collection_version": self.collection_version,
+            "provider": self.provider,
+            "cmr_search_start": self.search_start,
+            "cmr_search_end": self.search_end,
+            "granule_start": granule.start_date(),
+            "granule_end": granule.end_date(),
+            "username": self.user
+        }
+        return json.dumps(message)
+
+
+def collection_config_with_files(file_count):
+    """Returns the test collection config with its files list repeated to file_count entries"""
+    config = load_json_file(
+        "../tests/resources/cumulus_configurations/uat/MODIS_A-JPL-L2P-v2019.0.json",
+        relative_to=__file__)
+    files = config["files"]
+    config["files"] = [copy.deepcopy(files[i % len(files)]) for i in range(file_count)]
+    return config
+
+
+def run(writer, granules, repeat):
+    """Returns messages per second and the message size writing a message per granule"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for granule in granules:
+            message = writer.write(granule, True, False, False, True)
+    return len(granules) * repeat / (time.perf_counter() - start), len(message)
+
+
+def main():
+    """Print messages/s for the previous writer and the template writer"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--collection-files", type=int, default=20)
+    args = parser.parse_args()
+
+    items = load_json_file("../tests/resources/sample_granules_1.json",
+                           relative_to=__file__)["items"]
+    granules = [CmrGranule(with_cloud_urls(copy.deepcopy(items[i % len(items)])))
+                for i in range(args.page_size)]
+    message_config = get_message_config(
+        "uat",
+        make_absolute("../tests/resources/default_message_config.json", relative_to=__file__))
+
+    def writer(writer_class):
+        return writer_class(message_config, collection_config_with_files(args.collection_files),
+                            "2020-01-01", "2020-12-31", "POCLOUD", "benchmark", "tester")
+
+    rate, size = run(writer(DumpsMessageWriter), granules, args.repeat)
+    print(f"json.dumps message:  {rate:>10,.0f} messages/s  ({size:,} bytes)")
+
+    orjson = cnm_message_writer.orjson
+    cnm_message_writer.orjson = None
+    rate, size = run(writer(CnmMessageWriter), granules, args.repeat)
+    print(f"template (json):     {rate:>10,.0f} messages/s  ({size:,} bytes)")
+    cnm_message_writer.orjson = orjson
+
+    if orjson is not None:
+        rate, size = run(writer(CnmMessageWriter), granules, args.repeat)
+        print(f"template (orjson):   {rate:>10,.0f} messages/s  ({size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
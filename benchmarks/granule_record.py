@@ -0,0 +1,167 @@
+"""Micro-benchmark: CmrGranule accessors backed by GranuleRecord vs walking the UMM dict.
+
+A page of granules (the sample granules repeated, with s3 and OpenDAP urls added) is analyzed with the accessor calls the
+Backfiller makes for each granule, once with the previous accessors that walk the umm_json
+dict on every call, and once with CmrGranule, which extracts a GranuleRecord up front.
+
+    poetry run python benchmarks/granule_record.py [--page-size 2000] [--repeat 20]
+"""
+
+import argparse
+import copy
+import time
+from urllib.parse import urlparse
+
+from podaac.hitide_backfill_tool.cmr.cmr_granule import CmrGranule
+from podaac.hitide_backfill_tool.file_util import load_json_file
+
+# pylint: disable=broad-except
+
+
+class WalkingGranule:
+    """The previous accessors, each walking the umm_json granule when called"""
+
+    def __init__(self, umm_granule, footprint_geometries=None):
+        self.umm_granule = umm_granule
+        self.footprint_geometries = footprint_geometries or ["GPolygons", "Lines"]
+
+    def has_footprint(self):
+        """Returns True if granule has footprint"""
+        try:
+            geometries = self.umm_granule["umm"]["SpatialExtent"]["HorizontalSpatialDomain"]["Geometry"]  # pylint: disable=line-too-long
+            for name in geometries:
+                geometry = geometries[name]
+                if name in self.footprint_geometries and isinstance(geometry, list) and len(geometry) > 0:  # pylint: disable=line-too-long
+                    return True
+        except Exception:
+            pass
+        return False
+
+    def has_footprint_and_bbox(self):
+        """Returns True if granule has footprint and bounding rectangle"""
+        try:
+            geometries = self.umm_granule["umm"]["SpatialExtent"]["HorizontalSpatialDomain"]["Geometry"]  # pylint: disable=line-too-long
+            if 'BoundingRectangles' in geometries:
+                return self.has_footprint()
+        except Exception:
+            pass
+        return False
+
+    def has_image(self):
+        """Returns True if the granule has a thumbnail image link"""
+        try:
+            for url in self.umm_granule["umm"]["RelatedUrls"]:
+                if url["Type"] == "GET RELATED VISUALIZATION":
+                    return True
+        except Exception:
+            pass
+        return False
+
+    def s3_url(self):
+        """Returns the s3 url"""
+        try:
+            for url in self.umm_granule["umm"]["RelatedUrls"]:
+                if url["Type"] == "GET DATA VIA DIRECT ACCESS" and "s3://" in url["URL"]:
+                    return url["URL"]
+        except Exception:
+            pass
+        return None
+
+    def opendap_url(self):
+        """Returns the OpenDAP url"""
+        try:
+            for url in self.umm_granule["umm"]["RelatedUrls"]:
+                if "Subtype" in url and url["Subtype"] == "OPENDAP DATA" and "opendap" in url["URL"]:  # pylint: disable=line-too-long
+                    return url["URL"]
+        except Exception:
+            pass
+        return None
+
+    def start_date(self):
+        """Returns the start date"""
+        try:
+            return self.umm_granule["umm"]["TemporalExtent"]["RangeDateTime"]["BeginningDateTime"]
+        except Exception:
+            return None
+
+    def end_date(self):
+        """Returns the end date"""
+        try:
+            return self.umm_granule["umm"]["TemporalExtent"]["RangeDateTime"]["EndingDateTime"]
+        except Exception:
+            return None
+
+    def s3_bucket_info(self):
+        """Returns the bucket, key and filename, parsed on every call"""
+        if self.s3_url():
+            parsed = urlparse(self.s3_url(), allow_fragments=False)
+            return {
+                "bucket": parsed.netloc,
+                "key": parsed.path.lstrip('/'),
+                "filename": parsed.path.split('/')[-1]
+            }
+        return None
+
+    def size(self, filename):
+        """Returns the size of the data file"""
+        files = self.umm_granule.get('umm', {}).get('DataGranule', {}).get(
+            'ArchiveAndDistributionInformation', [])
+        file = next((file for file in files if file.get('Name') == filename), None)
+        return file.get('SizeInBytes', 0) if file else 0
+
+
+def with_cloud_urls(umm_granule):
+    """Add the direct access and OpenDAP urls that cloud granules list after the https links"""
+    urls = umm_granule["umm"]["RelatedUrls"]
+    data_url = next(url["URL"] for url in urls if url["Type"] == "GET DATA")
+    path = data_url.partition("//")[2].partition("/")[2]
+    urls.append({"URL": f"s3://{path}", "Type": "GET DATA VIA DIRECT ACCESS"})
+    urls.append({"URL": f"https://opendap.earthdata.nasa.gov/{path}", "Type": "USE SERVICE API",
+                 "Subtype": "OPENDAP DATA"})
+    return umm_granule
+
+
+def analyze(granule):
+    """The accessor calls made by the Backfiller and CNM writer for one granule"""
+    granule.start_date()
+    granule.end_date()
+    granule.has_footprint()
+    granule.has_footprint_and_bbox()
+    granule.has_image()
+    granule.opendap_url()
+    granule.opendap_url()
+    for _ in range(4):
+        info = granule.s3_bucket_info()
+    if info:
+        granule.size(info["filename"])
+    granule.start_date()
+    granule.start_date()
+
+
+def run(granule_class, page, repeat):
+    """Returns granules per second analyzing the page repeat times"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for umm_granule in page:
+            analyze(granule_class(umm_granule))
+    return len(page) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    """Print granules/s for both accessor implementations"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    items = load_json_file("../tests/resources/sample_granules_1.json", relative_to=__file__)["items"]
+    page = [with_cloud_urls(copy.deepcopy(items[i % len(items)])) for i in range(args.page_size)]
+
+    walking = run(WalkingGranule, page, args.repeat)
+    record = run(CmrGranule, page, args.repeat)
+    print(f"umm walk:       {walking:>12,.0f} granules/s")
+    print(f"granule record: {record:>12,.0f} granules/s")
+
+
+if __name__ == "__main__":
+    main()
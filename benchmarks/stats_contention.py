@@ -0,0 +1,86 @@
+"""Micro-benchmark: counter increments with one shared lock vs per-thread BackfillStats.
+
+Each thread performs the counter updates the Backfiller makes for one granule (analyzed,
+monthly count, needs footprint, messages sent) a number of times, and the total rate is
+printed for increasing thread counts.
+
+    poetry run python benchmarks/stats_contention.py [--granules 200000]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from podaac.hitide_backfill_tool.monthly_stats import MonthlyStats
+from podaac.hitide_backfill_tool.stats import BackfillStats
+
+
+class LockedStats:
+    """The previous scheme: plain attributes, each update under one global lock"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.granules_analyzed = 0
+        self.granules_needing_footprint = 0
+        self.footprint_messages_sent = 0
+        self.monthly_results = MonthlyStats()
+
+    def one_granule(self):
+        """Counter updates for one granule"""
+        with self.lock:
+            self.monthly_results.increment("2002-07", "granules")
+        with self.lock:
+            self.granules_needing_footprint += 1
+            self.monthly_results.increment("2002-07", "needs_footprint")
+        with self.lock:
+            self.footprint_messages_sent += 1
+        with self.lock:
+            self.granules_analyzed += 1
+
+
+class ShardedStats:
+    """BackfillStats, as used by the Backfiller"""
+
+    def __init__(self):
+        self.stats = BackfillStats()
+
+    def one_granule(self):
+        """Counter updates for one granule"""
+        self.stats.increment_monthly("2002-07", "granules")
+        self.stats.increment("granules_needing_footprint")
+        self.stats.increment_monthly("2002-07", "needs_footprint")
+        self.stats.increment("footprint_messages_sent")
+        self.stats.increment("granules_analyzed")
+
+
+def run(stats_class, threads, granules):
+    """Returns granules per second for granules spread over threads"""
+    stats = stats_class()
+    per_thread = granules // threads
+
+    def work(_):
+        for _ in range(per_thread):
+            stats.one_granule()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, range(threads)))
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    """Print granules/s for both schemes at increasing thread counts"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--granules", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'shared lock':>14} {'per-thread':>14}")
+    for threads in (1, 2, 4, 8, 16, 32):
+        locked = run(LockedStats, threads, args.granules)
+        sharded = run(ShardedStats, threads, args.granules)
+        print(f"{threads:>8} {locked:>12,.0f}/s {sharded:>12,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Adaptive limits on the number of concurrent requests made to CMR, S3 and SNS"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+
+from botocore.exceptions import ClientError
+
+# AWS error codes (and http status codes) that mean the service is throttling requests
+THROTTLING_ERROR_CODES = {
+    "Throttling", "ThrottlingException", "Throttled", "TooManyRequestsException",
+    "RequestLimitExceeded", "SlowDown", "RequestThrottled", "ProvisionedThroughputExceededException"
+}
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+def is_throttling_error(exc):
+    """Returns True if exc is an AWS throttling error, or an http error with status 429 or 503"""
+
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) in THROTTLING_STATUS_CODES
+
+
+class AdaptiveLimiter:
+    """Limits the number of concurrent calls to a service, tuning the limit at runtime with
+    AIMD (additive increase, multiplicative decrease).
+
+    The limit grows by one after each window of `limit` calls that complete without a
+    congestion signal, and is multiplied by decrease_factor when a call is throttled or when
+    the smoothed latency is more than latency_tolerance times the baseline (recent minimum)
+    latency.  Only calls that
+    started after the last decrease can decrease the limit again, so a burst of throttling
+    from calls that were already in flight counts once.
+
+    Each change of the limit is logged, and kept in `decisions`.
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments,too-many-positional-arguments
+
+    def __init__(self, name, maximum, minimum=1, initial=None, latency_tolerance=3.0,
+                 decrease_factor=0.5, logger=logging):
+        """Create AdaptiveLimiter for the service called name"""
+
+        self.name = name
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = max(minimum, min(maximum, initial or maximum // 2))
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.logger = logger
+
+        self.decisions = deque(maxlen=1000)
+        self.calls = 0
+        self.throttled_calls = 0
+        self.lowest_limit = self.limit
+        self.highest_limit = self.limit
+
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._successes = 0
+        self._baseline_latency = None
+        self._smoothed_latency = None
+        self._last_decrease = 0.0
+
+    def call(self, function, *args, throttled_result=None, **kwargs):
+        """Call function(*args, **kwargs) when a slot is free, and return its result.
+        Exceptions are raised after being checked for throttling.  throttled_result is an
+        optional function that returns True if a result means the call was throttled."""
+
+        started = self.acquire()
+        throttled = False
+        try:
+            result = function(*args, **kwargs)
+            throttled = bool(throttled_result and throttled_result(result))
+            return result
+        except Exception as exc:
+            throttled = is_throttling_error(exc)
+            raise
+        finally:
+            self.release(started, throttled)
+
+    def acquire(self):
+        """Wait for a free slot and take it.  Returns the start time to give to release()."""
+
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, started, throttled=False):
+        """Free the slot of a call that started at `started`, adjusting the limit for its
+        outcome"""
+
+        now = time.monotonic()
+        latency = now - started
+        with self._condition:
+            self._in_flight -= 1
+            self.calls += 1
+            if throttled:
+                self.throttled_calls += 1
+            slow = self._is_slow(latency)
+
+            if throttled or slow:
+                self._successes = 0
+                if started >= self._last_decrease:
+                    self._last_decrease = now
+                    reason = "throttled" if throttled else (
+                        f"latency {self._smoothed_latency:.3f}s over {self.latency_tolerance:g}x "
+                        f"baseline {self._baseline_latency:.3f}s")
+                    self._set_limit(int(self.limit * self.decrease_factor), reason)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self._successes = 0
+                    self._set_limit(self.limit + 1, f"{self.limit} calls without congestion")
+
+            self._condition.notify_all()
+
+    def _is_slow(self, latency):
+        """Update the smoothed and baseline latencies with latency, and return True if the
+        smoothed latency is well over the baseline.  The baseline follows new lows at once, and
+        rises slowly otherwise, so it tracks the latency of an uncongested service."""
+
+        if self._baseline_latency is None:
+            self._baseline_latency = self._smoothed_latency = latency
+            return False
+        self._smoothed_latency += 0.2 * (latency - self._smoothed_latency)
+        if latency < self._baseline_latency:
+            self._baseline_latency = latency
+        else:
+            self._baseline_latency += 0.01 * (latency - self._baseline_latency)
+        return 0 < self._baseline_latency * self.latency_tolerance < self._smoothed_latency
+
+    def _set_limit(self, limit, reason):
+        """Change the limit (within minimum and maximum), recording the decision.  Caller must
+        hold the condition."""
+
+        limit = max(self.minimum, min(self.maximum, limit))
+        if limit == self.limit:
+            return
+        decision = {"time": time.time(), "service": self.name, "from": self.limit, "to": limit,
+                    "reason": reason}
+        self.decisions.append(decision)
+        self.logger.info(f"{self.name} concurrency {self.limit} -> {limit}: {reason}")
+        self.limit = limit
+        self.lowest_limit = min(self.lowest_limit, limit)
+        self.highest_limit = max(self.highest_limit, limit)
+
+    def summary(self):
+        """Returns a one line summary of the limiter's activity"""
+
+        return (f"{self.name} concurrency: {self.limit} (range {self.lowest_limit}-"
+                f"{self.highest_limit} of {self.minimum}-{self.maximum}), {self.calls} calls, "
+                f"{self.throttled_calls} throttled, {len(self.decisions)} adjustments")
+
+
+def adaptive_limiters(cmr_maximum, logger=logging):
+    """Returns a dict of AdaptiveLimiters for "cmr", "s3" and "sns", each tuned independently.
+    S3 and SNS are limited to the size of their clients' connection pools."""
+
+    pool_size = multiprocessing.cpu_count() * 4
+    return {
+        "cmr": AdaptiveLimiter("cmr", cmr_maximum, logger=logger),
+        "s3": AdaptiveLimiter("s3", pool_size, logger=logger),
+        "sns": AdaptiveLimiter("sns", pool_size, logger=logger),
+    }
@@ -22,12 +22,18 @@ default_config = {
     "preview": False,
     "use_data_url": False,
     "page_size": 2000,
+    "cmr_format": "umm_json",
+    "cmr_concurrency": 20,
+    "collection_workers": 4,
+    "sns_flush_interval": 1.0,
+    "dispatch_queue_size": 1000,
+    "dmrpp_cache_size": 1000000,
     "geometries": ["GPolygons", "Lines"],
     "log_level": "INFO"
 }
 
 
-def create_parser():
+def create_parser():  # pylint: disable=too-many-statements
     """Create a argparse parser for the backfill cli"""
 
     parser = ArgumentParser()
@@ -35,6 +41,11 @@ def create_parser():
 
     parser.add_argument("--cmr", choices=["ops", "uat", "sit"])
     parser.add_argument("-c", "--collection")
+    parser.add_argument("--collections",
+                        help="Comma separated list of collections to backfill concurrently in "
+                             "one process, instead of --collection")
+    parser.add_argument("--collection-workers", type=int,
+                        help="Number of --collections backfilled at the same time")
     parser.add_argument("--provider")
     parser.add_argument("-sd", "--start-date")
     parser.add_argument("-ed", "--end-date")
@@ -43,6 +54,29 @@ def create_parser():
     parser.add_argument("--edl-token")
     parser.add_argument("--launchpad-token")
     parser.add_argument("--cmr-search-after")
+    parser.add_argument("--prefetch-pages", type=int,
+                        help="Number of CMR pages to request ahead in the background while "
+                             "the current page is processed")
+    parser.add_argument("--cmr-format", choices=["umm_json", "atom"],
+                        help="CMR search result format: umm_json (default), or the smaller "
+                             "atom json, which has no file sizes; they're read from S3, or "
+                             "left out of the messages if they can't be")
+    parser.add_argument("--cmr-filter", action="store_true", default=None,
+                        help="Have CMR leave out granules that need no work, where CMR can tell "
+                             "(with only --image on, granules that already have images)")
+    parser.add_argument("--stream-pages", action="store_true", default=None,
+                        help="Parse granules from each CMR response as it downloads, instead of "
+                             "decoding the whole page first (requires ijson)")
+
+    parser.add_argument("--async-cmr", action="store_true", default=None,
+                        help="Make CMR requests with an asyncio HTTP/2 client, looking up granule "
+                             "list entries concurrently (requires httpx)")
+    parser.add_argument("--cmr-concurrency", type=int,
+                        help="Maximum number of concurrent CMR requests with --async-cmr")
+
+    parser.add_argument("--shards", type=int,
+                        help="Split the search into this many concurrent CMR searches, by "
+                             "start-date/end-date sub-ranges, or by cycle if --cycles is a list")
 
     parser.add_argument(
         "--granule-list-file",
@@ -51,12 +85,28 @@ def create_parser():
         default=None
     )
 
+    parser.add_argument("--lookup-batch-size", type=int,
+                        help="Look up this many granule list entries per CMR search, instead of "
+                             "one search per entry")
+
+    parser.add_argument("--adaptive-concurrency", action="store_true", default=None,
+                        help="Tune the number of concurrent CMR requests, S3 reads and SNS "
+                             "publishes at runtime from their latency and throttling errors")
+
     parser.add_argument("-g", "--geometry", dest="geometries",
                         action="append", default=None)
     parser.add_argument("--footprint", choices=["on", "off", "force"])
     parser.add_argument("--image", choices=["on", "off", "force"])
     parser.add_argument("--dmrpp", choices=["on", "off", "force"])
     parser.add_argument("--dmrpp-min-version")
+    parser.add_argument("--dmrpp-inventory", action="store_true", default=None,
+                        help="With --dmrpp on, list the S3 directories holding dmrpp files once "
+                             "instead of reading every granule's dmrpp file")
+    parser.add_argument("--dmrpp-cache",
+                        help="Path of an on-disk cache of dmrpp versions, reused while a dmrpp "
+                             "file's ETag is unchanged")
+    parser.add_argument("--dmrpp-cache-size", type=int,
+                        help="Maximum number of dmrpp versions kept in the --dmrpp-cache")
     parser.add_argument("--use-data-url", action="store_true", default=None)
 
     parser.add_argument("--cumulus", choices=["ops", "uat", "sit",
@@ -65,11 +115,41 @@ def create_parser():
 
     parser.add_argument("--preview", action="store_true", default=None)
     parser.add_argument("--sns-arn")
+    parser.add_argument("--sns-batch", action="store_true", default=None,
+                        help="Publish SNS messages in batches of up to 10 with PublishBatch")
+    parser.add_argument("--sns-flush-interval", type=float,
+                        help="Seconds a batched SNS message may wait before its batch is published")
+    parser.add_argument("--dispatch-workers", type=int,
+                        help="Send messages from this many background threads instead of "
+                             "from the granule analysis threads")
+    parser.add_argument("--dispatch-queue-size", type=int,
+                        help="Number of messages that can wait for a dispatch thread")
+    parser.add_argument("--combine-messages", action="store_true", default=None,
+                        help="Send one message per granule with all of its footprint, image and "
+                             "dmrpp actions, instead of a message per action")
+    parser.add_argument("--message-rate", metavar="ACTION=RATE[:BURST]", action="append",
+                        default=None,
+                        help="Send at most RATE messages per second (with bursts of up to BURST) "
+                             "for an action: forge, tig or dmrpp.  Can be repeated")
     parser.add_argument("--aws-profile")
     parser.add_argument("--message_file")
     parser.add_argument("--message-limit", type=int)
     parser.add_argument("--user")
 
+    parser.add_argument("--workers", type=int,
+                        help="Number of granules processed in parallel for the whole run")
+
+    parser.add_argument("--checkpoint-dir",
+                        help="Directory for checkpoint journals, which allow an interrupted "
+                             "backfill to be resumed")
+    parser.add_argument("--resume", metavar="EXECUTION_ID",
+                        help="Resume the interrupted backfill with this execution id from its "
+                             "checkpoint journal")
+
+    parser.add_argument("--granule-detail-file",
+                        help="Write a CSV row per analyzed granule, with the flags that the "
+                             "monthly counts are made from")
+
     parser.add_argument("--log-file")
     parser.add_argument("--log-level")
 
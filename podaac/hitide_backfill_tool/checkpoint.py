@@ -0,0 +1,167 @@
+"""Checkpoint journal that records the progress of a backfill run so it can be resumed"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from podaac.hitide_backfill_tool.file_util import make_absolute
+
+
+class CheckpointJournal:
+    """SQLite journal of a backfill run, stored as <checkpoint_dir>/<execution_id>.sqlite
+
+    Records the run's options (collection, time range, processing options); for every CMR page,
+    the cmr-search-after token used to request it and whether all of its granules have been
+    processed; the concept ids of processed granules; and a snapshot of the run's counters.
+    A resumed run re-requests the first page that was not completed and skips the granules that
+    were already processed, so no message is sent twice.
+    """
+
+    def __init__(self, path):
+        """Open (or create) the journal at path"""
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                page INTEGER PRIMARY KEY AUTOINCREMENT,
+                search_after TEXT,
+                next_search_after TEXT,
+                completed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS granules (
+                concept_id TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS state (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.connection.commit()
+
+    @staticmethod
+    def journal_path(checkpoint_dir, execution_id):
+        """Returns the path of the journal for execution_id"""
+
+        return os.path.join(make_absolute(checkpoint_dir), f"{execution_id}.sqlite")
+
+    @classmethod
+    def create(cls, checkpoint_dir, execution_id, run_options=None):
+        """Create a new journal for execution_id, recording the run's options (a json
+        serializable dict)"""
+
+        os.makedirs(make_absolute(checkpoint_dir), exist_ok=True)
+        journal = cls(cls.journal_path(checkpoint_dir, execution_id))
+        journal.set_state("run_options", run_options or {})
+        return journal
+
+    @classmethod
+    def resume(cls, checkpoint_dir, execution_id, run_options=None):
+        """Open the existing journal for execution_id.  Raises an exception if run_options
+        differ from the options the journal was created with."""
+
+        path = cls.journal_path(checkpoint_dir, execution_id)
+        if not os.path.isfile(path):
+            raise Exception(
+                f"Could not find checkpoint journal for execution id {execution_id} at {path}")
+        journal = cls(path)
+        try:
+            journal.check_run_options(execution_id, run_options or {})
+        except Exception:
+            journal.close()
+            raise
+        return journal
+
+    def check_run_options(self, execution_id, run_options):
+        """Raise an exception listing the options that differ from the recorded run options"""
+
+        recorded = self.get_state("run_options")
+        if recorded is None:
+            # journals from before the run options were recorded
+            return
+        run_options = json.loads(json.dumps(run_options))
+        differences = [
+            f"{name} (was {recorded.get(name)!r}, now {run_options.get(name)!r})"
+            for name in {**recorded, **run_options}
+            if recorded.get(name) != run_options.get(name)
+        ]
+        if differences:
+            raise Exception(f"Cannot resume backfill {execution_id} with different options: "
+                            f"{', '.join(differences)}")
+
+    def record_page(self, search_after, next_search_after):
+        """Record a CMR page that is about to be processed and return its page number"""
+
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT INTO pages (search_after, next_search_after) VALUES (?, ?)",
+                (search_after, next_search_after))
+            self.connection.commit()
+            return cursor.lastrowid
+
+    def complete_page(self, page):
+        """Record that every granule of page has been processed"""
+
+        with self.lock:
+            self.connection.execute("UPDATE pages SET completed = 1 WHERE page = ?", (page,))
+            self.connection.commit()
+
+    def record_granule(self, concept_id):
+        """Record that a granule has been processed.  Committed at the next checkpoint."""
+
+        with self.lock:
+            self.connection.execute("INSERT OR IGNORE INTO granules (concept_id) VALUES (?)",
+                                    (concept_id,))
+
+    def processed_concept_ids(self):
+        """Returns the set of concept ids of processed granules"""
+
+        with self.lock:
+            return {row[0] for row in self.connection.execute("SELECT concept_id FROM granules")}
+
+    def resume_point(self):
+        """Returns (done, search_after): whether the search was finished, and otherwise the
+        cmr-search-after token to restart the search from (None to start from the beginning)."""
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT search_after FROM pages WHERE completed = 0 ORDER BY page LIMIT 1"
+            ).fetchone()
+            if row:
+                return False, row[0]
+            row = self.connection.execute(
+                "SELECT next_search_after FROM pages ORDER BY page DESC LIMIT 1").fetchone()
+        if row is None:
+            return False, None
+        return row[0] is None, row[0]
+
+    def set_state(self, name, value):
+        """Store a json serializable value, e.g. counters, and commit the journal"""
+
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO state (name, value) VALUES (?, ?)",
+                                    (name, json.dumps(value)))
+            self.connection.commit()
+
+    def get_state(self, name, default=None):
+        """Returns a value stored with set_state"""
+
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM state WHERE name = ?",
+                                          (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def checkpoint(self):
+        """Commit everything recorded so far"""
+
+        with self.lock:
+            self.connection.commit()
+
+    def close(self):
+        """Commit and close the journal"""
+
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
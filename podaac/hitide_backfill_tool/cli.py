@@ -1,29 +1,39 @@
 """Script for backfilling granule images and footprints"""
 
-# pylint: disable=line-too-long
+# pylint: disable=line-too-long,too-many-lines
 
 import copy
 import json
 import logging
 import os
 import sys
+import time
 import traceback
 import uuid
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from importlib.metadata import version
 from multiprocessing import Lock
+from threading import BoundedSemaphore, Condition, Event
 
 import requests
 
+from podaac.hitide_backfill_tool.adaptive_concurrency import adaptive_limiters
+from podaac.hitide_backfill_tool.rate_limit import MessageRateLimiter, parse_message_rates
 from podaac.hitide_backfill_tool.args import parse_args
+from podaac.hitide_backfill_tool.checkpoint import CheckpointJournal
 from podaac.hitide_backfill_tool.cnm_message_writer import CnmMessageWriter
 from podaac.hitide_backfill_tool.config import get_collection_config, get_message_config
+from podaac.hitide_backfill_tool.cmr.async_search import AsyncCmrSession, AsyncGranuleSearch
 from podaac.hitide_backfill_tool.cmr.cmr_granule import CmrGranule
 from podaac.hitide_backfill_tool.cmr.helpers import cmr_base_url
-from podaac.hitide_backfill_tool.cmr.search import GranuleSearch
-from podaac.hitide_backfill_tool.dmrpp_utils import DmrppState, parse_version
-from podaac.hitide_backfill_tool.file_util import make_absolute
+from podaac.hitide_backfill_tool.cmr.search import LOOKUP_WORKERS, GranuleSearch, ShardedGranuleSearch, cmr_session
+from podaac.hitide_backfill_tool.dmrpp_utils import DmrppInventory, DmrppState, DmrppVersionCache, parse_version
+from podaac.hitide_backfill_tool.file_util import make_absolute, open_text_file
+from podaac.hitide_backfill_tool.message_dispatcher import MessageDispatcher
+from podaac.hitide_backfill_tool.monthly_stats import GranuleDetailWriter
+from podaac.hitide_backfill_tool.stats import BackfillStats
 from podaac.hitide_backfill_tool.s3_reader import S3Reader
 from podaac.hitide_backfill_tool.sns_message_sender import FileMessageSender, SnsMessageSender
 
@@ -66,24 +76,73 @@ def safe_log_args(logger, args):
     logger.debug(f"\nCLI args:\n{object_to_str(args_copy)}\n")
 
 
-def granule_search_from_args(args, logger):
-    """Return configured GranuleSearch object from parsed cli args and logger."""
+def granule_search_from_args(args, logger, limiter=None, session=None):
+    """Return configured GranuleSearch object from parsed cli args and logger, with an optional
+    AdaptiveLimiter for its CMR requests, and an optional CMR session (from
+    shared_cmr_session_from_args) shared with other searches."""
+
+    search_kwargs = {
+        "base_url": cmr_base_url(args.cmr),
+        "collection_short_name": args.collection,
+        "provider": args.provider,
+        "start_date": args.start_date,
+        "end_date": args.end_date,
+        "page_size": args.page_size,
+        "page_limit": args.page_limit,
+        "logger": logger,
+        "edl_token": args.edl_token,
+        "launchpad_token": args.launchpad_token,
+        "cmr_search_after": args.cmr_search_after,
+        "cycles": args.cycles,
+        "sort_order": args.sort_order,
+        "prefetch_pages": args.prefetch_pages,
+        "stream_pages": args.stream_pages,
+        "result_format": args.cmr_format,
+        "browsable": browsable_filter_from_args(args, logger),
+        "lookup_batch_size": args.lookup_batch_size,
+        "limiter": limiter
+    }
+    if session is not None:
+        search_kwargs["session"] = session
+
+    if args.shards and args.shards > 1 and not args.granule_list_file:
+        return ShardedGranuleSearch.create(args.shards, **search_kwargs)
+    if args.async_cmr:
+        return AsyncGranuleSearch(concurrency=args.cmr_concurrency, **search_kwargs)
+    return GranuleSearch(**search_kwargs)
+
+
+def shared_cmr_session_from_args(args, logger):
+    """Return the CMR session for the searches of every collection to share: an AsyncCmrSession
+    when they are AsyncGranuleSearches, otherwise a requests Session."""
+
+    if args.async_cmr and not (args.shards and args.shards > 1):
+        return AsyncCmrSession(concurrency=args.cmr_concurrency, logger=logger)
+    return cmr_session(LOOKUP_WORKERS)
+
+
+def collections_from_args(args):
+    """Return the collections of --collections (comma separated, or a list in the config file)
+    without repeats, or an empty list."""
 
-    return GranuleSearch(
-        base_url=cmr_base_url(args.cmr),
-        collection_short_name=args.collection,
-        provider=args.provider,
-        start_date=args.start_date,
-        end_date=args.end_date,
-        page_size=args.page_size,
-        page_limit=args.page_limit,
-        logger=logger,
-        edl_token=args.edl_token,
-        launchpad_token=args.launchpad_token,
-        cmr_search_after=args.cmr_search_after,
-        cycles=args.cycles,
-        sort_order=args.sort_order
-    )
+    collections = args.collections or []
+    if isinstance(collections, str):
+        collections = collections.split(",")
+    return list(dict.fromkeys(str(collection).strip() for collection in collections
+                              if str(collection).strip()))
+
+
+def browsable_filter_from_args(args, logger):
+    """Return the CMR 'browsable' search filter for --cmr-filter: False (granules without images)
+    when images are the only work, otherwise None as CMR can't tell which granules need work."""
+
+    if not args.cmr_filter:
+        return None
+    if args.image == "on" and args.footprint == "off" and args.dmrpp == "off":
+        return False
+    logger.info("--cmr-filter only applies with --image on, --footprint off and --dmrpp off; "
+                "granules will be filtered after they're received")
+    return None
 
 
 def message_writer_from_args(args, logger):
@@ -100,8 +159,9 @@ def message_writer_from_args(args, logger):
     return message_writer
 
 
-def message_senders_from_args(args, logger):
-    """Return list of configured message senders from parsed cli args and logger."""
+def message_senders_from_args(args, logger, limiter=None):
+    """Return list of configured message senders from parsed cli args and logger, with an
+    optional AdaptiveLimiter for SNS publishes."""
 
     message_senders = []
 
@@ -112,11 +172,79 @@ def message_senders_from_args(args, logger):
         message_senders.append(SnsMessageSender(
             topic_arn=args.sns_arn,
             aws_profile=args.aws_profile,
-            logger=logger
+            logger=logger,
+            batch=bool(args.sns_batch),
+            flush_interval=args.sns_flush_interval,
+            limiter=limiter
         ))
     return message_senders
 
 
+def message_dispatcher_from_args(args, message_senders, logger):
+    """Return configured message dispatcher from parsed cli args, or None if messages are sent inline."""
+
+    if not args.dispatch_workers or not message_senders:
+        return None
+    return MessageDispatcher(message_senders, logger,
+                             workers=args.dispatch_workers,
+                             queue_size=args.dispatch_queue_size)
+
+
+def message_rate_limiter_from_args(args):
+    """Return a MessageRateLimiter for the --message-rate limits, or None if there are none"""
+
+    rates = parse_message_rates(args.message_rate)
+    return MessageRateLimiter(rates) if rates else None
+
+
+# options that select the granules of a run and the messages sent for them, which a resumed
+# run must share with the run that created its checkpoint journal
+JOURNAL_RUN_OPTIONS = ("cmr", "collection", "provider", "start_date", "end_date", "cycles",
+                       "sort_order", "cmr_filter", "shards", "granule_list_file", "geometries",
+                       "footprint", "image", "dmrpp", "dmrpp_min_version", "use_data_url",
+                       "cumulus")
+
+
+def journal_run_options(args):
+    """Return the JOURNAL_RUN_OPTIONS of parsed cli args"""
+    return {name: getattr(args, name, None) for name in JOURNAL_RUN_OPTIONS}
+
+
+def checkpoint_journal_from_args(args, logger):
+    """Return checkpoint journal from parsed cli args, or None if not checkpointing.
+
+    When resuming, args.cmr_search_after is set to where the interrupted run stopped."""
+
+    if args.resume:
+        if not args.checkpoint_dir:
+            raise Exception("Please specify --checkpoint-dir to resume a backfill")
+        if args.preview:
+            raise Exception("Cannot resume a backfill in preview mode")
+        journal = CheckpointJournal.resume(args.checkpoint_dir, args.resume, journal_run_options(args))
+        if args.shards and args.shards > 1:
+            # sharded pages have no single cmr-search-after token, so the search restarts
+            # and the granules already processed are skipped
+            logger.info(f"Resuming sharded backfill {args.resume} from {journal.path}")
+            return journal
+        done, search_after = journal.resume_point()
+        if done:
+            journal.close()
+            raise Exception(f"Backfill {args.resume} already finished searching CMR; nothing to resume")
+        args.cmr_search_after = search_after
+        logger.info(f"Resuming backfill {args.resume} from {journal.path} "
+                    f"(cmr-search-after: {search_after})")
+        return journal
+
+    if args.checkpoint_dir and not args.preview:
+        journal = CheckpointJournal.create(args.checkpoint_dir, args.cli_execution_id,
+                                           journal_run_options(args))
+        logger.info(f"Checkpoint journal: {journal.path} "
+                    f"(resume with --resume {args.cli_execution_id})")
+        return journal
+
+    return None
+
+
 def granule_options_from_args(args):
     """Return kwargs dict will be passed to CmrGranule constructor along with granule umm_json."""
 
@@ -126,7 +254,8 @@ def granule_options_from_args(args):
         "image_processing": args.image,
         "dmrpp_processing": args.dmrpp,
         "dmrpp_min_version": parse_version(args.dmrpp_min_version),
-        "can_use_data_url_for_s3_bucket_info": args.use_data_url
+        "can_use_data_url_for_s3_bucket_info": args.use_data_url,
+        "dmrpp_cache": DmrppVersionCache(args.dmrpp_cache, args.dmrpp_cache_size) if args.dmrpp_cache else None
     }
 
 
@@ -137,10 +266,18 @@ class Backfiller:
     #   of data when attempting access (e.g. TypeError, IndexError, KeyError, ...)
     # pylint: disable=broad-except
     # pylint: disable=too-many-instance-attributes,too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-public-methods
+
+    # statistics counters of the messages sent for each action, and the action's message flag
+    message_counters = {"footprint_messages_sent": "forge", "image_messages_sent": "tig",
+                        "dmrpp_messages_sent": "dmrpp"}
 
     def __init__(self, search, message_writer, message_senders, granule_options, logger,
-                 message_limit, cli_execution_id, s3, collection, granule_list_file):
-        # pylint: disable=C0103
+                 message_limit, cli_execution_id, s3, collection, granule_list_file, workers=None,
+                 dispatcher=None, journal=None, granule_detail=None, dmrpp_inventory=None,
+                 rate_limiter=None, combine_messages=False, executor=None, pending_granules=None,
+                 stop=None):
+        # pylint: disable=C0103,too-many-locals,too-many-statements
 
         # dependencies
         self.search = search
@@ -153,33 +290,21 @@ class Backfiller:
         self.s3 = s3
         self.collection = collection
         self.granule_list_file = granule_list_file
-        self.granule_list = None
+        self.dispatcher = dispatcher
+        self.granule_detail = granule_detail
+        self.dmrpp_inventory = dmrpp_inventory
+        self.rate_limiter = rate_limiter
+        self.combine_messages = combine_messages
+
+        # checkpoint journal
+        self.journal = journal
+        self.processed_concept_ids = set()
+        self.page_granules_pending = {}
 
         # statistics
-        self.granules_analyzed = 0
-        self.granule_range_start = None
-        self.granule_range_end = None
-        self.footprints_that_couldnt_be_processed = 0
-        self.images_that_couldnt_be_processed = 0
-        self.dmrpp_that_couldnt_be_processed = 0
-        self.granules_needing_footprint = 0
-        self.granules_needing_image = 0
-        self.granules_needing_dmrpp = 0
-        self.granules_with_footprint_and_bbox = 0
-        self.footprint_messages_sent = 0
-        self.image_messages_sent = 0
-        self.dmrpp_messages_sent = 0
-        self.monthly_results = {}
-        self.concept_ids_needing_image = []
-        self.concept_ids_needing_footprint = []
-        self.concept_ids_needing_dmrpp = []
-
-        # dmrpp status
-        self.dmrpp_unprocessed = 0
-        self.dmrpp_missing_version = 0
-        self.dmrpp_update_cmr_opendap = 0
-        self.dmrpp_older_version = 0
-        self.dmrpp_newer_version = 0
+        self.started = None
+        self.stats = BackfillStats()
+        self.messages_reserved = 0
 
         # forge-tig configuration
         self.forge_tig_configuration = None
@@ -192,14 +317,26 @@ class Backfiller:
             destination_message.append('nowhere')
         self.destination_message = f"Messages being sent to {', '.join(destination_message)}"
 
-        if self.granule_list_file:
-            self.read_granule_list_file()
-
         # for thread-safe operations
         self.lock = Lock()
 
+        # one worker pool for the whole run, fed by a bounded queue of pending granules.  Both
+        # can be shared with the Backfillers of other collections, for one concurrency budget.
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.executor = executor
+        self.pending_granules = pending_granules or BoundedSemaphore(self.workers * 2)
+        self.granules_in_flight = 0
+        self.granules_done = Condition()
+
+        # set to stop processing (e.g. after ctrl-C), shared by the Backfillers of a run
+        self.stop = stop or Event()
+
+        if self.journal:
+            self.restore_checkpoint()
+
     def read_granule_list_file(self):
-        """Read the granule_list_file and store contents in array granule_list
+        """Yield the granules in granule_list_file one at a time, skipping blank lines and
+           repeats.  The file can be gzip compressed.
            The items in the list are one granule per line:
            Can be either a GranuleUR or a granlue concept ID, and all items must the same type.
            Example:
@@ -212,29 +349,149 @@ class Backfiller:
                G3142846484-POCLOUD
         """
 
-        with open(self.granule_list_file, 'r', encoding='utf-8') as file:
-            self.granule_list = [line.strip() for line in file]
+        seen = set()
+        with open_text_file(self.granule_list_file) as file:
+            for line in file:
+                granule_name = line.strip()
+                if granule_name and granule_name not in seen:
+                    seen.add(granule_name)
+                    yield granule_name
+        self.logger.info(f"Read {len(seen)} unique granules from {self.granule_list_file}")
 
     def process_granules(self):
-        """Loop through granules (in parallel) from granule-search and call the process_one_granule() method."""
+        """Stream granules from granule-search into one worker pool that lasts for the whole run,
+        calling the process_one_granule() method for each granule in parallel."""
 
-        if self.granule_list:
-            print('Processing granules from granule list file...', end='', flush=True)
-            granules = self.search.get_granules_in_list(self.granule_list)
+        self.started = time.monotonic()
 
-            with ThreadPoolExecutor() as executor:
-                executor.map(self.process_one_granule, granules)
+        if self.granule_list_file:
+            print('Processing granules from granule list file...', end='', flush=True)
+            with self.worker_pool() as executor:
+                for umm_granule in self.search.iter_granules_in_list(self.read_granule_list_file()):
+                    if self.stop.is_set():
+                        break
+                    self.submit_granule(executor, umm_granule)
             print("done.")
+            self.save_checkpoint()
         else:
-            while self.search.get_next_page():
-                print("Processing granules...", end='', flush=True)
-                with ThreadPoolExecutor() as executor:
-                    executor.map(self.process_one_granule, self.search.granules())
-                print("done.")
-                if self.message_limit_reached():
-                    self.logger.info("\n**** Message limit reached ****")
-                    return
-                self.log_stats()
+            with self.worker_pool() as executor:
+                while not self.stop.is_set() and self.search.get_next_page():
+                    print("Processing granules...", end='', flush=True)
+                    page = self.start_page()
+                    for umm_granule in self.search.granules():
+                        if self.message_limit_reached() or self.stop.is_set():
+                            break
+                        self.submit_granule(executor, umm_granule, page)
+                    else:
+                        self.finish_page(page)
+                    print("done.")
+                    if self.message_limit_reached() or self.stop.is_set():
+                        break
+                    self.log_stats()
+                    self.save_checkpoint()
+            if self.message_limit_reached():
+                self.logger.info("\n**** Message limit reached ****")
+
+    @contextmanager
+    def worker_pool(self):
+        """Context manager giving the executor to submit granules to, which waits on exit until
+        this Backfiller's granules have been processed: the shared executor if there is one,
+        otherwise a pool for this Backfiller."""
+
+        if self.executor is None:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                yield executor
+            return
+        try:
+            yield self.executor
+        finally:
+            with self.granules_done:
+                while self.granules_in_flight:
+                    self.granules_done.wait()
+
+    def granule_finished(self):
+        """Release the pending granule slot of a processed granule"""
+
+        self.pending_granules.release()
+        with self.granules_done:
+            self.granules_in_flight -= 1
+            self.granules_done.notify_all()
+
+    def submit_granule(self, executor, umm_granule, page=None):
+        """Queue one granule on the worker pool, blocking while the queue of pending granules is full."""
+
+        if self.processed_concept_ids and umm_granule["meta"]["concept-id"] in self.processed_concept_ids:
+            return
+
+        if page is not None:
+            with self.lock:
+                self.page_granules_pending[page] += 1
+
+        self.pending_granules.acquire()  # pylint: disable=consider-using-with
+        with self.granules_done:
+            self.granules_in_flight += 1
+        try:
+            future = executor.submit(self.process_and_record_granule, umm_granule, page)
+        except Exception:
+            self.granule_finished()
+            raise
+        future.add_done_callback(lambda _: self.granule_finished())
+
+    def process_and_record_granule(self, umm_granule, page):
+        """Process one granule, then record it (and its page once the page is done) in the checkpoint journal."""
+
+        analyzed = self.process_one_granule(umm_granule)
+        if self.journal is None or not analyzed:
+            # a skipped granule leaves its page incomplete, so a resumed run will request it again
+            return
+        self.journal.record_granule(umm_granule["meta"]["concept-id"])
+        if page is not None:
+            self.release_page_granule(page)
+
+    def start_page(self):
+        """Record the current CMR page in the checkpoint journal.  Returns the page number, or None without a journal."""
+
+        if self.journal is None:
+            return None
+        page = self.journal.record_page(self.search.page_search_after(), self.search.next_search_after())
+        with self.lock:
+            # one extra pending count, released by finish_page once every granule has been submitted
+            self.page_granules_pending[page] = 1
+        return page
+
+    def finish_page(self, page):
+        """Mark that every granule of page has been submitted."""
+
+        if page is not None:
+            self.release_page_granule(page)
+
+    def release_page_granule(self, page):
+        """Release one pending count of page, completing the page in the journal when none are left."""
+
+        with self.lock:
+            self.page_granules_pending[page] -= 1
+            page_done = self.page_granules_pending[page] == 0
+            if page_done:
+                del self.page_granules_pending[page]
+        if page_done:
+            self.journal.complete_page(page)
+
+    def save_checkpoint(self):
+        """Save the counters to the checkpoint journal and commit it."""
+
+        if self.journal is None:
+            return
+        self.journal.set_state("stats", self.stats.snapshot())
+
+    def restore_checkpoint(self):
+        """Restore counters and the processed granules from the checkpoint journal."""
+
+        snapshot = self.journal.get_state("stats", {})
+        self.stats.restore(snapshot)
+        counters = snapshot.get("counters", {})
+        # journals from before messages_sent was counted have only the per-action counters
+        self.messages_reserved = counters.get("messages_sent") or sum(counters.get(name, 0) for name in self.message_counters)
+        self.processed_concept_ids = self.journal.processed_concept_ids()
 
     def print_monthly_results_table(self):
         """Function to print out monthly stats"""
@@ -248,7 +505,7 @@ class Backfiller:
 
         separator = "========== ========== ============ ================ ================ ============"
 
-        for date, result in self.monthly_results.items():
+        for date, result in self.stats.monthly().items():
             date_obj = datetime.strptime(date, "%Y-%m")
             month_name = date_obj.strftime("%b")
 
@@ -258,209 +515,272 @@ class Backfiller:
                 print(separator)
                 current_year = year
 
-            row = f"{date[:4]}-{month_name:<5} {len(result['granules']):<10} {result['needs_image']:<12} {result['needs_footprint']:<16} {result['both_footprint_and_bbox']:<16} {result['needs_dmrpp']:<12}"   # noqa
+            row = f"{date[:4]}-{month_name:<5} {result['granules']:<10} {result['needs_image']:<12} {result['needs_footprint']:<16} {result['both_footprint_and_bbox']:<16} {result['needs_dmrpp']:<12}"   # noqa
             print(row)
         print()
 
     def process_one_granule(self, umm_granule):
-        """Create and send messages for one granule.  Thread-safe method using lock."""
+        """Create and send messages for one granule.  Thread-safe method using lock.
+        With combine_messages, the granule's actions are decided first and sent in one message.
+        Returns False if the granule was skipped because the message limit was reached, or
+        processing was stopped."""
         try:
-            if self.message_limit_reached():
-                return
+            if self.message_limit_reached() or self.stop.is_set():
+                return False
+
+            # message flags of the granule's actions, when they're combined into one message
+            actions = {} if self.combine_messages else None
 
             granule = CmrGranule(umm_granule, self.s3, **self.granule_options)
 
-            with self.lock:
-                if not self.granule_range_start:
-                    self.granule_range_start = granule.start_date()
-                self.granule_range_end = granule.end_date()
+            self.stats.add_granule_range(granule.start_date(), granule.end_date())
 
             date = granule.start_date()[:7]
-            with self.lock:
-                if date not in self.monthly_results:
-                    self.monthly_results[date] = {
-                        'granules': [copy.deepcopy(granule.umm_granule)],
-                        'needs_image': 0,
-                        'needs_footprint': 0,
-                        'both_footprint_and_bbox': 0,
-                        'needs_dmrpp': 0
-                    }
-                else:
-                    self.monthly_results[date]['granules'].append(copy.deepcopy(granule.umm_granule))
-
-            # footprint
-            if granule.needs_footprint():
-                self.update_footprint(granule)
-
-            # image
-            if granule.needs_image():
-                self.update_image(granule)
-
-            # both bbox and footprint
-            if granule.has_footprint_and_bbox():
-                with self.lock:
-                    self.granules_with_footprint_and_bbox += 1
-
-                    self.monthly_results[date]['both_footprint_and_bbox'] += 1
-
-            # dmrpp
-            if self.granule_options['dmrpp_processing'] == "force":
-                self.update_dmrpp(granule)
-            elif self.granule_options['dmrpp_processing'] == "on":
-                self.check_dmrpp(granule)
-
-            with self.lock:
-                self.granules_analyzed += 1
+            self.stats.increment_monthly(date, 'granules')
+
+            try:
+                # footprint
+                needs_footprint = granule.needs_footprint()
+                if needs_footprint:
+                    self.update_footprint(granule, actions)
+
+                # image
+                needs_image = granule.needs_image()
+                if needs_image:
+                    self.update_image(granule, actions)
+
+                # both bbox and footprint
+                has_footprint_and_bbox = granule.has_footprint_and_bbox()
+                if has_footprint_and_bbox:
+                    self.stats.increment("granules_with_footprint_and_bbox")
+                    self.stats.increment_monthly(date, 'both_footprint_and_bbox')
+
+                # dmrpp
+                needs_dmrpp = False
+                if self.granule_options['dmrpp_processing'] == "force":
+                    self.update_dmrpp(granule, actions)
+                    needs_dmrpp = True
+                elif self.granule_options['dmrpp_processing'] == "on":
+                    needs_dmrpp = self.check_dmrpp(granule, actions)
+            finally:
+                # the actions decided before an error are still sent
+                if actions:
+                    self.send_combined_message(granule, actions)
+
+            if self.granule_detail:
+                self.granule_detail.write({
+                    'month': date,
+                    'concept_id': granule.concept_id(),
+                    'native_id': granule.native_id(),
+                    'start_date': granule.start_date(),
+                    'needs_footprint': needs_footprint,
+                    'needs_image': needs_image,
+                    'both_footprint_and_bbox': has_footprint_and_bbox,
+                    'needs_dmrpp': needs_dmrpp
+                })
+
+            self.stats.increment("granules_analyzed")
         except Exception as exc:
             self.logger.error(f"Error: {str(exc)}\n")
             traceback.print_exc()
+        return True
 
-    def update_image(self, granule):
-        """Create and send messages for one granule's image update."""
-
-        with self.lock:
-            self.granules_needing_image += 1
-            self.concept_ids_needing_image.append(granule.concept_id())
+    def update_image(self, granule, actions=None):
+        """Create and send messages for one granule's image update, or add it to actions for
+        a combined message."""
 
-            date = granule.start_date()[:7]
-            self.monthly_results[date]['needs_image'] += 1
+        self.stats.increment("granules_needing_image")
+        self.stats.add_concept_id("needing_image", granule.concept_id())
+        self.stats.increment_monthly(granule.start_date()[:7], 'needs_image')
         if granule.s3_bucket_info():
-            if not self.message_limit_reached():
-                with self.lock:
-                    self.image_messages_sent += 1
+            if actions is not None:
+                actions["tig"] = True
+            elif self.reserve_message("image_messages_sent"):
                 if self.message_writer:
                     message = self.message_writer.write(granule, needs_footprint=False,
                                                         needs_image=True, needs_dmrpp=False,
                                                         skip_cmr_opendap_update=True)
-                    for sender in self.message_senders:
-                        sender.send(message)
+                    self.send_message(message, "tig")
         else:
-            with self.lock:
-                self.images_that_couldnt_be_processed += 1
+            self.stats.increment("images_that_couldnt_be_processed")
             raise Exception(
                 f"Could not process image for granule {granule.native_id()} because of missing S3 "
                 f"bucket info")
 
-    def update_footprint(self, granule):
-        """Create and send messages for one granule's footprint update."""
-
-        with self.lock:
-            self.granules_needing_footprint += 1
-            self.concept_ids_needing_footprint.append(granule.concept_id())
+    def update_footprint(self, granule, actions=None):
+        """Create and send messages for one granule's footprint update, or add it to actions for
+        a combined message."""
 
-            date = granule.start_date()[:7]
-            self.monthly_results[date]['needs_footprint'] += 1
+        self.stats.increment("granules_needing_footprint")
+        self.stats.add_concept_id("needing_footprint", granule.concept_id())
+        self.stats.increment_monthly(granule.start_date()[:7], 'needs_footprint')
         if granule.s3_bucket_info():
-            if not self.message_limit_reached():
-                with self.lock:
-                    self.footprint_messages_sent += 1
+            if actions is not None:
+                actions["forge"] = True
+            elif self.reserve_message("footprint_messages_sent"):
                 if self.message_writer:
                     message = self.message_writer.write(granule, needs_footprint=True,
                                                         needs_image=False, needs_dmrpp=False,
                                                         skip_cmr_opendap_update=True)
-                    for sender in self.message_senders:
-                        sender.send(message)
+                    self.send_message(message, "forge")
         else:
-            with self.lock:
-                self.footprints_that_couldnt_be_processed += 1
+            self.stats.increment("footprints_that_couldnt_be_processed")
             raise Exception(
                 f"Could not process footprint for granule {granule.native_id()} because of "
                 f"missing S3 bucket info")
 
-    def check_dmrpp(self, granule):
-        """Check if dmrpp needs updating based on the dmrpp file state, and update if so."""
+    def check_dmrpp(self, granule, actions=None):
+        """Check if dmrpp needs updating based on the dmrpp file state, and update if so.
+        Returns True if the dmrpp needed updating."""
 
         s3_bucket_info = granule.s3_bucket_info()
         if s3_bucket_info:
             if not granule.has_opendap_url():
-                self.update_dmrpp(granule)
+                self.update_dmrpp(granule, actions)
+                return True
+
+            dmrpp_url = f's3://{s3_bucket_info["bucket"]}/{s3_bucket_info["key"]}.dmrpp'
+            listed, dmrpp_info = self.dmrpp_inventory.lookup(dmrpp_url) if self.dmrpp_inventory else (False, None)
+            if listed and dmrpp_info is None:
+                # not in the inventory, so there's no dmrpp file to read
+                dmrpp_state = DmrppState.MISSING_VERSION
             else:
-                dmrpp_state = granule.get_dmrpp_state(f's3://{s3_bucket_info["bucket"]}'
-                                                      f'/{s3_bucket_info["key"]}.dmrpp')
-                if dmrpp_state == DmrppState.OLDER_VERSION:
-                    self.update_dmrpp(granule)
-                    with self.lock:
-                        self.dmrpp_older_version += 1
-                elif dmrpp_state == DmrppState.MISSING_VERSION:
-                    self.update_dmrpp(granule)
-                    with self.lock:
-                        self.dmrpp_missing_version += 1
-                elif dmrpp_state == DmrppState.MATCHED_VERSION:
-                    with self.lock:
-                        self.dmrpp_unprocessed += 1
-                elif dmrpp_state == DmrppState.NEWER_VERSION:
-                    with self.lock:
-                        self.dmrpp_newer_version += 1
-        else:
-            with self.lock:
-                self.dmrpp_that_couldnt_be_processed += 1
-            raise Exception(
-                f"Could not process dmrpp for granule {granule.native_id()} because of "
-                f"missing S3 bucket info")
-
-    def update_dmrpp(self, granule):
-        """Create and send messages for one granule's dmrpp update."""
-
-        with self.lock:
-            self.granules_needing_dmrpp += 1
-            self.concept_ids_needing_dmrpp.append(granule.concept_id())
-
-            date = granule.start_date()[:7]
-            self.monthly_results[date]['needs_dmrpp'] += 1
+                dmrpp_state = granule.get_dmrpp_state(dmrpp_url, etag=dmrpp_info and dmrpp_info["etag"])
+            if dmrpp_state == DmrppState.OLDER_VERSION:
+                self.update_dmrpp(granule, actions)
+                self.stats.increment("dmrpp_older_version")
+            elif dmrpp_state == DmrppState.MISSING_VERSION:
+                self.update_dmrpp(granule, actions)
+                self.stats.increment("dmrpp_missing_version")
+            elif dmrpp_state == DmrppState.MATCHED_VERSION:
+                self.stats.increment("dmrpp_unprocessed")
+            elif dmrpp_state == DmrppState.NEWER_VERSION:
+                self.stats.increment("dmrpp_newer_version")
+            return dmrpp_state in (DmrppState.OLDER_VERSION, DmrppState.MISSING_VERSION)
+
+        self.stats.increment("dmrpp_that_couldnt_be_processed")
+        raise Exception(
+            f"Could not process dmrpp for granule {granule.native_id()} because of "
+            f"missing S3 bucket info")
+
+    def update_dmrpp(self, granule, actions=None):
+        """Create and send messages for one granule's dmrpp update, or add it to actions for
+        a combined message."""
+
+        self.stats.increment("granules_needing_dmrpp")
+        self.stats.add_concept_id("needing_dmrpp", granule.concept_id())
+        self.stats.increment_monthly(granule.start_date()[:7], 'needs_dmrpp')
         if granule.s3_bucket_info():
-            with self.lock:
-                skip_cmr_opendap_update = granule.has_opendap_url()
-                if not skip_cmr_opendap_update:
-                    self.dmrpp_update_cmr_opendap += 1
-            if not self.message_limit_reached():
-                with self.lock:
-                    self.dmrpp_messages_sent += 1
+            skip_cmr_opendap_update = granule.has_opendap_url()
+            if not skip_cmr_opendap_update:
+                self.stats.increment("dmrpp_update_cmr_opendap")
+            if actions is not None:
+                actions["dmrpp"] = True
+                actions["skip_cmr_opendap_update"] = skip_cmr_opendap_update
+            elif self.reserve_message("dmrpp_messages_sent"):
                 if self.message_writer:
                     message = self.message_writer.write(granule, needs_footprint=False,
                                                         needs_image=False, needs_dmrpp=True,
                                                         skip_cmr_opendap_update=skip_cmr_opendap_update)
-                    for sender in self.message_senders:
-                        sender.send(message)
+                    self.send_message(message, "dmrpp")
         else:
-            with self.lock:
-                self.dmrpp_that_couldnt_be_processed += 1
+            self.stats.increment("dmrpp_that_couldnt_be_processed")
             raise Exception(
                 f"Could not process dmrpp for granule {granule.native_id()} because of missing S3 "
                 f"bucket info")
 
+    def send_combined_message(self, granule, actions):
+        """Create and send one message for all of a granule's actions, counted once against the
+        message limit and once per action in the per-action message counts."""
+
+        counters = [name for name, action in self.message_counters.items() if actions.get(action)]
+        if self.reserve_message(*counters):
+            if self.message_writer:
+                message = self.message_writer.write(
+                    granule, needs_footprint=actions.get("forge", False),
+                    needs_image=actions.get("tig", False), needs_dmrpp=actions.get("dmrpp", False),
+                    skip_cmr_opendap_update=actions.get("skip_cmr_opendap_update", True))
+                self.send_message(message, *(self.message_counters[name] for name in counters))
+
+    def send_message(self, message, *actions):
+        """Send message to every message sender, through the dispatcher if there is one.
+        Waits first for the --message-rate limits of the message's actions (forge, tig, dmrpp)."""
+
+        if self.rate_limiter and self.message_senders:
+            self.rate_limiter.wait(*actions)
+        if self.dispatcher:
+            self.dispatcher.send(message)
+        else:
+            for sender in self.message_senders:
+                sender.send(message)
+
+    def analysis_throughput(self):
+        """Returns the number of granules analyzed per second since processing started."""
+
+        if self.started is None:
+            return 0.0
+        elapsed = time.monotonic() - self.started
+        return self.stats.get("granules_analyzed") / elapsed if elapsed > 0 else 0.0
+
+    def pruned_granules_message(self):
+        """Returns a log line for the granules that CMR filtered out server-side, or '' if none."""
+
+        pruned = self.search.pruned_granules()
+        if pruned is None:
+            return "Pruned by CMR filter: unknown\n"
+        return f"Pruned by CMR filter: {pruned}\n" if pruned else ""
+
     def log_stats(self):
         """Log info about backfilling process"""
+        stats = {name: self.stats.get(name) for name in BackfillStats.counters}
+        granule_range_start, granule_range_end = self.stats.granule_range()
         self.logger.info(
             "\n==============================================================\n"
             f"Execution id: {self.cli_execution_id}\n"
+            f"Collection: {self.collection}\n"
             f"Matching granules: {self.search.total_matching_granules()}\n"
-            f"Granules analyzed: {self.granules_analyzed}\n"
-            f"  in time range: {self.granule_range_start or '-'} to {self.granule_range_end or '-'}\n\n"
+            f"{self.pruned_granules_message()}"
+            f"Granules analyzed: {stats['granules_analyzed']}\n"
+            f"  in time range: {granule_range_start or '-'} to {granule_range_end or '-'}\n\n"
 
-            f"{self.granules_needing_footprint} granules need footprints\n"
-            f"{self.footprints_that_couldnt_be_processed} footprints couldn't be processed because of missing s3 info\n"
-            f"{self.footprint_messages_sent} footprint messages were sent\n\n"
+            f"{stats['granules_needing_footprint']} granules need footprints\n"
+            f"{stats['footprints_that_couldnt_be_processed']} footprints couldn't be processed because of missing s3 info\n"
+            f"{stats['footprint_messages_sent']} footprint messages were sent\n\n"
 
-            f"{self.granules_needing_image} granules need images\n"
-            f"{self.images_that_couldnt_be_processed} images couldn't be processed because of missing s3 info\n"
-            f"{self.image_messages_sent} image messages were sent\n\n"
+            f"{stats['granules_needing_image']} granules need images\n"
+            f"{stats['images_that_couldnt_be_processed']} images couldn't be processed because of missing s3 info\n"
+            f"{stats['image_messages_sent']} image messages were sent\n\n"
 
-            f"{self.granules_with_footprint_and_bbox} granules with both footprint and bbox\n"
+            f"{stats['granules_with_footprint_and_bbox']} granules with both footprint and bbox\n\n"
+
+            f"Analysis throughput: {self.analysis_throughput():.1f} granules/s\n"
         )
+        if self.combine_messages:
+            self.logger.info(
+                f"{stats['messages_sent']} combined messages were sent, one per granule, "
+                f"carrying the footprint, image and dmrpp messages counted\n"
+            )
+        if self.dispatcher:
+            self.logger.info(
+                f"Dispatch throughput: {self.dispatcher.throughput():.1f} messages/s "
+                f"({self.dispatcher.messages_dispatched} sent, {self.dispatcher.pending()} queued)\n"
+            )
+        if self.rate_limiter:
+            self.logger.info(self.rate_limiter.summary())
         if self.granule_options['dmrpp_processing'] == "on" or self.granule_options['dmrpp_processing'] == "force":
             self.logger.info(
-                f"{self.granules_needing_dmrpp} granules need dmrpp\n"
-                f"{self.dmrpp_that_couldnt_be_processed} dmrpp couldn't be processed because of missing s3 info\n"
-                f"{self.dmrpp_messages_sent} dmrpp messages were sent\n"
+                f"{stats['granules_needing_dmrpp']} granules need dmrpp\n"
+                f"{stats['dmrpp_that_couldnt_be_processed']} dmrpp couldn't be processed because of missing s3 info\n"
+                f"{stats['dmrpp_messages_sent']} dmrpp messages were sent\n"
             )
         if self.granule_options['dmrpp_processing'] == "on":
             self.logger.info(
                 f" dmrpp details:\n"
-                f"  {self.dmrpp_unprocessed} unprocessed\n"
-                f"  {self.dmrpp_newer_version} with newer version\n"
-                f"  {self.dmrpp_missing_version} missing version\n"
-                f"  {self.dmrpp_older_version} with older version\n"
-                f"  {self.dmrpp_update_cmr_opendap} missing cmr opendap url\n"
+                f"  {stats['dmrpp_unprocessed']} unprocessed\n"
+                f"  {stats['dmrpp_newer_version']} with newer version\n"
+                f"  {stats['dmrpp_missing_version']} missing version\n"
+                f"  {stats['dmrpp_older_version']} with older version\n"
+                f"  {stats['dmrpp_update_cmr_opendap']} missing cmr opendap url\n"
             )
         self.logger.info(
             f"-- {self.destination_message} --\n"
@@ -469,25 +789,32 @@ class Backfiller:
         if not self.message_senders:
             print("** NOTE: When in preview mode, the messages sent count may not be accurate since it's only simulating sending messages. ** \n")
 
-        if len(self.concept_ids_needing_image) > 0:
-            self.logger.info(f"Granule IDs needing images (showing first 100):\n"
-                             f" {self.concept_ids_needing_image[:100]}\n"
-                             )
-        if len(self.concept_ids_needing_footprint) > 0:
-            self.logger.info(f"Granule IDs needing footprints (showing first 100):\n"
-                             f" {self.concept_ids_needing_footprint[:100]}\n"
-                             )
-        if len(self.concept_ids_needing_dmrpp) > 0:
-            self.logger.info(f"Granule IDs needing dmrpp (showing first 100):\n"
-                             f" {self.concept_ids_needing_dmrpp[:100]}\n"
-                             )
+        for kind, plural in (("image", "images"), ("footprint", "footprints"), ("dmrpp", "dmrpp")):
+            concept_ids = self.stats.concept_ids(f"needing_{kind}")
+            if len(concept_ids) > 0:
+                self.logger.info(f"Granule IDs needing {plural} (showing first 100):\n"
+                                 f" {concept_ids}\n"
+                                 )
         self.print_monthly_results_table()
 
     def message_limit_reached(self):
         """Returns True if there is a message limit and it has been reached, otherwise False"""
         if self.message_limit is None:
             return False
-        return self.footprint_messages_sent + self.image_messages_sent + self.dmrpp_messages_sent >= self.message_limit
+        return self.messages_reserved >= self.message_limit
+
+    def reserve_message(self, *counters):
+        """Atomically check the message limit and count one message against the limit, and
+        against each of counters.
+        Returns True if the message can be sent, False if the message limit has been reached."""
+        with self.lock:
+            if self.message_limit_reached():
+                return False
+            self.messages_reserved += 1
+        self.stats.increment("messages_sent")
+        for counter in counters:
+            self.stats.increment(counter)
+        return True
 
     def get_forge_tig_configuration(self):
         """Function to get forge tig configuration of a collection"""
@@ -569,11 +896,122 @@ def verify_inputs(args, granule_options, message_writer, backfiller):
             raise Exception(f"There is no DMRPP regex in cumulus collection configuration for {message_writer.collection_name}")
 
 
+def backfill_collections(args, logger):
+    """Backfill every collection of --collections concurrently in this process, up to
+    --collection-workers at a time.
+
+    The collections share one CMR session, S3 reader, set of message senders, dispatcher, rate
+    and adaptive limiters, and one granule worker pool of --workers threads, so that the whole
+    run has one concurrency budget.  Each collection has its own search, message writer and
+    Backfiller (with its own --message-limit), and its own statistics in the final report."""
+
+    # pylint: disable=broad-except,bare-except,too-many-locals,too-many-statements
+
+    collections = collections_from_args(args)
+    if args.granule_list_file or args.checkpoint_dir or args.resume:
+        raise Exception("--granule-list-file, --checkpoint-dir and --resume can't be used with --collections")
+    logger.info(f"Backfilling {len(collections)} collections, {args.collection_workers} at a time")
+
+    granule_detail = GranuleDetailWriter(args.granule_detail_file) if args.granule_detail_file else None
+    limiters = adaptive_limiters(LOOKUP_WORKERS, logger) if args.adaptive_concurrency else {}
+    session = shared_cmr_session_from_args(args, logger)
+    message_senders = message_senders_from_args(args, logger, limiters.get("sns"))
+    dispatcher = message_dispatcher_from_args(args, message_senders, logger)
+    rate_limiter = message_rate_limiter_from_args(args)
+    granule_options = granule_options_from_args(args)
+    s3 = S3Reader(logger, args.aws_profile, limiters.get("s3"))
+    dmrpp_inventory = DmrppInventory(s3, logger) if args.dmrpp_inventory and args.dmrpp == "on" else None
+
+    workers = args.workers or min(32, (os.cpu_count() or 1) + 4)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending_granules = BoundedSemaphore(workers * 2)
+
+    stop = Event()
+    backfillers = {}
+    searches = {}
+
+    def backfill_collection(collection):
+        collection_args = copy.copy(args)
+        collection_args.collection = collection
+        search = searches[collection] = granule_search_from_args(collection_args, logger,
+                                                                 limiters.get("cmr"), session)
+        try:
+            message_writer = message_writer_from_args(collection_args, logger)
+            backfiller = Backfiller(search, message_writer, message_senders, granule_options, logger,
+                                    args.message_limit, args.cli_execution_id, s3, collection, None,
+                                    workers, dispatcher, None, granule_detail, dmrpp_inventory,
+                                    rate_limiter, args.combine_messages, executor, pending_granules,
+                                    stop)
+            backfillers[collection] = backfiller
+            verify_inputs(collection_args, granule_options, message_writer, backfiller)
+            backfiller.process_granules()
+        finally:
+            search.close()
+
+    results = {}
+    collection_executor = ThreadPoolExecutor(max_workers=args.collection_workers)
+    try:
+        futures = {collection: collection_executor.submit(backfill_collection, collection)
+                   for collection in collections}
+        for collection, future in futures.items():
+            try:
+                future.result()
+                results[collection] = "finished"
+            except Exception as exc:
+                logger.error(f"Error backfilling {collection}: {str(exc)}\n")
+                results[collection] = f"failed: {exc}"
+    except:  # noqa: E722 - to catch ctrl-C
+        logger.warning("keyboard interrupt")
+        # stop every collection at its next granule, and drop the work that hasn't started
+        stop.set()
+        collection_executor.shutdown(wait=False, cancel_futures=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+        for search in list(searches.values()):
+            search.close()
+
+    # close things up
+    collection_executor.shutdown(wait=True)
+    executor.shutdown(wait=True)
+    session.close()
+    if dispatcher:
+        dispatcher.close()
+    for message_sender in message_senders:
+        message_sender.close()
+    if granule_detail:
+        granule_detail.close()
+    if granule_options["dmrpp_cache"]:
+        granule_options["dmrpp_cache"].close()
+
+    for backfiller in backfillers.values():
+        backfiller.log_stats()
+    for limiter in limiters.values():
+        logger.info(limiter.summary())
+    logger.info(collection_summary(collections, backfillers, results))
+
+
+def collection_summary(collections, backfillers, results):
+    """Returns the final report line of each collection of a --collections backfill"""
+
+    lines = ["Collection summary:"]
+    for collection in collections:
+        status = results.get(collection, "interrupted")
+        backfiller = backfillers.get(collection)
+        if backfiller is None:
+            lines.append(f"  {collection}: {status}")
+            continue
+        stats = backfiller.stats
+        lines.append(
+            f"  {collection}: {status}, {stats.get('granules_analyzed')} granules analyzed, "
+            f"messages sent: {stats.get('footprint_messages_sent')} footprint, "
+            f"{stats.get('image_messages_sent')} image, {stats.get('dmrpp_messages_sent')} dmrpp")
+    return "\n".join(lines) + "\n"
+
+
 def main(args=None):
     """Main script for backfilling from the cli"""
     # Disable pylint broad-except - So that a user friendly message can be displayed. Only used at top level
     # Disable pylint bare-except - So that after ctrl-C, a final status message can be logged. Only used at top level
-    # pylint: disable=broad-except,bare-except
+    # pylint: disable=broad-except,bare-except,too-many-locals,too-many-branches,too-many-statements
 
     # load args
     args = parse_args(args)
@@ -584,7 +1022,7 @@ def main(args=None):
             print("unknown")
         return
 
-    args.cli_execution_id = str(uuid.uuid4())
+    args.cli_execution_id = args.resume or str(uuid.uuid4())
 
     # setup dependencies
     try:
@@ -594,11 +1032,21 @@ def main(args=None):
                     f"{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
         safe_log_args(logger, args)
-        search = granule_search_from_args(args, logger)
+        if args.collections:
+            backfill_collections(args, logger)
+            logger.info(f"Finished backfill: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S %Z')}")  # pylint: disable=W1203
+            return
+        journal = checkpoint_journal_from_args(args, logger)
+        granule_detail = GranuleDetailWriter(args.granule_detail_file) if args.granule_detail_file else None
+        limiters = adaptive_limiters(LOOKUP_WORKERS, logger) if args.adaptive_concurrency else {}
+        search = granule_search_from_args(args, logger, limiters.get("cmr"))
         message_writer = message_writer_from_args(args, logger)
-        message_senders = message_senders_from_args(args, logger)
+        message_senders = message_senders_from_args(args, logger, limiters.get("sns"))
+        dispatcher = message_dispatcher_from_args(args, message_senders, logger)
+        rate_limiter = message_rate_limiter_from_args(args)
         granule_options = granule_options_from_args(args)
-        s3 = S3Reader(logger, args.aws_profile)
+        s3 = S3Reader(logger, args.aws_profile, limiters.get("s3"))
+        dmrpp_inventory = DmrppInventory(s3, logger) if args.dmrpp_inventory and args.dmrpp == "on" else None
         collection = args.collection
     except Exception as exc:
         logger.error(f"Error: {str(exc)}\n")
@@ -606,7 +1054,9 @@ def main(args=None):
 
     # setup backfiller
     backfiller = Backfiller(search, message_writer, message_senders,
-                            granule_options, logger, args.message_limit, args.cli_execution_id, s3, collection, args.granule_list_file)
+                            granule_options, logger, args.message_limit, args.cli_execution_id, s3, collection, args.granule_list_file,
+                            args.workers, dispatcher, journal, granule_detail, dmrpp_inventory,
+                            rate_limiter, args.combine_messages)
 
     try:
         verify_inputs(args, granule_options, message_writer, backfiller)
@@ -621,12 +1071,25 @@ def main(args=None):
         logger.error(exc)
     except:  # noqa: E722 - to catch ctrl-C
         logger.warning("keyboard interrupt")
+    finally:
+        search.close()
 
     # close things up
+    if dispatcher:
+        dispatcher.close()
     for message_sender in message_senders:
         message_sender.close()
+    if journal:
+        backfiller.save_checkpoint()
+        journal.close()
+    if granule_detail:
+        granule_detail.close()
+    if granule_options["dmrpp_cache"]:
+        granule_options["dmrpp_cache"].close()
 
     backfiller.log_stats()
+    for limiter in limiters.values():
+        logger.info(limiter.summary())
 
     logger.info(f"Finished backfill: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S %Z')}")  # pylint: disable=W1203
 
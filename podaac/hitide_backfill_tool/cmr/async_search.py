@@ -0,0 +1,237 @@
+"""Search for CMR granules with an asyncio httpx client"""
+
+import asyncio
+import logging
+import random
+from threading import Thread
+
+from requests.exceptions import ConnectionError as RequestsConnectionError, HTTPError
+
+from .search import GranuleSearch, _chunks
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  pylint: disable=unused-import
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# responses that are worth retrying
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class AsyncCmrSession:
+    """CMR http client running an httpx.AsyncClient (HTTP/2 if the h2 package is installed, with
+    keep-alive connection pooling) on an event loop in a background thread.
+
+    get() and post() have the signatures of requests.Session's, for the paging and batched
+    lookups done by GranuleSearch.
+    get_all() requests many urls concurrently, up to `concurrency` at a time.  Requests that
+    fail with a transport error, 429 or 5xx are retried with jittered exponential backoff.
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments,too-many-positional-arguments
+
+    def __init__(self, concurrency=20, max_attempts=5, backoff=0.5, logger=logging, transport=None):
+        """Create AsyncCmrSession.  transport replaces the network transport (for tests)."""
+
+        if httpx is None:
+            raise Exception("The async CMR client requires the httpx package")
+
+        self._concurrency = concurrency
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._logger = logger
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, name="cmr-async", daemon=True)
+        self._thread.start()
+        self._semaphore = None
+        self._client = self._run(self._create_client(transport))
+
+    async def _create_client(self, transport):
+        """Create the client and semaphore on the session's event loop"""
+
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        limits = httpx.Limits(max_connections=self._concurrency,
+                              max_keepalive_connections=self._concurrency)
+        return httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, transport=transport,
+                                 timeout=httpx.Timeout(60.0))
+
+    def _run(self, coroutine):
+        """Run coroutine on the session's event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def get(self, url, headers=None, stream=False):
+        """Request url and return a requests-like response.  Raises a requests ConnectionError
+        if the request failed after retries."""
+
+        if stream:
+            raise Exception("The async CMR client doesn't stream responses")
+        return self._result(url, self._run(self._request("GET", url, headers)))
+
+    def post(self, url, data=None, headers=None):
+        """POST form data to url and return a requests-like response.  Raises a requests
+        ConnectionError if the request failed after retries."""
+
+        return self._result(url, self._run(self._request("POST", url, headers, data)))
+
+    @staticmethod
+    def _result(url, result):
+        """Return the response, raising a requests ConnectionError if the request failed"""
+
+        if isinstance(result, Exception):
+            raise RequestsConnectionError(f"{url}: {result}") from result
+        return result
+
+    def get_all(self, urls, headers=None):
+        """Request every url concurrently and return their responses in the same order.  A
+        request that failed after retries gives a requests ConnectionError instead."""
+
+        urls = list(urls)
+        results = self._run(self._get_all(urls, headers))
+        return [
+            RequestsConnectionError(f"{url}: {result}") if isinstance(result, Exception) else result
+            for url, result in zip(urls, results)
+        ]
+
+    async def _get_all(self, urls, headers):
+        """Request urls with `concurrency` worker tasks, so huge lists don't create a task each"""
+
+        results = [None] * len(urls)
+        next_index = iter(range(len(urls)))
+
+        async def worker():
+            for index in next_index:
+                results[index] = await self._request("GET", urls[index], headers)
+
+        await asyncio.gather(*(worker() for _ in range(min(self._concurrency, len(urls)))))
+        return results
+
+    async def _request(self, method, url, headers, data=None):
+        """Request url, retrying transport errors and retryable responses with jittered
+        exponential backoff.  Returns the response, or the exception of the last attempt."""
+
+        for attempt in range(1, self._max_attempts + 1):
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    response = await self._client.request(method, url, headers=headers, data=data)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self._max_attempts:
+                    return _Response(response)
+                retry_after = response.headers.get("Retry-After")
+                problem = f"http_code {response.status_code}"
+            except httpx.TransportError as exc:
+                if attempt == self._max_attempts:
+                    return exc
+                problem = repr(exc)
+
+            delay = self._retry_delay(attempt, retry_after)
+            self._logger.warning(f"CMR request attempt {attempt} failed ({problem}), "
+                                 f"retrying in {delay:.1f}s: {url}")
+            await asyncio.sleep(delay)
+        return None
+
+    def _retry_delay(self, attempt, retry_after=None):
+        """Return seconds to wait before the next attempt: Retry-After if CMR gave one, otherwise
+        a random delay up to the exponential backoff ("full jitter"), so that concurrent
+        requests don't retry in lockstep."""
+
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return random.uniform(0, self._backoff * 2 ** (attempt - 1))
+
+    def close(self):
+        """Close the client's connections and stop the event loop"""
+
+        if not self._thread.is_alive():
+            return
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class _Response:
+    """An httpx response with the requests.Response behavior GranuleSearch relies on"""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.content
+        self.text = response.text
+        self.url = str(response.url)
+
+    def raise_for_status(self):
+        """Raise a requests HTTPError for a 4xx or 5xx response"""
+
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} error for url: {self.url}", response=self)
+
+
+class AsyncGranuleSearch(GranuleSearch):
+    """GranuleSearch that makes its CMR requests with AsyncCmrSession, and looks up the
+    granules of a granule list concurrently on one event loop instead of a thread each."""
+
+    # pylint: disable=too-many-arguments
+
+    def __init__(self, *args, concurrency=20, max_attempts=5, transport=None, session=None,
+                 **kwargs):
+        """Create AsyncGranuleSearch with the GranuleSearch arguments.  concurrency limits the
+        number of requests in flight at once.  session is an optional AsyncCmrSession shared
+        with other searches, which close() leaves open."""
+
+        if kwargs.get("stream_pages"):
+            raise Exception("Streaming CMR pages isn't supported by the async CMR client")
+        super().__init__(*args, **kwargs)
+        # granule list names looked up per event loop call
+        self._lookup_chunk_size = concurrency * 10
+        self._owns_session = session is None
+        self.session = session or AsyncCmrSession(concurrency=concurrency,
+                                                  max_attempts=max_attempts,
+                                                  logger=self._logger, transport=transport)
+
+    def iter_granules_in_list(self, granule_names):
+        """Look up granule_names concurrently on the event loop, a chunk of names at a time so
+        memory use doesn't grow with the length of the list, and yield the umm granule json in
+        list order.  With lookup_batch_size, the batched lookups of GranuleSearch are used."""
+
+        if self._lookup_batch_size:
+            yield from super().iter_granules_in_list(granule_names)
+            return
+
+        # pylint: disable=broad-except
+        self._granules_not_found = []
+        looked_up = 0
+        for names in _chunks(granule_names, self._lookup_chunk_size):
+            urls = [self._granule_lookup_url(granule_name) for granule_name in names]
+            responses = self.session.get_all(urls, headers=self._auth_headers())
+
+            results = []
+            for granule_name, url, response in zip(names, urls, responses):
+                granule = None
+                if isinstance(response, Exception):
+                    self._logger.error(f"Error requesting CMR: {response}")
+                else:
+                    try:
+                        granule = self._granule_from_lookup(granule_name, url, response)
+                    except Exception:
+                        pass
+                results.append((granule_name, granule))
+            looked_up += yield from self._found_granules(results)
+
+        self._log_granules_not_found(looked_up)
+
+    def close(self):
+        """Stop any prefetching, then close the client unless it's shared"""
+
+        super().close()
+        if self._owns_session:
+            self.session.close()
@@ -0,0 +1,121 @@
+"""Convert granules from CMR's atom json (.json) search format to the umm_json shape"""
+
+DATA_REL = "http://esipfed.org/ns/fedsearch/1.1/data#"
+S3_REL = "http://esipfed.org/ns/fedsearch/1.1/s3#"
+BROWSE_REL = "http://esipfed.org/ns/fedsearch/1.1/browse#"
+SERVICE_REL = "http://esipfed.org/ns/fedsearch/1.1/service#"
+METADATA_REL = "http://esipfed.org/ns/fedsearch/1.1/metadata#"
+
+# meta field marking a granule converted from atom json
+RESULT_FORMAT = "result-format"
+
+
+def umm_granule_from_atom(entry):
+    """Return a umm_json granule holding the fields of an atom json granule entry that
+    CmrGranule uses: meta concept-id and native-id, TemporalExtent, RelatedUrls and Geometry.
+
+    The atom format has no per-file sizes (granule_size is a rounded total in MB), so the
+    granule has no DataGranule.  Its meta result-format is "atom", and CmrGranule reads the
+    data file's size from S3 instead.
+    """
+
+    # inherited links are the collection's links, not the granule's
+    related_urls = [_related_url(link) for link in entry.get("links", [])
+                    if not link.get("inherited")]
+
+    umm = {
+        "GranuleUR": entry.get("title"),
+        "TemporalExtent": {
+            "RangeDateTime": {
+                "BeginningDateTime": entry.get("time_start"),
+                "EndingDateTime": entry.get("time_end")
+            }
+        },
+        "RelatedUrls": related_urls,
+        "SpatialExtent": {
+            "HorizontalSpatialDomain": {
+                "Geometry": _geometry(entry)
+            }
+        }
+    }
+
+    return {
+        "meta": {
+            "concept-id": entry.get("id"),
+            "native-id": entry.get("title"),
+            "provider-id": entry.get("data_center"),
+            RESULT_FORMAT: "atom"
+        },
+        "umm": umm
+    }
+
+
+def _related_url(link):
+    """Return the umm RelatedUrls entry for an atom link"""
+
+    href = link.get("href", "")
+    rel = link.get("rel")
+    related_url = {"URL": href}
+
+    if rel in (DATA_REL, S3_REL) and href.startswith("s3://"):
+        related_url["Type"] = "GET DATA VIA DIRECT ACCESS"
+    elif rel in (DATA_REL, S3_REL):
+        related_url["Type"] = "GET DATA"
+    elif rel == BROWSE_REL:
+        related_url["Type"] = "GET RELATED VISUALIZATION"
+    elif rel == SERVICE_REL and "opendap" in href.lower():
+        related_url["Type"] = "USE SERVICE API"
+        related_url["Subtype"] = "OPENDAP DATA"
+    elif rel == METADATA_REL:
+        related_url["Type"] = "EXTENDED METADATA"
+    else:
+        related_url["Type"] = "VIEW RELATED INFORMATION"
+
+    if link.get("title"):
+        related_url["Description"] = link["title"]
+    return related_url
+
+
+def _geometry(entry):
+    """Return the umm Geometry for the atom polygons, lines, boxes and points"""
+
+    geometry = {}
+
+    polygons = [polygon for polygon in entry.get("polygons", []) if polygon]
+    if polygons:
+        # the first ring is the boundary, any others are holes
+        geometry["GPolygons"] = [{"Boundary": {"Points": _points(polygon[0])}}
+                                 for polygon in polygons]
+
+    lines = entry.get("lines", [])
+    if lines:
+        geometry["Lines"] = [{"Points": _points(line)} for line in lines]
+
+    boxes = entry.get("boxes", [])
+    if boxes:
+        geometry["BoundingRectangles"] = [_bounding_rectangle(box) for box in boxes]
+
+    points = entry.get("points", [])
+    if points:
+        geometry["Points"] = _points(" ".join(points))
+
+    return geometry
+
+
+def _points(coordinates):
+    """Return umm Points for an atom string of space separated 'lat lon' pairs"""
+
+    values = [float(value) for value in coordinates.split()]
+    return [{"Latitude": lat, "Longitude": lon} for lat, lon in zip(values[0::2], values[1::2])]
+
+
+def _bounding_rectangle(box):
+    """Return a umm BoundingRectangle for an atom box string 'south west north east'"""
+
+    south, west, north, east = (float(value) for value in box.split())
+    return {
+        "WestBoundingCoordinate": west,
+        "NorthBoundingCoordinate": north,
+        "EastBoundingCoordinate": east,
+        "SouthBoundingCoordinate": south
+    }
@@ -1,7 +1,12 @@
 """Extract information from CMR umm_json formatted granule metadata."""
 from urllib.parse import urlparse
-from podaac.hitide_backfill_tool.dmrpp_utils import get_dmrpp_version, parse_version, DmrppState
+from podaac.hitide_backfill_tool.dmrpp_utils import (get_dmrpp_version, read_dmrpp_version,
+                                                     parse_version, DmrppState)
 from podaac.hitide_backfill_tool.args import default_config
+from podaac.hitide_backfill_tool.cmr.granule_record import GranuleRecord
+
+# marks a lazily computed attribute that hasn't been computed yet
+_NOT_COMPUTED = object()
 
 
 class CmrGranule:
@@ -21,11 +26,15 @@ class CmrGranule:
                  image_processing="on",
                  footprint_processing="on",
                  dmrpp_processing="off",
-                 dmrpp_min_version=parse_version(default_config["dmrpp_min_version"])):
+                 dmrpp_min_version=parse_version(default_config["dmrpp_min_version"]),
+                 dmrpp_cache=None):
         """Create the CmrGranule object from granule and settings."""
         # pylint: disable=C0103
 
         self.umm_granule = umm_granule
+        self.record = GranuleRecord.from_umm(umm_granule)
+        self._s3_bucket_info = _NOT_COMPUTED
+        self._data_file_size = _NOT_COMPUTED
         self.s3 = s3
         self.footprint_geometries = footprint_geometries or ["GPolygons", "Lines"]
         self.can_use_data_url_for_s3_bucket_info = can_use_data_url_for_s3_bucket_info
@@ -33,31 +42,15 @@ class CmrGranule:
         self.footprint_processing = footprint_processing
         self.dmrpp_processing = dmrpp_processing
         self.dmrpp_min_version = dmrpp_min_version
+        self.dmrpp_cache = dmrpp_cache
 
     def has_footprint(self):
         """Returns True if granule has footprint, otherwise False."""
-        try:
-            granule_geometries = self.umm_granule["umm"]["SpatialExtent"]["HorizontalSpatialDomain"]["Geometry"]  # pylint: disable=line-too-long
-            for geometry_name in granule_geometries:
-                geometry = granule_geometries[geometry_name]
-                if geometry_name in self.footprint_geometries and isinstance(geometry, list) and len(geometry) > 0:  # pylint: disable=line-too-long
-                    return True
-        except Exception:
-            pass
-        return False
+        return not self.record.geometries.isdisjoint(self.footprint_geometries)
 
     def has_footprint_and_bbox(self):
         """Returns True if granule has footprint and bounding rectangle, otherwise False."""
-        try:
-            granule_geometries = self.umm_granule["umm"]["SpatialExtent"]["HorizontalSpatialDomain"]["Geometry"]  # pylint: disable=line-too-long
-            if 'BoundingRectangles' in granule_geometries:
-                for geometry_name in granule_geometries:
-                    geometry = granule_geometries[geometry_name]
-                    if geometry_name in self.footprint_geometries and isinstance(geometry, list) and len(geometry) > 0:  # pylint: disable=line-too-long
-                        return True
-        except Exception:
-            pass
-        return False
+        return self.record.has_bounding_rectangles_entry and self.has_footprint()
 
     def needs_footprint(self):
         """Returns True if granule needs to have a footprint generated, otherwise False."""
@@ -67,37 +60,25 @@ class CmrGranule:
     def has_image(self):
         """Returns True if the granule has a thumbnail image link, otherwise False."""
 
-        try:
-            urls = self.umm_granule["umm"]["RelatedUrls"]
-            for url in urls:
-                if url["Type"] == "GET RELATED VISUALIZATION":
-                    return True
-        except Exception:
-            pass
-        return False
+        return self.record.has_image
 
     def has_opendap_url(self):
         """Returns True if the granule has an OpenDAP URL link, otherwise False."""
 
-        try:
-            url = self.opendap_url()
-
-            if url:
-                return True
-        except Exception:
-            pass
-
-        return False
+        return bool(self.record.opendap_url)
 
-    def get_dmrpp_state(self, s3_dmrpp_url):
+    def get_dmrpp_state(self, s3_dmrpp_url, etag=None):
         """Returns DmrppState of the granule's dmrpp file.  It downloads the dmrpp file from the
         S3 bucket and checks the version against the dmrpp_min_version.  Returns one of four
-        different possible states."""
+        different possible states.
+
+        With a dmrpp_cache, the version is looked up by url and the file's ETag (given, or
+        requested with HeadObject) before downloading the file."""
 
         state = DmrppState.MISSING_VERSION
 
         try:
-            dmrpp_version = get_dmrpp_version(self.s3, s3_dmrpp_url)
+            dmrpp_version = self.get_dmrpp_version(s3_dmrpp_url, etag)
 
             if dmrpp_version != "":
                 version = parse_version(dmrpp_version)
@@ -111,6 +92,28 @@ class CmrGranule:
             pass
         return state
 
+    def get_dmrpp_version(self, s3_dmrpp_url, etag=None):
+        """Returns the version string of the granule's dmrpp file, from the dmrpp_cache if
+        possible.  Returns "" (empty string) if the file or version isn't found."""
+
+        if self.dmrpp_cache is None:
+            return get_dmrpp_version(self.s3, s3_dmrpp_url)
+
+        try:
+            etag = etag or self.s3.get_etag(s3_dmrpp_url)
+        except Exception:
+            return ""
+
+        version = self.dmrpp_cache.get(s3_dmrpp_url, etag)
+        if version is None:
+            try:
+                version = read_dmrpp_version(self.s3, s3_dmrpp_url)
+            except Exception:
+                # a failed read (throttling, timeout, permissions) isn't cached, so it's retried
+                return ""
+            self.dmrpp_cache.put(s3_dmrpp_url, etag, version)
+        return version
+
     def needs_image(self):
         """Returns True if the granule needs to have thumbnail images generated, otherwise False."""
 
@@ -129,43 +132,22 @@ class CmrGranule:
     def s3_url(self):
         """Returns a link to the granule in S3 if provided, otherwise returns None."""
 
-        try:
-            urls = self.umm_granule["umm"]["RelatedUrls"]
-            for url in urls:
-                if url["Type"] == "GET DATA VIA DIRECT ACCESS" and "s3://" in url["URL"]:
-                    return url["URL"]
-        except Exception:
-            pass
-        return None
+        return self.record.s3_url
 
     def opendap_url(self):
         """Returns an OpenDAP link to the granule if provided, otherwise returns None."""
 
-        try:
-            urls = self.umm_granule["umm"]["RelatedUrls"]
-            for url in urls:
-                if "Subtype" in url and url["Subtype"] == "OPENDAP DATA" and "opendap" in \
-                        url["URL"]:
-                    return url["URL"]
-        except Exception:
-            pass
-        return None
+        return self.record.opendap_url
 
     def start_date(self):
         """Returns the start_date if provided, otherwise returns None."""
 
-        try:
-            return self.umm_granule["umm"]["TemporalExtent"]["RangeDateTime"]["BeginningDateTime"]
-        except Exception:
-            return None
+        return self.record.start_date
 
     def end_date(self):
         """Returns the end_date if provided, otherwise returns None."""
 
-        try:
-            return self.umm_granule["umm"]["TemporalExtent"]["RangeDateTime"]["EndingDateTime"]
-        except Exception:
-            return None
+        return self.record.end_date
 
     def raw(self):
         """Returns the raw umm_json formatted granule metadata."""
@@ -175,22 +157,28 @@ class CmrGranule:
     def data_url(self):
         """Returns the http link to the granule file if provided, otherwise returns None."""
 
-        try:
-            urls = self.umm_granule["umm"]["RelatedUrls"]
-            for url in urls:
-                if url["Type"] == "GET DATA" and "https://" in url["URL"]:
-                    return url["URL"]
-        except Exception:
-            pass
-        return None
+        return self.record.data_url
 
     def size(self, filename):
-        """Returns the size of the data granule"""
-        umm = self.umm_granule.get('umm', {})
-        data_granule = umm.get('DataGranule', {})
-        files = data_granule.get('ArchiveAndDistributionInformation', [])
-        file = next((file for file in files if file.get('Name') == filename), None)
-        return file.get('SizeInBytes', 0) if file else 0
+        """Returns the size of the data file filename, from the granule's archive information.
+
+        A granule converted from the atom search format has no archive information, so the
+        size of its data file is read from S3 once, or None if it can't be (it's unknown)."""
+        if not self.record.from_atom:
+            return self.record.file_sizes.get(filename, 0)
+        if self._data_file_size is _NOT_COMPUTED:
+            self._data_file_size = self._read_data_file_size()
+        return self._data_file_size
+
+    def _read_data_file_size(self):
+        """Returns the size of the data file in S3 from a HeadObject request, or None"""
+        s3_bucket_info = self.s3_bucket_info()
+        if self.s3 is None or not s3_bucket_info:
+            return None
+        try:
+            return self.s3.get_size(f"s3://{s3_bucket_info['bucket']}/{s3_bucket_info['key']}")
+        except Exception:
+            return None
 
     def s3_bucket_info(self):
         """Returns the S3 bucket name, key, and the filename for the granule.
@@ -206,6 +194,12 @@ class CmrGranule:
         the data url if 'can_use_data_url_for_s3_bucket_info' == True.
         Otherwise returns None.
         """
+        if self._s3_bucket_info is _NOT_COMPUTED:
+            self._s3_bucket_info = self._parse_s3_bucket_info()
+        return self._s3_bucket_info
+
+    def _parse_s3_bucket_info(self):
+        """Returns s3_bucket_info() parsed from the s3 url or data url."""
         try:
             if self.s3_url():
                 # Assume s3 url with structure ->
@@ -0,0 +1,101 @@
+"""Compact record of the umm_json granule fields that backfill uses."""
+
+from podaac.hitide_backfill_tool.cmr.atom_granule import RESULT_FORMAT
+
+
+class GranuleRecord:
+    """Fields derived from a umm_json granule, extracted with a single pass over the
+    RelatedUrls and Geometry of the granule."""
+
+    # Disable broad-except since many types of error indicate the absense
+    #   of data when attempting access (e.g. TypeError, IndexError, KeyError, ...)
+    # pylint: disable=broad-except
+    # pylint: disable=too-many-instance-attributes,too-few-public-methods
+
+    __slots__ = (
+        "start_date",           # RangeDateTime BeginningDateTime, or None
+        "end_date",             # RangeDateTime EndingDateTime, or None
+        "s3_url",               # first direct access s3:// url, or None
+        "data_url",             # first https:// data url, or None
+        "opendap_url",          # first OpenDAP url, or None
+        "has_image",            # True if there's a related visualization url
+        "geometries",           # names of the Geometry entries that are non-empty lists
+        "has_bounding_rectangles_entry",    # True if Geometry has a BoundingRectangles entry
+        "file_sizes",           # ArchiveAndDistributionInformation Name -> SizeInBytes
+        "from_atom",            # True if converted from atom json, which has no file sizes
+    )
+
+    def __init__(self):
+        """Create an empty record.  Use from_umm() to create one from a granule."""
+
+        self.start_date = None
+        self.end_date = None
+        self.s3_url = None
+        self.data_url = None
+        self.opendap_url = None
+        self.has_image = False
+        self.geometries = frozenset()
+        self.has_bounding_rectangles_entry = False
+        self.file_sizes = {}
+        self.from_atom = False
+
+    @classmethod
+    def from_umm(cls, umm_granule):  # pylint: disable=too-many-branches
+        """Returns a GranuleRecord extracted from umm_json granule metadata."""
+
+        record = cls()
+        try:
+            umm = umm_granule.get("umm") or {}
+        except Exception:
+            return record
+
+        try:
+            record.from_atom = (umm_granule.get("meta") or {}).get(RESULT_FORMAT) == "atom"
+        except Exception:
+            pass
+
+        try:
+            range_date_time = umm["TemporalExtent"]["RangeDateTime"]
+            record.start_date = range_date_time.get("BeginningDateTime")
+            record.end_date = range_date_time.get("EndingDateTime")
+        except Exception:
+            pass
+
+        try:
+            for url in umm.get("RelatedUrls") or ():
+                url_type = url.get("Type")
+                href = url.get("URL") or ""
+                if url_type == "GET RELATED VISUALIZATION":
+                    record.has_image = True
+                elif url_type == "GET DATA VIA DIRECT ACCESS":
+                    if record.s3_url is None and "s3://" in href:
+                        record.s3_url = href
+                elif url_type == "GET DATA":
+                    if record.data_url is None and "https://" in href:
+                        record.data_url = href
+                if "Subtype" in url and record.opendap_url is None and \
+                        url["Subtype"] == "OPENDAP DATA" and "opendap" in href:
+                    record.opendap_url = href
+        except Exception:
+            pass
+
+        try:
+            geometries = umm["SpatialExtent"]["HorizontalSpatialDomain"]["Geometry"]
+            record.has_bounding_rectangles_entry = "BoundingRectangles" in geometries
+            record.geometries = frozenset([
+                name for name, geometry in geometries.items()
+                if isinstance(geometry, list) and geometry
+            ])
+        except Exception:
+            pass
+
+        try:
+            files = (umm.get("DataGranule") or {}).get("ArchiveAndDistributionInformation") or []
+            # reversed so that the first entry for a name wins, as in a lookup by name
+            record.file_sizes = {
+                file.get("Name"): file.get("SizeInBytes", 0) for file in reversed(files)
+            }
+        except Exception:
+            pass
+
+        return record
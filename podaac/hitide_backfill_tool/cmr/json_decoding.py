@@ -0,0 +1,89 @@
+"""Decode CMR search responses, using the optional orjson and ijson packages when installed"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# errors raised for an invalid JSON body by decode_json() or stream_search_response()
+JSON_DECODE_ERRORS = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson is not None else ())
+
+
+def decode_json(content):
+    """Return the object decoded from a JSON response body (bytes or str).
+
+    Uses orjson on the raw bytes when it's installed, which avoids first decoding the
+    body into a str.  Raises json.JSONDecodeError (which orjson's error subclasses).
+    """
+
+    if orjson is not None:
+        return orjson.loads(content)  # pylint: disable=no-member
+    return json.loads(content)
+
+
+def can_stream_json():
+    """Return True if the ijson package is available for streaming decoding"""
+    return ijson is not None
+
+
+def stream_search_response(response, items_path="items", convert=None):
+    """Read the top of a streamed CMR search response (requested with stream=True), up to
+    the start of the array at items_path, and return the body's top level values with
+    "items" set to a StreamedItems that parses granules from the response as they are
+    iterated, passing each through convert if given.
+
+    If the body has no such array, the response is read to the end and the returned body
+    has no "items".  Raises ijson.JSONError if the body isn't valid JSON.
+    """
+
+    # the raw stream isn't decompressed unless asked to be
+    response.raw.decode_content = True
+    events = ijson.parse(response.raw, use_float=True)
+
+    body = {}
+    for prefix, event, value in events:
+        if prefix == items_path and event == "start_array":
+            body["items"] = StreamedItems(events, response, items_path, convert)
+            return body
+        if "." not in prefix and event in ("number", "string", "boolean", "null"):
+            body[prefix] = value
+
+    response.close()
+    return body
+
+
+class StreamedItems:
+    """Iterates the granules of one CMR page as they are parsed from the response stream.
+
+    Can be iterated once.  Closes the response when the page has been read.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, events, response, items_path="items", convert=None):
+        """Create StreamedItems from ijson parse events positioned at the start of the items"""
+
+        self._events = events
+        self._response = response
+        self._items_path = items_path
+        self._convert = convert
+        self.count = 0
+        self.last_item = None
+
+    def __iter__(self):
+        try:
+            for item in ijson.items(self._events, f"{self._items_path}.item"):
+                if self._convert is not None:
+                    item = self._convert(item)
+                self.count += 1
+                self.last_item = item
+                yield item
+        finally:
+            self._response.close()
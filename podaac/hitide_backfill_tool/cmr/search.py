@@ -2,16 +2,35 @@
 
 # pylint: disable=line-too-long
 
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 import ast
 import json
 import logging
+import os
 import re
+from queue import Full, Queue
+from threading import Event, Lock, Thread
 from requests import Session
 from requests.exceptions import RequestException
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from ..adaptive_concurrency import THROTTLING_STATUS_CODES
+from .atom_granule import umm_granule_from_atom
 from .cmr_granule import CmrGranule
+from .json_decoding import JSON_DECODE_ERRORS, can_stream_json, decode_json, stream_search_response
+
+# threads looking up the granules of a granule list (ThreadPoolExecutor's default)
+LOOKUP_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# CMR granule search result formats: (search url extension, path of the granule array in the
+# response, function converting a granule to the umm_json shape or None)
+RESULT_FORMATS = {
+    "umm_json": ("umm_json", "items", None),
+    # atom json is several times smaller than umm_json, and has every field backfill uses
+    "atom": ("json", "feed.entry", umm_granule_from_atom),
+}
 
 
 class GranuleSearch:
@@ -32,8 +51,16 @@ class GranuleSearch:
                  logger=logging,
                  cmr_search_after=None,
                  cycles=None,
-                 sort_order="ascending"):
-        """Create GranuleSearch object"""
+                 sort_order="ascending",
+                 prefetch_pages=None,
+                 stream_pages=False,
+                 result_format="umm_json",
+                 browsable=None,
+                 lookup_batch_size=None,
+                 limiter=None,
+                 session=None):
+        """Create GranuleSearch object.  session is an optional requests Session (from
+        cmr_session()) shared with other searches; by default the search has its own."""
 
         self._base_url = base_url
         self._collection_short_name = collection_short_name
@@ -45,43 +72,62 @@ class GranuleSearch:
         self._page_size = page_size
         self._page_limit = page_limit
         self._cmr_search_after = cmr_search_after
+        self._page_search_after = None
         self._granules = []
         self._total_matching_granules = 0
         self._pages_loaded = 0
         self._logger = logger
         self.cycles = cycles
 
-        if sort_order == "descending":
-            self.sort_order = "-start_date"
-        else:
-            self.sort_order = "start_date"
+        # look-ahead page fetching on a background thread (disabled if falsy)
+        self._prefetch_pages = prefetch_pages
+        self._prefetch_queue = None
+        self._prefetch_thread = None
+        self._prefetch_stop = Event()
+
+        # parse granules from the response stream as they're iterated (requires ijson)
+        if stream_pages and not can_stream_json():
+            raise Exception("Streaming CMR pages requires the ijson package")
+        self._stream_pages = stream_pages
+
+        if result_format not in RESULT_FORMATS:
+            raise Exception(f"Unknown CMR result format: {result_format}")
+        self._result_format = result_format
+
+        # server-side filter on whether granules have browse images (None for no filter),
+        # and the number of matching granules without it, requested when first needed
+        self._browsable = browsable
+        self._unfiltered_hits = None
+
+        # granule list entries looked up per CMR search (None for one search per entry), and
+        # the entries that weren't found by batched lookups
+        self._lookup_batch_size = lookup_batch_size
+        self._granules_not_found = []
+
+        # AdaptiveLimiter for the number of concurrent CMR requests, shared by every search
+        self._limiter = limiter
 
         if sort_order == "descending":
             self.sort_order = "-start_date"
         else:
             self.sort_order = "start_date"
 
-        retry = Retry(connect=10, backoff_factor=0.5)
-        adapter = HTTPAdapter(max_retries=retry)
-
-        self.session = Session()
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        self.session = session or cmr_session()
 
     def granule_generator(self):
         """Return iterable that provides all matching granules across multipl pages"""
 
         while not self.is_done():
             self.get_next_page()
-            if len(self.granules()) == 0:
-                return "Problem reading granules"
+            granules_in_page = 0
             for granule in self.granules():
+                granules_in_page += 1
                 yield CmrGranule(granule)
+            if granules_in_page == 0:
+                return "Problem reading granules"
         return "Finished reading granules"
 
     def get_next_page(self):
-        # pylint: disable=too-many-branches
-        # pylint: disable=too-many-statements
         """Retrieve the first or next page of granule search results and
         return True if granules received, False otherwise
         """
@@ -92,8 +138,39 @@ class GranuleSearch:
             self._granules = []
             return False
 
-        url = (f"{self._base_url}/search/granules.umm_json?provider={self._provider}"
-               f"&page_size={self._page_size}&sort_key[]={self.sort_order}")
+        if self._prefetch_pages:
+            page = self._next_prefetched_page()
+        else:
+            page = self._request_page(self._cmr_search_after, self._pages_loaded)
+
+        # Update to latest page received
+        self._page_search_after = page["requested_search_after"]
+        self._cmr_search_after = page["search_after"]
+        self._total_matching_granules = page["hits"]
+        self._granules = page["items"]
+        self._pages_loaded += 1
+
+        granules_in_page = len(self._granules) if isinstance(self._granules, list) else "streamed"
+
+        self._logger.info(
+            f"\nCMR PAGE LOAD # {self.pages_loaded()}:\n"
+            f"url: {page['url']}\n"
+            f"cmr-search-after: {page['requested_search_after']}\n"
+            f"---------\n"
+            f"http_code: {page['status_code']}\n"
+            f"hits: {page['hits']}\n"
+            f"granules in page: {granules_in_page}\n"
+        )
+
+        return bool(self.granules)
+
+    def _page_url(self, page_size=None, server_filters=True):
+        """Return the granule search url (without paging header) for this search"""
+
+        extension = RESULT_FORMATS[self._result_format][0]
+        page_size = self._page_size if page_size is None else page_size
+        url = (f"{self._base_url}/search/granules.{extension}?provider={self._provider}"
+               f"&page_size={page_size}&sort_key[]={self.sort_order}")
         url += f"&short_name={self._collection_short_name}"
         url += _temporal_param(self._start_date, self._end_date)
 
@@ -112,35 +189,68 @@ class GranuleSearch:
 
             url += f"&{cycles_output}"
 
+        if server_filters and self._browsable is not None:
+            url += f"&browsable={str(self._browsable).lower()}"
+
+        return url
+
+    def _session_request(self, method, url, **kwargs):
+        """Make a request with the session, through the adaptive limiter if there is one"""
+
+        request = getattr(self.session, method)
+        if self._limiter is None:
+            return request(url, **kwargs)
+        return self._limiter.call(request, url, throttled_result=_is_throttled_response, **kwargs)
+
+    def _auth_headers(self):
+        """Return the Authorization headers for CMR requests"""
+
         headers = {}
-        if self._cmr_search_after:
-            headers["cmr-search-after"] = self._cmr_search_after
         if self._edl_token:
             headers["Authorization"] = f"Bearer {self._edl_token}"
         elif self._launchpad_token:
             headers["Authorization"] = self._launchpad_token
+        return headers
+
+    def _request_page(self, cmr_search_after, pages_loaded):
+        """Request one page of granule search results starting at cmr_search_after and
+        return a dict describing the page.  Raises an exception if CMR gives an error.
+        """
 
-        if self._pages_loaded == 0:
+        url = self._page_url()
+
+        headers = self._auth_headers()
+        if cmr_search_after:
+            headers["cmr-search-after"] = cmr_search_after
+
+        if pages_loaded == 0:
             print("\nRequesting first CMR page...", end='', flush=True)
         else:
             print("Requesting next CMR page...", end='', flush=True)
 
         body = {}
         try:
-            response = self.session.get(url, headers=headers)
+            response = self._session_request("get", url, headers=headers, stream=self._stream_pages)
             response.raise_for_status()
 
-            body = json.loads(response.text)
+            _, items_path, convert = RESULT_FORMATS[self._result_format]
+            if self._stream_pages:
+                body = stream_search_response(response, items_path, convert)
+            else:
+                body = _page_body(decode_json(response.content), items_path, convert)
+            if body.get("hits") is None and response.headers.get("CMR-Hits") is not None:
+                body["hits"] = int(response.headers["CMR-Hits"])
         except RequestException as exc:
             self._logger.error(f"Error requesting CMR: {exc}")
-        except json.JSONDecodeError as exc:
+        except JSON_DECODE_ERRORS as exc:
             self._logger.error(f"Error decoding CMR JSON response: {exc}")
 
         # Error message if there is a problem
         if response.status_code >= 400 or body.get("hits") is None or body.get("items") is None:
             last_granule_message = "No granules received"
-            if len(self._granules) > 0:
-                last_granule = CmrGranule(self._granules[-1])
+            last_umm_granule = self._last_granule()
+            if last_umm_granule is not None:
+                last_granule = CmrGranule(last_umm_granule)
                 last_granule_message = (f"{last_granule.concept_id()} {last_granule.native_id()}"
                                         f" {last_granule.start_date()} {last_granule.end_date()}")
             self._logger.error(
@@ -155,23 +265,80 @@ class GranuleSearch:
             )
             raise Exception("CMR error")
 
-        # Update to latest page received
-        self._cmr_search_after = response.headers.get("cmr-search-after")
-        self._total_matching_granules = body["hits"]
-        self._granules = body["items"]
-        self._pages_loaded += 1
+        return {
+            "url": url,
+            "requested_search_after": headers.get("cmr-search-after"),
+            "search_after": response.headers.get("cmr-search-after"),
+            "status_code": response.status_code,
+            "hits": body["hits"],
+            "items": body["items"]
+        }
+
+    def _last_granule(self):
+        """Return the last granule received from the most recent page, or None"""
+
+        if isinstance(self._granules, list):
+            return self._granules[-1] if self._granules else None
+        return self._granules.last_item
+
+    #
+    #   Prefetching
+    #
+
+    def _next_prefetched_page(self):
+        """Return the next page from the look-ahead queue, starting the prefetch thread if needed"""
+
+        if self._prefetch_thread is None:
+            self._prefetch_queue = Queue(maxsize=self._prefetch_pages)
+            self._prefetch_stop.clear()
+            self._prefetch_thread = Thread(target=self._prefetch_worker,
+                                           args=(self._cmr_search_after, self._pages_loaded),
+                                           name="cmr-prefetch", daemon=True)
+            self._prefetch_thread.start()
+
+        page = self._prefetch_queue.get()
+        if isinstance(page, Exception):
+            self._prefetch_thread = None
+            raise page
+        return page
+
+    def _prefetch_worker(self, cmr_search_after, pages_loaded):
+        """Background thread that requests pages ahead of the consumer.  Blocks when the
+        look-ahead queue is full, so at most prefetch_pages pages are held in memory.
+        """
 
-        self._logger.info(
-            f"\nCMR PAGE LOAD # {self.pages_loaded()}:\n"
-            f"url: {url}\n"
-            f"cmr-search-after: {headers.get('cmr-search-after')}\n"
-            f"---------\n"
-            f"http_code: {response.status_code}\n"
-            f"hits: {body.get('hits')}\n"
-            f"granules in page: {len(self.granules())}\n"
-        )
+        # pylint: disable=broad-except
+        try:
+            while not self._prefetch_stop.is_set():
+                page = self._request_page(cmr_search_after, pages_loaded)
+                if not self._put_prefetched_page(page):
+                    return
+                pages_loaded += 1
+                cmr_search_after = page["search_after"]
+                if not cmr_search_after or (self._page_limit and pages_loaded >= self._page_limit):
+                    return
+        except Exception as exc:
+            self._put_prefetched_page(exc)
+
+    def _put_prefetched_page(self, page):
+        """Put page on the look-ahead queue, waiting for room.  Returns False if stopped."""
+
+        while not self._prefetch_stop.is_set():
+            try:
+                self._prefetch_queue.put(page, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
 
-        return bool(self.granules)
+    def close(self):
+        """Stop the prefetch thread (if running) and discard any look-ahead pages"""
+
+        if self._prefetch_thread is None:
+            return
+        self._prefetch_stop.set()
+        self._prefetch_thread.join()
+        self._prefetch_thread = None
 
     def is_done(self):
         """Return True if all pages have been retrieved, or if page_limit reached"""
@@ -192,6 +359,34 @@ class GranuleSearch:
 
         return self._total_matching_granules
 
+    def pruned_granules(self):
+        """Return the number of granules that CMR filtered out of the search server-side, which
+        takes one extra (hits only) search the first time.  None if it couldn't be counted.
+        """
+
+        if self._browsable is None:
+            return 0
+
+        if self._unfiltered_hits is None:
+            url = self._page_url(page_size=0, server_filters=False)
+            try:
+                response = self._session_request("get", url, headers=self._auth_headers())
+                response.raise_for_status()
+                self._unfiltered_hits = int(response.headers["CMR-Hits"])
+            except (RequestException, KeyError, ValueError) as exc:
+                self._logger.error(f"Error counting unfiltered CMR granules: {exc}")
+                return None
+
+        return self._unfiltered_hits - self._total_matching_granules
+
+    def page_search_after(self):
+        """Return the cmr-search-after token that was used to request the most recent page"""
+        return self._page_search_after
+
+    def next_search_after(self):
+        """Return the cmr-search-after token that will be used to request the next page"""
+        return self._cmr_search_after
+
     def pages_loaded(self):
         """Return the total number of granule search pages that have been loaded up to this point"""
         return self._pages_loaded
@@ -199,25 +394,36 @@ class GranuleSearch:
     def get_one_granule(self, granule_name):
         """Request a single granule from CMR using granule_name or concept_id"""
 
+        url = self._granule_lookup_url(granule_name)
+        response = None
+        try:
+            response = self._session_request("get", url, headers=self._auth_headers())
+        except RequestException as exc:
+            self._logger.error(f"Error requesting CMR: {exc}")
+        return self._granule_from_lookup(granule_name, url, response)
+
+    def _granule_lookup_url(self, granule_name):
+        """Return the CMR search url for a single granule by granule_name or concept_id"""
+
         url = f"{self._base_url}/search/granules.umm_json?"
 
-        # Regex for granule concept id
-        pattern = r"^G\d{10}-"
-        url += (f"concept_id={granule_name}" if re.match(pattern, granule_name) else
+        url += (f"concept_id={granule_name}" if _is_concept_id(granule_name) else
                 f"provider={self._provider}&short_name={self._collection_short_name}&readable_granule_name={granule_name}")
+        return url
 
-        headers = {}
-        if self._edl_token:
-            headers["Authorization"] = f"Bearer {self._edl_token}"
-        elif self._launchpad_token:
-            headers["Authorization"] = self._launchpad_token
+    def _granule_from_lookup(self, granule_name, url, response):
+        """Return the umm granule from the response to a single granule search, or raise an
+        exception if CMR gave an error or no granule.  response is None if the request failed.
+        """
+
+        if response is None:
+            raise Exception("CMR error")
 
         body = {}
         try:
-            response = self.session.get(url, headers=headers)
             response.raise_for_status()
 
-            body = json.loads(response.text)
+            body = decode_json(response.content)
         except RequestException as exc:
             self._logger.error(f"Error requesting CMR: {exc}")
         except json.JSONDecodeError as exc:
@@ -242,25 +448,356 @@ class GranuleSearch:
     def get_granules_in_list(self, granule_list):
         """Iterate through granule_list, get cmr for each item in parallel, and return a list of umm granule json"""
 
+        return list(self.iter_granules_in_list(granule_list))
+
+    def iter_granules_in_list(self, granule_names):
+        """Look up granule_names (any iterable, read as lookups are needed) in parallel, and
+        yield the umm granule json in list order as results arrive.  Only a few lookups are
+        pending at a time, so memory use doesn't grow with the length of the list.
+
+        With lookup_batch_size, each lookup is one CMR search for a batch of granules,
+        otherwise one search per granule.  Granules that weren't found are logged at the end
+        and available from granules_not_found()."""
+
+        if self._lookup_batch_size:
+            lookups = _chunks(granule_names, self._lookup_batch_size)
+            lookup = self._lookup_batch
+        else:
+            lookups = ([granule_name] for granule_name in granule_names)
+            lookup = self._lookup_one
+
+        self._granules_not_found = []
+        looked_up = 0
+        with ThreadPoolExecutor(max_workers=LOOKUP_WORKERS) as executor:
+            pending = deque()
+            for names in lookups:
+                pending.append(executor.submit(lookup, names))
+                if len(pending) < LOOKUP_WORKERS * 2:
+                    continue
+                looked_up += yield from self._found_granules(pending.popleft().result())
+            while pending:
+                looked_up += yield from self._found_granules(pending.popleft().result())
+
+        self._log_granules_not_found(looked_up)
+
+    def _found_granules(self, results):
+        """Yield the granules found by a lookup, noting the names that weren't found, and
+        return the number of names looked up"""
+
+        for granule_name, granule in results:
+            if granule is None:
+                self._granules_not_found.append(granule_name)
+            else:
+                yield granule
+        return len(results)
+
+    def _log_granules_not_found(self, looked_up):
+        """Log the granules of the list that weren't found, out of looked_up"""
+
+        if self._granules_not_found:
+            self._logger.warning(f"{len(self._granules_not_found)} of {looked_up} granules in the list "
+                                 f"weren't found in CMR: {', '.join(self._granules_not_found)}")
+
+    def granules_not_found(self):
+        """Return the granule list entries that weren't found in CMR by the last lookup"""
+        return self._granules_not_found
+
+    def _lookup_one(self, names):
+        """Look up the single granule in names, returning [(name, umm granule json or None)]"""
+
         # pylint: disable=broad-except
-        def safe_get_granule(granule_name):
-            """Safely get one granule, catching exceptions"""
+        try:
+            return [(names[0], self.get_one_granule(names[0]))]
+        except Exception:
+            return [(names[0], None)]
+
+    def _lookup_batch(self, names):
+        """Look up names with one batched search, returning [(name, umm granule json or None)]"""
+
+        found = self._get_granule_batch(names)
+        return [(name, found.get(name)) for name in names]
+
+    def _get_granule_batch(self, batch):
+        """Search CMR for a batch of concept ids and/or granule URs, and return a dict of the
+        umm granule json found for each.  Concept ids and granule URs are searched separately."""
+
+        concept_ids = [name for name in batch if _is_concept_id(name)]
+        granule_urs = [name for name in batch if not _is_concept_id(name)]
+
+        found = {}
+        if concept_ids:
+            params = [("concept_id[]", concept_id) for concept_id in concept_ids]
+            for granule in self._search_all_pages(params):
+                found[granule["meta"]["concept-id"]] = granule
+        if granule_urs:
+            params = [("provider", self._provider), ("short_name", self._collection_short_name)]
+            params += [("readable_granule_name[]", granule_ur) for granule_ur in granule_urs]
+            wanted = set(granule_urs)
+            for granule in self._search_all_pages(params):
+                for name in (granule.get("umm", {}).get("GranuleUR"), granule["meta"].get("native-id")):
+                    if name in wanted:
+                        found[name] = granule
+        return found
+
+    def _search_all_pages(self, params):
+        """POST a granule search with form params, following cmr-search-after through every
+        page, and return the umm granule json of all pages.  Errors are logged, ending the search
+        with the granules received so far."""
+
+        url = f"{self._base_url}/search/granules.umm_json"
+        params = params + [("page_size", self._page_size)]
+        headers = self._auth_headers()
+
+        granules = []
+        while True:
             try:
-                return self.get_one_granule(granule_name)
-            except Exception:
-                return None
+                response = self._session_request("post", url, data=params, headers=headers)
+                response.raise_for_status()
+                body = decode_json(response.content)
+            except (RequestException, json.JSONDecodeError) as exc:
+                self._logger.error(f"Error requesting CMR: {exc}")
+                return granules
+
+            granules += body.get("items") or []
+            search_after = response.headers.get("cmr-search-after")
+            if not search_after or not body.get("items"):
+                return granules
+            headers = {**headers, "cmr-search-after": search_after}
+
+
+def _page_body(body, items_path, convert):
+    """Return a search response body as {"hits", "items"}, taking the granules from
+    items_path and converting them to umm_json if needed.  "items" is None if missing.
+    """
+
+    items = body
+    for key in items_path.split("."):
+        items = items.get(key) if isinstance(items, dict) else None
+    if items is not None and convert is not None:
+        items = [convert(item) for item in items]
+    return {"hits": body.get("hits"), "items": items}
+
+
+class ShardedGranuleSearch:
+    """Runs several GranuleSearch shards concurrently and merges their pages into one stream.
+
+    Each shard is paired with an accept function, so a granule that matches the CMR query of
+    two neighbouring shards (e.g. one that spans a temporal boundary) is only kept by one.
+    page_limit is the number of CMR pages requested by all the shards together.
+    Provides the paging methods of GranuleSearch that the Backfiller uses.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    _SHARD_DONE = object()
+
+    def __init__(self, shards, max_concurrent_shards=None, logger=logging, queue_size=None,
+                 page_limit=None):
+        """Create ShardedGranuleSearch from a list of (GranuleSearch, accept) tuples"""
+
+        self._shards = shards
+        self._max_concurrent_shards = max_concurrent_shards or len(shards)
+        self._logger = logger
+        self._queue = Queue(maxsize=queue_size or self._max_concurrent_shards)
+        self._stop = Event()
+        self._executor = None
+        self._shards_running = 0
+        self._granules = []
+        self._pages_loaded = 0
+        self._page_limit = page_limit
+        self._pages_requested = 0
+        self._pages_lock = Lock()
+
+    @classmethod
+    def create(cls, shards, logger=logging, prefetch_pages=None, page_limit=None, **search_kwargs):
+        """Create a sharded search from GranuleSearch keyword arguments.
+
+        Splits by cycle if more than one cycle is given, otherwise splits the start_date to
+        end_date range into `shards` equal sub-ranges.  page_limit applies to the whole search,
+        not to each shard."""
+
+        # the shards page without a limit of their own; the sharded search enforces page_limit
+        search_kwargs["page_limit"] = None
 
-        with ThreadPoolExecutor() as executor:
-            granules = list(executor.map(safe_get_granule, granule_list))
+        if search_kwargs.get("cmr_search_after"):
+            raise Exception("--cmr-search-after can't be used with a sharded search")
+
+        cycles = _cycle_list(search_kwargs.get("cycles"))
+        if len(cycles) > 1:
+            parts = [
+                (GranuleSearch(logger=logger, **{**search_kwargs, "cycles": str(cycle)}), _accept_all)
+                for cycle in cycles
+            ]
+        else:
+            if not search_kwargs.get("start_date") or not search_kwargs.get("end_date"):
+                raise Exception("A sharded search needs --start-date and --end-date, or several --cycles")
+            boundaries = _split_temporal_range(search_kwargs["start_date"], search_kwargs["end_date"], shards)
+            parts = []
+            for index, (shard_start, shard_end) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+                search = GranuleSearch(logger=logger, **{
+                    **search_kwargs,
+                    "start_date": _format_date(shard_start),
+                    "end_date": _format_date(shard_end)
+                })
+                parts.append((search, _starts_within(shard_start if index > 0 else None,
+                                                     shard_end if index < shards - 1 else None)))
+
+        return cls(parts, max_concurrent_shards=shards, logger=logger, queue_size=prefetch_pages,
+                   page_limit=page_limit)
+
+    def get_next_page(self):
+        """Wait for the next page from any shard and return True, or False once every shard is done"""
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_concurrent_shards,
+                                                thread_name_prefix="cmr-shard")
+            self._shards_running = len(self._shards)
+            for search, accept in self._shards:
+                self._executor.submit(self._run_shard, search, accept)
+
+        while self._shards_running > 0:
+            item = self._queue.get()
+            if item is self._SHARD_DONE:
+                self._shards_running -= 1
+                continue
+            if isinstance(item, Exception):
+                self.close()
+                raise item
+            self._granules = item
+            self._pages_loaded += 1
+            return True
+
+        self._granules = []
+        return False
+
+    def _run_shard(self, search, accept):
+        """Shard thread: page through one shard's search, putting accepted granules on the queue"""
+
+        # pylint: disable=broad-except
+        try:
+            while not self._stop.is_set() and not search.is_done() and self._reserve_page():
+                search.get_next_page()
+                granules = [granule for granule in search.granules() if accept(granule)]
+                if granules:
+                    self._put(granules)
+        except Exception as exc:
+            self._put(exc)
+        finally:
+            search.close()
+            self._put(self._SHARD_DONE)
+
+    def _reserve_page(self):
+        """Count a page about to be requested by a shard.  Returns False once page_limit pages
+        have been requested."""
+
+        with self._pages_lock:
+            if self._page_limit and self._pages_requested >= self._page_limit:
+                return False
+            self._pages_requested += 1
+            return True
+
+    def _put(self, item):
+        """Put item on the queue, waiting for room unless the search has been stopped"""
+
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except Full:
+                continue
+
+    def is_done(self):
+        """Return True if every shard has finished"""
+
+        return self._executor is not None and self._shards_running == 0
+
+    def granules(self):
+        """Return the most recently received page of granules"""
+        return self._granules
+
+    def total_matching_granules(self):
+        """Return the sum of the shards' matching granule counts.  Granules that span a shard
+        boundary are counted by both shards."""
+
+        return sum(search.total_matching_granules() for search, _ in self._shards)
+
+    def pruned_granules(self):
+        """Return the sum of the shards' server-side pruned granule counts, or None if a shard
+        couldn't count them"""
+
+        pruned = [search.pruned_granules() for search, _ in self._shards]
+        return None if None in pruned else sum(pruned)
+
+    def page_search_after(self):
+        """Sharded pages can't be resumed with a single cmr-search-after token"""
+        return None
+
+    def next_search_after(self):
+        """Sharded pages can't be resumed with a single cmr-search-after token"""
+        return None
+
+    def pages_loaded(self):
+        """Return the total number of pages received from all shards"""
+        return self._pages_loaded
+
+    def get_granules_in_list(self, granule_list):
+        """Granule lists are not sharded; look them up with the first shard"""
+        return self._shards[0][0].get_granules_in_list(granule_list)
+
+    def iter_granules_in_list(self, granule_names):
+        """Granule lists are not sharded; look them up with the first shard"""
+        return self._shards[0][0].iter_granules_in_list(granule_names)
+
+    def close(self):
+        """Stop the shard threads"""
+
+        if self._executor is None:
+            return
+        self._stop.set()
+        self._executor.shutdown(wait=True)
 
-        # Filter out any None values due to exceptions
-        return [granule for granule in granules if granule is not None]
 
 #
 #   Helpers
 #
 
 
+def cmr_session(pool_size=10):
+    """Return a requests Session for CMR, retrying failed connections, keeping up to pool_size
+    connections alive per host"""
+
+    retry = Retry(connect=10, backoff_factor=0.5)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session = Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _chunks(iterable, size):
+    """Yield lists of up to size consecutive items from iterable"""
+
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _is_throttled_response(response):
+    """Return True if CMR responded that it's throttling requests"""
+    return response.status_code in THROTTLING_STATUS_CODES
+
+
+def _is_concept_id(granule_name):
+    """Return True if granule_name is a granule concept id rather than a granule UR"""
+    return re.match(r"^G\d{10}-", granule_name) is not None
+
+
 def _temporal_param(start_date, end_date):
     """Convert start/end dates to formatted temporal url param for granule search"""
     if not start_date and not end_date:
@@ -272,3 +809,51 @@ def _temporal_param(start_date, end_date):
     if end_date:
         param += end_date
     return param
+
+
+def _cycle_list(cycles):
+    """Convert the cycles string (a single cycle or a list of cycles) to a list"""
+    if not cycles:
+        return []
+    cycle_list = ast.literal_eval(cycles)
+    return cycle_list if isinstance(cycle_list, list) else [cycle_list]
+
+
+def _parse_date(date):
+    """Parse an ISO 8601 date string into an aware datetime (UTC if no timezone given)"""
+    parsed = datetime.fromisoformat(date.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _format_date(date):
+    """Format a datetime as a CMR temporal date"""
+    return date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _split_temporal_range(start_date, end_date, shards):
+    """Split the start_date to end_date range into shards sub-ranges, returning the boundaries"""
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    step = (end - start) / shards
+    boundaries = [start + step * index for index in range(shards)] + [end]
+    # CMR temporal dates have second precision
+    return [boundary.replace(microsecond=0) for boundary in boundaries]
+
+
+def _accept_all(_umm_granule):
+    """Accept every granule"""
+    return True
+
+
+def _starts_within(start, end):
+    """Return function that accepts granules whose start date is in [start, end).  Either
+    bound may be None for no bound."""
+
+    def accept(umm_granule):
+        granule_start = CmrGranule(umm_granule).start_date()
+        if granule_start is None:
+            return start is None
+        granule_start = _parse_date(granule_start)
+        return (start is None or granule_start >= start) and (end is None or granule_start < end)
+
+    return accept
@@ -1,7 +1,21 @@
 """Create Cumulus CNM message from granule."""
 
+import copy
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj):
+    """Return obj serialized as a JSON string, with orjson when it's installed"""
+
+    if orjson is not None:
+        return orjson.dumps(obj).decode()  # pylint: disable=no-member
+    return json.dumps(obj)
+
 
 class CnmMessageWriter:
     """Creates a Cumulus CNM message from granule."""
@@ -30,13 +44,14 @@ class CnmMessageWriter:
 
     def create_template(self, message_config, collection_config):
         """Create a message template from message config file and from a
-        cumulus collection config file.
+        cumulus collection config file, and serialize it once for write() to splice the
+        per-granule fields into.
         """
 
         collection_name = collection_config["name"]
 
-        meta = dict(message_config)
-        meta["collection"] = collection_config
+        meta = copy.deepcopy(message_config)
+        meta["collection"] = copy.deepcopy(collection_config)
         meta["collection"]["dataType"] = collection_name
         meta["collection"]["files"].append({
             "bucket": "ia_public",
@@ -51,24 +66,34 @@ class CnmMessageWriter:
             "meta": meta,
         }
 
+        # the template's JSON without its closing brace, ready for the per-granule fields
+        self.template_prefix = _dumps(self.template)[:-1]
+
     def write(self, granule, needs_footprint, needs_image, needs_dmrpp, skip_cmr_opendap_update):
-        """Return a CNM message string given granule information."""
+        """Return a CNM message string given granule information.
+
+        Only the per-granule fields are serialized; they are spliced onto the serialized
+        template, giving the JSON of the template updated with them."""
 
-        message = dict(self.template)
+        message = {}
 
         s3_info = granule.s3_bucket_info()
+        data_file = {
+            "bucket": s3_info["bucket"],
+            "key": s3_info["key"],
+            "fileName": s3_info["filename"],
+            "type": "data",
+        }
+        # an atom granule's size that couldn't be read from S3 is left out rather than guessed
+        size = granule.size(s3_info["filename"])
+        if size is not None:
+            data_file["size"] = size
         message["payload"] = {
             "granules": [{
                 "cmrConceptId": granule.concept_id(),
                 "granuleId": granule.native_id(),
                 "dataType": self.collection_name,
-                "files": [{
-                    "bucket": s3_info["bucket"],
-                    "key": s3_info["key"],
-                    "fileName": s3_info["filename"],
-                    "type": "data",
-                    "size": granule.size(s3_info["filename"])
-                }]
+                "files": [data_file]
             }]
         }
 
@@ -89,4 +114,6 @@ class CnmMessageWriter:
             "username": self.user
         }
 
-        return json.dumps(message)
+        fields = _dumps(message)
+        separator = "," if orjson is not None else ", "
+        return f"{self.template_prefix}{separator}{fields[1:]}"
@@ -3,11 +3,22 @@ This module contains methods for retrieving configurations that
 are used for creating cumulus messages
 """
 
+import json
 import os
+import threading
 from pathlib import Path
 
 from .file_util import load_json_file, make_absolute
 
+# directory (in the cumulus-configurations checkout) holding the collection config index
+INDEX_DIR = ".backfill-index"
+INDEX_FILE = "collection-configs.json"
+INDEX_VERSION = 1
+
+# collection config indexes already loaded by this process, by checkout directory
+_indexes = {}
+_indexes_lock = threading.Lock()
+
 
 def get_message_config(env, config_file=None):
     """Retrieve message config file.
@@ -42,18 +53,119 @@ def get_collection_config(base_dir, collection, env, logger):
     elif "ops" in env:
         env_dir = "ops"
 
-    pattern = f"**/{env_dir}/**/{collection}.json"
-    logger.info(f"collection config: searching {base_dir} for {pattern}")
+    logger.info(f"collection config: searching {base_dir} for {env_dir}/**/{collection}.json")
 
     if not os.path.isdir(base_dir):
         raise Exception(
             f"Tried to find cumulus-configurations directory: {base_dir}. It is not a directory")
 
-    path = Path(base_dir)
-    files = path.glob(pattern)
     try:
-        file = next(files)
+        file = collection_config_index(base_dir, logger).find(collection, env_dir)
         logger.info(f"collection config: found {file}")
         return load_json_file(file)
     except Exception as exc:
         raise Exception("Could not find collection config") from exc
+
+
+def collection_config_index(base_dir, logger):
+    """Return the CollectionConfigIndex of the cumulus-configurations checkout at base_dir,
+    loaded once per process"""
+
+    with _indexes_lock:
+        index = _indexes.get(base_dir)
+        if index is None:
+            index = _indexes[base_dir] = CollectionConfigIndex.load(base_dir, logger)
+        return index
+
+
+class CollectionConfigIndex:
+    """Index of the collection config files (<collection>.json) in a cumulus-configurations
+    checkout, so a config is found without searching the checkout.
+
+    The index is saved in the checkout's .backfill-index directory with the modification time
+    of every directory it covers.  Adding, removing or renaming a file changes its directory's
+    modification time, so a saved index is only used while those times are unchanged.
+    Directories starting with "." (e.g. .git) aren't indexed.
+    """
+
+    def __init__(self, base_dir, configs, directories):
+        """Create CollectionConfigIndex from a dict of collection -> list of relative paths,
+        and a dict of relative directory -> modification time (ns)"""
+
+        self.base_dir = base_dir
+        self.configs = configs
+        self.directories = directories
+
+    @classmethod
+    def load(cls, base_dir, logger):
+        """Return the saved index of base_dir if it's still valid, otherwise index base_dir and
+        save the index (if the checkout can be written to)"""
+
+        index_dir = os.path.join(base_dir, INDEX_DIR)
+        index_path = os.path.join(index_dir, INDEX_FILE)
+        try:
+            with open(index_path, encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved.get("version") == INDEX_VERSION:
+                index = cls(base_dir, saved["configs"], saved["directories"])
+                if index.is_current():
+                    logger.debug(f"collection config: using index {index_path}")
+                    return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+        try:
+            # created first, so the index records the checkout's time after the change
+            os.makedirs(index_dir, exist_ok=True)
+        except OSError:
+            pass
+        index = cls.build(base_dir)
+        try:
+            index.save(index_path)
+            logger.debug(f"collection config: saved index {index_path}")
+        except OSError as exc:
+            logger.debug(f"collection config: couldn't save index {index_path}: {exc}")
+        return index
+
+    @classmethod
+    def build(cls, base_dir):
+        """Return the index of the config files in base_dir"""
+
+        configs = {}
+        directories = {}
+        for directory, subdirectories, files in os.walk(base_dir):
+            subdirectories[:] = sorted(name for name in subdirectories if not name.startswith("."))
+            relative_dir = os.path.relpath(directory, base_dir)
+            directories[relative_dir] = os.stat(directory).st_mtime_ns
+            for name in sorted(files):
+                if name.endswith(".json"):
+                    configs.setdefault(name[:-len(".json")], []).append(
+                        os.path.join(relative_dir, name))
+        return cls(base_dir, configs, directories)
+
+    def is_current(self):
+        """Returns True if no indexed directory has changed since the index was built"""
+
+        try:
+            return all(os.stat(os.path.join(self.base_dir, directory)).st_mtime_ns == mtime
+                       for directory, mtime in self.directories.items())
+        except OSError:
+            return False
+
+    def save(self, path):
+        """Write the index to path, replacing it atomically for concurrent backfill runs"""
+
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump({"version": INDEX_VERSION, "configs": self.configs,
+                       "directories": self.directories}, file)
+        os.replace(temporary_path, path)
+
+    def find(self, collection, env_dir):
+        """Returns the path of the config of collection that is in a directory named env_dir
+        (at any depth), or raises an exception if there is none"""
+
+        for relative_path in self.configs.get(collection, []):
+            if not env_dir or env_dir in Path(relative_path).parts[:-1]:
+                return os.path.join(self.base_dir, relative_path)
+        raise Exception(f"No {collection}.json in a {env_dir} directory of {self.base_dir}")
@@ -1,7 +1,15 @@
 """Static functions to read dmrpp files, parse version from file, and determine dmrpp state."""
 
+import os
+import posixpath
+import sqlite3
+import threading
+import time
 import xml.etree.ElementTree as element_tree
 from enum import Enum
+from urllib.parse import urlparse
+
+from podaac.hitide_backfill_tool.file_util import make_absolute
 
 
 class DmrppState(Enum):
@@ -25,21 +33,184 @@ def parse_version(version_string):
         raise Exception(f"Could not parse version string {version_string}") from exc
 
 
-def get_dmrpp_version(s3, s3_dmrpp_url):
+# Number of bytes read from the start of a dmrpp file to find the version on its root element
+DMRPP_PROBE_BYTES = 8192
+
+
+def get_dmrpp_version(s3, s3_dmrpp_url, probe_bytes=DMRPP_PROBE_BYTES):
     """Returns the version string from the dmrpp file.  If file or version not found,
-    returns "" (empty string)."""
-    # pylint: disable=C0103
+    returns "" (empty string).
 
-    version = ""
+    Only the first probe_bytes of the file are read, unless the root element doesn't end
+    within them, in which case the whole file is read."""
 
     try:
-        xml = s3.read_file_from_s3(s3_dmrpp_url)
-        root = element_tree.fromstring(xml)
-
-        for attr_name, attr_value in root.items():
-            if attr_name.endswith("version"):
-                version = attr_value
-                break
+        return read_dmrpp_version(s3, s3_dmrpp_url, probe_bytes)
     except Exception:                                       # pylint: disable=W0703
+        return ""
+
+
+def read_dmrpp_version(s3, s3_dmrpp_url, probe_bytes=DMRPP_PROBE_BYTES):
+    """Returns the version string from the dmrpp file, or "" (empty string) if its root element
+    has no version attribute.  Raises an exception if the file can't be read or parsed, so
+    that callers can tell a failed read from a file without a version."""
+    # pylint: disable=C0103
+
+    root = _root_element(s3.read_file_head_from_s3(s3_dmrpp_url, probe_bytes))
+    if root is None:
+        root = element_tree.fromstring(s3.read_file_from_s3(s3_dmrpp_url))
+
+    for attr_name, attr_value in root.items():
+        if attr_name.endswith("version"):
+            return attr_value
+    return ""
+
+
+def _root_element(partial_xml):
+    """Returns the root element (with its attributes, but not its children) parsed from the
+    start of an xml document, or None if the root start tag isn't complete."""
+
+    parser = element_tree.XMLPullParser(events=("start",))
+    try:
+        parser.feed(partial_xml)
+        for _, element in parser.read_events():
+            return element
+    except element_tree.ParseError:
         pass
-    return version
+    return None
+
+
+class DmrppInventory:
+    """Inventory of the dmrpp files in S3, built with one paginated listing per S3 directory.
+
+    Granules whose dmrpp file isn't listed can be classified without reading S3 again; only
+    the dmrpp files that exist need their version probed.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, s3, logger):
+        """Create DmrppInventory that lists S3 with an S3Reader"""
+
+        self.s3 = s3
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.listings = {}
+        self.listing_locks = {}
+
+    def lookup(self, s3_dmrpp_url):
+        """Returns (listed, info) for a dmrpp url.  listed is False if the directory couldn't be
+        listed.  Otherwise info is {"size", "etag"} of the dmrpp file, or None if it's missing."""
+
+        parsed = urlparse(s3_dmrpp_url, allow_fragments=False)
+        key = parsed.path.lstrip('/')
+        listing = self._listing(f"s3://{parsed.netloc}/{posixpath.dirname(key)}/")
+        if listing is None:
+            return False, None
+        return True, listing.get(key)
+
+    def _listing(self, s3_prefix):
+        """Returns the dmrpp objects under s3_prefix, listing them on first use"""
+
+        with self.lock:
+            if s3_prefix in self.listings:
+                return self.listings[s3_prefix]
+            listing_lock = self.listing_locks.setdefault(s3_prefix, threading.Lock())
+
+        # only one thread lists a prefix; the others wait for its result
+        with listing_lock:
+            with self.lock:
+                if s3_prefix in self.listings:
+                    return self.listings[s3_prefix]
+            try:
+                listing = self.s3.list_s3_objects(s3_prefix, suffix=".dmrpp")
+                self.logger.info(f"dmrpp inventory: {len(listing)} dmrpp files in {s3_prefix}")
+            except Exception as exc:                        # pylint: disable=W0703
+                self.logger.warning(f"dmrpp inventory: could not list {s3_prefix}: {exc}")
+                listing = None
+            with self.lock:
+                self.listings[s3_prefix] = listing
+            return listing
+
+
+class DmrppVersionCache:
+    """On-disk (SQLite) cache of dmrpp versions keyed by S3 url and ETag.
+
+    A cached version is only used while the dmrpp file's ETag is unchanged.  When the cache
+    holds more than max_entries, the least recently used entries are evicted.
+    """
+
+    # commit after this many new entries, so a crash loses little work
+    commit_interval = 100
+
+    def __init__(self, path, max_entries=1000000):
+        """Open (or create) the cache at path"""
+
+        path = make_absolute(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.uncommitted = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS dmrpp_versions (
+                url TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                version TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS dmrpp_versions_last_used ON dmrpp_versions (last_used);
+        """)
+        self.connection.commit()
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM dmrpp_versions").fetchone()[0]
+
+    def get(self, s3_dmrpp_url, etag):
+        """Returns the cached version for the url and etag, or None if not cached"""
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT version FROM dmrpp_versions WHERE url = ? AND etag = ?",
+                (s3_dmrpp_url, etag)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE dmrpp_versions SET last_used = ? WHERE url = ?",
+                                    (time.time(), s3_dmrpp_url))
+            return row[0]
+
+    def put(self, s3_dmrpp_url, etag, version):
+        """Cache the version of the dmrpp file at url with etag"""
+
+        with self.lock:
+            cursor = self.connection.execute(
+                "UPDATE dmrpp_versions SET etag = ?, version = ?, last_used = ? WHERE url = ?",
+                (etag, version, time.time(), s3_dmrpp_url))
+            if cursor.rowcount == 0:
+                self.connection.execute(
+                    "INSERT INTO dmrpp_versions (url, etag, version, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (s3_dmrpp_url, etag, version, time.time()))
+                self.entries += 1
+            if self.entries > self.max_entries:
+                self._evict()
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_interval:
+                self.connection.commit()
+                self.uncommitted = 0
+
+    def _evict(self):
+        """Delete the least recently used entries, down to 90% of max_entries.
+        Caller holds the lock."""
+
+        excess = self.entries - int(self.max_entries * 0.9)
+        self.connection.execute(
+            "DELETE FROM dmrpp_versions WHERE url IN "
+            "(SELECT url FROM dmrpp_versions ORDER BY last_used LIMIT ?)", (excess,))
+        self.entries -= excess
+
+    def close(self):
+        """Commit and close the cache"""
+
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
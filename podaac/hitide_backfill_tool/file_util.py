@@ -1,5 +1,6 @@
 """Utility functions for working with files"""
 
+import gzip
 import json
 from os import getcwd
 from os.path import expanduser, expandvars, normpath, join, isabs, dirname
@@ -40,3 +41,13 @@ def load_json_file(path, relative_to=None):
     abs_path = make_absolute(path, relative_to)
     with open(abs_path, encoding='utf-8') as stream:
         return json.loads(stream.read())
+
+
+def open_text_file(path):
+    """Open the text file at path for reading, decompressing it if it's gzip compressed"""
+    abs_path = make_absolute(path)
+    with open(abs_path, 'rb') as stream:
+        compressed = stream.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(abs_path, 'rt', encoding='utf-8')
+    return open(abs_path, 'r', encoding='utf-8')  # pylint: disable=consider-using-with
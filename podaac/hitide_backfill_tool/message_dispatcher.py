@@ -0,0 +1,84 @@
+"""Send messages to message senders from a pool of background threads"""
+
+import logging
+import threading
+import time
+from queue import Queue
+
+
+class MessageDispatcher:
+    """Decouples message sending from granule analysis.
+
+    Messages are put on a bounded queue and a pool of sender threads drains the queue into
+    every message sender.  When the queue is full, send() blocks, so analysis threads can't
+    get too far ahead of the senders.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, message_senders, logger=logging, workers=4, queue_size=1000):
+        """Create MessageDispatcher and start its sender threads"""
+
+        self.message_senders = message_senders
+        self.logger = logger
+        self.queue = Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.messages_queued = 0
+        self.messages_dispatched = 0
+        self.send_failures = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+        self.threads = [
+            threading.Thread(target=self._drain, name=f"message-dispatch-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def send(self, message):
+        """Queue message for sending, blocking while the queue is full"""
+
+        self.queue.put(message)
+        with self.lock:
+            self.messages_queued += 1
+
+    def close(self):
+        """Send every queued message, then stop the sender threads"""
+
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.finished is None:
+            self.finished = time.monotonic()
+
+    def pending(self):
+        """Returns the number of messages waiting to be sent"""
+
+        return self.queue.qsize()
+
+    def throughput(self):
+        """Returns the number of messages dispatched per second"""
+
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.messages_dispatched / elapsed if elapsed > 0 else 0.0
+
+    def _drain(self):
+        """Sender thread: send queued messages to every message sender until told to stop"""
+
+        # pylint: disable=broad-except
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            for sender in self.message_senders:
+                try:
+                    sender.send(message)
+                except Exception as exc:
+                    with self.lock:
+                        self.send_failures += 1
+                    self.logger.error(f"Error sending message to {sender.name}: {exc}")
+            with self.lock:
+                self.messages_dispatched += 1
@@ -0,0 +1,70 @@
+"""Monthly granule statistics, kept as counters so memory grows with months, not granules"""
+
+import csv
+import threading
+from collections import Counter
+
+from podaac.hitide_backfill_tool.file_util import make_absolute
+
+
+class MonthlyStats:
+    """Counts of granules, and of granules needing work, per month ("YYYY-MM")"""
+
+    fields = ('granules', 'needs_image', 'needs_footprint', 'both_footprint_and_bbox',
+              'needs_dmrpp')
+
+    def __init__(self):
+        """Create empty MonthlyStats"""
+        self.months = {}
+
+    def increment(self, month, field, amount=1):
+        """Add amount to a month's field.  Not thread-safe; callers hold their own lock."""
+        counts = self.months.get(month)
+        if counts is None:
+            counts = self.months[month] = Counter()
+        counts[field] += amount
+
+    def get(self, month, field):
+        """Returns a month's count for field"""
+        return self.months.get(month, Counter())[field]
+
+    def items(self):
+        """Returns (month, {field: count}) tuples in month order"""
+        return [(month, {field: counts[field] for field in self.fields})
+                for month, counts in sorted(self.months.items())]
+
+    def to_dict(self):
+        """Returns a json serializable copy of the counts"""
+        return dict(self.items())
+
+    def update(self, months):
+        """Add counts from a dict returned by to_dict()"""
+        for month, counts in months.items():
+            for field, amount in counts.items():
+                self.increment(month, field, amount)
+
+
+class GranuleDetailWriter:
+    """Writes one CSV row per analyzed granule, for when per-granule detail is wanted
+    in addition to the monthly counts"""
+
+    columns = ('month', 'concept_id', 'native_id', 'start_date', 'needs_footprint', 'needs_image',
+               'both_footprint_and_bbox', 'needs_dmrpp')
+
+    def __init__(self, filename):
+        """Create GranuleDetailWriter that writes to filename"""
+        self.lock = threading.Lock()
+        # pylint: disable=consider-using-with; need file to stay open for lifetime of object
+        self.file = open(make_absolute(filename), 'w', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.columns)
+        self.writer.writeheader()
+
+    def write(self, record):
+        """Write one granule's record, a dict keyed by columns"""
+        with self.lock:
+            self.writer.writerow(record)
+
+    def close(self):
+        """Release resources"""
+        with self.lock:
+            self.file.close()
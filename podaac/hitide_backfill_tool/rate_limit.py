@@ -0,0 +1,96 @@
+"""Token bucket rate limits on the messages sent for each backfill action"""
+
+import threading
+import time
+
+# message actions, named for the workflow that the message starts
+MESSAGE_ACTIONS = ("forge", "tig", "dmrpp")
+
+
+class TokenBucket:
+    """Allows a sustained `rate` of events per second, with bursts of up to `burst` events.
+
+    Thread safe.  Waiting callers reserve their token before sleeping, so they are served in
+    the order they arrived and the rate holds however many threads share the bucket.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, rate, burst=None):
+        """Create TokenBucket, starting full"""
+
+        if rate <= 0:
+            raise Exception(f"Rate must be positive: {rate}")
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.lock = threading.Lock()
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.waited = 0.0
+
+    def acquire(self):
+        """Take a token, sleeping until one is available"""
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+
+
+class MessageRateLimiter:
+    """A TokenBucket per message action, shared by every thread that sends messages"""
+
+    def __init__(self, rates):
+        """Create MessageRateLimiter from a dict of action -> (rate, burst)"""
+
+        self.buckets = {action: TokenBucket(rate, burst) for action, (rate, burst) in rates.items()}
+
+    def wait(self, *actions):
+        """Wait until a message for actions may be sent.  Actions without a limit don't wait."""
+
+        for action in actions:
+            bucket = self.buckets.get(action)
+            if bucket:
+                bucket.acquire()
+
+    def summary(self):
+        """Returns a line per limited action with its rate, burst and time spent waiting"""
+
+        return "".join(
+            f"{action} messages limited to {bucket.rate:g}/s (burst {bucket.burst:g}), "
+            f"waited {bucket.waited:.1f}s\n"
+            for action, bucket in self.buckets.items()
+        )
+
+
+def parse_message_rates(values):
+    """Returns a dict of action -> (rate, burst) from --message-rate values.
+
+    values is a list of "ACTION=RATE[:BURST]" strings, or (from the yaml config) a dict of
+    ACTION: "RATE[:BURST]" (or a number).  Raises an exception for an invalid value."""
+
+    if isinstance(values, dict):
+        values = [f"{action}={rate}" for action, rate in values.items()]
+
+    rates = {}
+    for value in values or []:
+        action, _, rate = str(value).partition("=")
+        action = action.strip()
+        if action not in MESSAGE_ACTIONS:
+            raise Exception(f"Invalid message rate '{value}': action must be one of "
+                            f"{', '.join(MESSAGE_ACTIONS)}")
+        try:
+            rate, _, burst = rate.partition(":")
+            rates[action] = (float(rate), float(burst) if burst else None)
+        except ValueError as exc:
+            raise Exception(
+                f"Invalid message rate '{value}': expected ACTION=RATE[:BURST]") from exc
+        if rates[action][0] <= 0 or (rates[action][1] is not None and rates[action][1] < 1):
+            raise Exception(f"Invalid message rate '{value}': rate must be positive and burst "
+                            f"at least 1")
+    return rates
@@ -8,39 +8,138 @@ regression.py
 Test TIG on all our collections.
 """
 import argparse
+import csv
+import hashlib
+import json
 import os
+import re
 import subprocess
-import json
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import requests
 
+CONFIG_FILES_URL = "https://api.github.com/repos/podaac/forge-tig-configuration/contents/config-files"
+
+# statistics parsed from the output of a backfill run; the last value logged is the final one
+OUTPUT_COUNTS = {
+    "matching_granules": re.compile(r"^Matching granules: (\d+)", re.MULTILINE),
+    "granules_analyzed": re.compile(r"^Granules analyzed: (\d+)", re.MULTILINE),
+    "footprint_messages_sent": re.compile(r"^(\d+) footprint messages were sent", re.MULTILINE),
+    "image_messages_sent": re.compile(r"^(\d+) image messages were sent", re.MULTILINE),
+}
+OUTPUT_ERROR = re.compile(r"^Error.*$", re.MULTILINE)
+
+SUMMARY_FIELDS = ["collection", "status", "seconds", "matching_granules", "granules_analyzed",
+                  "footprint_messages_sent", "image_messages_sent", "error"]
+
 
 def make_cli_call(command):
-    """Function to make cli calls"""
+    """Function to make cli calls.  command is a list of arguments."""
     try:
-        output = subprocess.check_output(command, shell=True, stderr=subprocess.STDOUT)
+        output = subprocess.check_output(command, stderr=subprocess.STDOUT)
         return output.decode("utf-8")  # Decoding the output bytes to string
     except subprocess.CalledProcessError as e:
         return e.output.decode("utf-8")  # Decoding the error output bytes to string
 
 
-def download_configs(config_dir):
-    """Function to download all the forge tig configs from github"""
+def git_blob_sha(path):
+    """Returns the git blob SHA-1 of a file, which is the sha GitHub lists for it"""
+    content = Path(path).read_bytes()
+    return hashlib.sha1(b"blob %d\0" % len(content) + content, usedforsecurity=False).hexdigest()
+
+
+def download_configs(config_dir, workers=8):
+    """Function to download all the forge tig configs from github.
+
+    Configs already in config_dir with the sha listed by GitHub aren't downloaded again, the
+    others are downloaded concurrently, and configs no longer listed are removed.  If the
+    listing can't be read, the configs already downloaded are used."""
     os.makedirs(config_dir, exist_ok=True)
 
     print("..... downloading configuration files")
-    api_url = "https://api.github.com/repos/podaac/forge-tig-configuration/contents/config-files"
-    response = requests.get(api_url, timeout=60)
-
-    if response.status_code == 200:
-        for file in response.json():
-            url = file.get('download_url')
-            config_file = requests.get(url, timeout=60)
-            local_filename = file.get('name')
-            local_path = os.path.join(config_dir, local_filename)
-            with open(local_path, 'wb') as file:
-                file.write(config_file.content)
+    try:
+        response = requests.get(CONFIG_FILES_URL, timeout=60)
+        response.raise_for_status()
+        listing = [file for file in response.json() if file.get("type", "file") == "file"]
+    except (requests.RequestException, ValueError) as exc:
+        print(f"..... couldn't list configuration files ({exc}), using the cached files")
+        return
+
+    def is_cached(file):
+        local_path = os.path.join(config_dir, file.get('name'))
+        return os.path.exists(local_path) and git_blob_sha(local_path) == file.get('sha')
+
+    def download(file):
+        config_file = requests.get(file.get('download_url'), timeout=60)
+        config_file.raise_for_status()
+        local_path = os.path.join(config_dir, file.get('name'))
+        with open(local_path, 'wb') as open_file:
+            open_file.write(config_file.content)
+
+    stale = [file for file in listing if not is_cached(file)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for file, future in [(file, executor.submit(download, file)) for file in stale]:
+            try:
+                future.result()
+            except requests.RequestException as exc:
+                print(f"..... couldn't download {file.get('name')}: {exc}")
+
+    listed = {file.get('name') for file in listing}
+    for path in Path(config_dir).glob("*.cfg"):
+        if path.name not in listed:
+            path.unlink()
+    print(f"..... {len(stale)} of {len(listing)} configuration files downloaded")
+
+
+def parse_output(output):
+    """Returns the granule counts and the first error in the output of a backfill run"""
+    result = {}
+    for name, pattern in OUTPUT_COUNTS.items():
+        values = pattern.findall(output)
+        result[name] = int(values[-1]) if values else None
+    error = OUTPUT_ERROR.search(output)
+    result["error"] = error.group(0).strip() if error else ""
+    return result
+
+
+def run_collection(collection, backfill_config, additional_arguments):
+    """Run a backfill of collection, and return its output and summary row.  A backfill that
+    can't be started (e.g. backfill isn't on the PATH) is reported as failed."""
+    command = ["backfill", "--config", backfill_config, "--collection", collection]
+    command += additional_arguments.split() if additional_arguments else []
+
+    started = time.monotonic()
+    try:
+        output = make_cli_call(command)
+    except OSError as exc:
+        output = f"Error running {command[0]} for {collection}: {exc}"
+    result = {"collection": collection, "seconds": round(time.monotonic() - started, 1),
+              **parse_output(output)}
+    result["status"] = "failed" if result["error"] or result["granules_analyzed"] is None else "passed"
+    return output, result
+
+
+def write_summary(results, json_path=None, csv_path=None):
+    """Write the summary rows to a JSON and/or CSV file, and print a table of them"""
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if csv_path:
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+
+    print(f"{'collection':<50} {'status':<7} {'seconds':>8} {'analyzed':>9} {'footprint':>9} {'image':>6}")
+    for result in results:
+        counts = [result[name] if result[name] is not None else "-" for name in
+                  ("granules_analyzed", "footprint_messages_sent", "image_messages_sent")]
+        print(f"{result['collection']:<50} {result['status']:<7} {result['seconds']:>8} "
+              f"{counts[0]:>9} {counts[1]:>9} {counts[2]:>6}")
+    failed = [result for result in results if result["status"] != "passed"]
+    print(f"{len(results) - len(failed)} passed, {len(failed)} failed")
 
 
 def main():
@@ -48,6 +147,9 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--backfill_config', type=str, required=True, help="Path to backfill config")
     parser.add_argument('--type', type=str, choices=['forge', 'tig', 'forge-py'], help="Regression type")
+    parser.add_argument('--parallelism', type=int, default=4, help="Number of collections backfilled at the same time")
+    parser.add_argument('--summary-json', type=str, help="Write the per-collection results to this JSON file")
+    parser.add_argument('--summary-csv', type=str, help="Write the per-collection results to this CSV file")
 
     args = parser.parse_args()
 
@@ -81,14 +183,18 @@ def main():
     }
 
     additional_arguments, regression_files_list = regression_args.get(args.type, (None, [f.name for f in files]))
-
-    for file_name in regression_files_list:
-        collection = Path(file_name).stem  # Removes the .cfg extension
-        cli_command = f'backfill --config {args.backfill_config} --collection {collection} '
-        if additional_arguments:
-            cli_command += additional_arguments
-        result = make_cli_call(cli_command)
-        print(result)
+    collections = [Path(file_name).stem for file_name in regression_files_list]  # Removes the .cfg extension
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=args.parallelism) as executor:
+        futures = [executor.submit(run_collection, collection, args.backfill_config, additional_arguments)
+                   for collection in collections]
+        for future in as_completed(futures):
+            output, result = future.result()
+            print(output)
+            results[result["collection"]] = result
+
+    write_summary([results[collection] for collection in collections], args.summary_json, args.summary_csv)
 
 
 if __name__ == "__main__":
@@ -10,8 +10,8 @@ import boto3
 class S3Reader:
     """Read files from S3"""
 
-    def __init__(self, logger, aws_profile):
-        """Create S3Reader"""
+    def __init__(self, logger, aws_profile, limiter=None):
+        """Create S3Reader.  limiter is an optional AdaptiveLimiter for concurrent S3 requests."""
         logger.info("Checking S3 settings")
         config = Config(max_pool_connections=multiprocessing.cpu_count() * 4)
         if aws_profile:
@@ -21,6 +21,7 @@ class S3Reader:
             self.client = boto3.client('s3', config=config)
 
         self.logger = logger
+        self.limiter = limiter
 
         # check access to s3
         try:
@@ -29,6 +30,17 @@ class S3Reader:
         except ClientError as exc:
             raise Exception("S3Reader couldn't connect to S3") from exc
 
+    def _call(self, function, **kwargs):
+        """Call function, through the adaptive limiter if there is one"""
+
+        if self.limiter is None:
+            return function(**kwargs)
+        return self.limiter.call(function, **kwargs)
+
+    def _read_object(self, **kwargs):
+        """Returns the bytes of a GetObject request"""
+        return self.client.get_object(**kwargs)["Body"].read()
+
     def extract_bucket_and_file(self, s3_path):
         """Returns bucket_name and key from s3 path."""
 
@@ -40,12 +52,42 @@ class S3Reader:
 
         try:
             bucket_name, file_name = self.extract_bucket_and_file(s3_path)
-            response = self.client.get_object(Bucket=bucket_name, Key=file_name)
+            content = self._call(self._read_object, Bucket=bucket_name, Key=file_name)
 
-            return response["Body"].read().decode("ISO-8859-1")
+            return content.decode("ISO-8859-1")
         except ClientError as exc:
             raise Exception(f"S3Reader could not read file at {s3_path}.") from exc
 
+    def read_file_head_from_s3(self, s3_path, num_bytes):
+        """Returns the first num_bytes of the file at S3 path, using a ranged GET.  Assumes
+        contents are in ISO-8859-1 encoding."""
+
+        try:
+            bucket_name, file_name = self.extract_bucket_and_file(s3_path)
+            return self._call(self._read_object, Bucket=bucket_name, Key=file_name,
+                              Range=f"bytes=0-{num_bytes - 1}").decode("ISO-8859-1")
+        except ClientError as exc:
+            raise Exception(f"S3Reader could not read file at {s3_path}.") from exc
+
+    def get_etag(self, s3_path):
+        """Returns the ETag of the file at S3 path, using a HeadObject request."""
+
+        try:
+            bucket_name, file_name = self.extract_bucket_and_file(s3_path)
+            return self._call(self.client.head_object, Bucket=bucket_name, Key=file_name)["ETag"]
+        except ClientError as exc:
+            raise Exception(f"S3Reader could not find file at {s3_path}.") from exc
+
+    def get_size(self, s3_path):
+        """Returns the size in bytes of the file at S3 path, using a HeadObject request."""
+
+        try:
+            bucket_name, file_name = self.extract_bucket_and_file(s3_path)
+            response = self._call(self.client.head_object, Bucket=bucket_name, Key=file_name)
+            return response["ContentLength"]
+        except ClientError as exc:
+            raise Exception(f"S3Reader could not find file at {s3_path}.") from exc
+
     def list_s3_keys(self, s3_path):
         """
         List all keys in a s3 bucket from input s3_path
@@ -53,11 +95,23 @@ class S3Reader:
         :return: List of file keys in the specified directory.
         """
 
-        bucket_name, prefix = self.extract_bucket_and_file(s3_path)
+        return list(self.list_s3_objects(s3_path))
+
+    def list_s3_objects(self, s3_path, suffix=None):
+        """
+        List all objects under input s3_path, across every page of results
 
-        response = self.client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+        :return: Dict of key -> {"size": SizeInBytes, "etag": ETag}, optionally only for keys
+                 ending with suffix.
+        """
+
+        bucket_name, prefix = self.extract_bucket_and_file(s3_path)
 
-        if "Contents" in response:
-            return [obj["Key"] for obj in response["Contents"]]
+        objects = {}
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if suffix is None or obj["Key"].endswith(suffix):
+                    objects[obj["Key"]] = {"size": obj["Size"], "etag": obj["ETag"]}
 
-        return []
+        return objects
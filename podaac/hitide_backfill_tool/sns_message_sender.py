@@ -3,20 +3,36 @@
 import sys
 import logging
 import multiprocessing
+import threading
+import time
 from botocore.client import Config
 from botocore.exceptions import ClientError
 import boto3
 
+from podaac.hitide_backfill_tool.adaptive_concurrency import THROTTLING_ERROR_CODES
 from podaac.hitide_backfill_tool.file_util import make_absolute
 
 
 class SnsMessageSender:
     """Send messages to SNS"""
 
+    # pylint: disable=too-many-instance-attributes,too-many-arguments,too-many-positional-arguments
+
     name = "sns"
 
-    def __init__(self, topic_arn, logger, aws_profile):
-        """Create SnsMessageSender"""
+    # SNS PublishBatch limits
+    max_batch_size = 10
+    max_batch_bytes = 256 * 1024
+
+    def __init__(self, topic_arn, logger, aws_profile, batch=False, flush_interval=1.0,
+                 max_attempts=3, limiter=None):
+        """Create SnsMessageSender.
+
+        When batch is True, messages are buffered and published with PublishBatch in groups of
+        up to 10, flushed when the group is full or when the oldest buffered message is
+        flush_interval seconds old.  Failed entries are retried up to max_attempts times.
+        limiter is an optional AdaptiveLimiter for concurrent publishes.
+        """
         logger.info("Checking SNS settings")
         config = Config(max_pool_connections=multiprocessing.cpu_count() * 4)
         if aws_profile:
@@ -39,25 +55,155 @@ class SnsMessageSender:
         self.topic_arn = topic_arn
         self.logger = logger
         self.messages_sent = 0
+        self.limiter = limiter
+
+        # batching
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.buffer_started = None
+        self.closed = threading.Event()
+        self.flush_thread = None
+        if self.batch:
+            self.flush_thread = threading.Thread(target=self._flush_periodically,
+                                                 name="sns-flush", daemon=True)
+            self.flush_thread.start()
 
     def send(self, message):
         """Send message to SNS topic"""
+        if self.batch:
+            self._buffer(message)
+            return
+
         try:
-            self.client.publish(
+            self._call(
+                self.client.publish,
                 TopicArn=self.topic_arn,
                 Message=message
             )
-            self.messages_sent += 1
+            with self.lock:
+                self.messages_sent += 1
         except ClientError as exc:
-            self.logger.error(f"""
+            self._log_failure(exc, message)
+
+    def flush(self):
+        """Publish any buffered messages"""
+        with self.lock:
+            messages = self._take_buffer()
+        if messages:
+            self._publish_batch(messages)
+
+    def close(self):
+        """Release resources, publishing any buffered messages"""
+        self.closed.set()
+        if self.flush_thread:
+            self.flush_thread.join()
+            self.flush_thread = None
+        self.flush()
+
+    def _buffer(self, message):
+        """Add message to the buffer, publishing the buffer when it is full"""
+        full_batches = []
+        message_bytes = len(message.encode("utf-8"))
+        with self.lock:
+            if self.buffer and self.buffer_bytes + message_bytes > self.max_batch_bytes:
+                full_batches.append(self._take_buffer())
+            if not self.buffer:
+                self.buffer_started = time.monotonic()
+            self.buffer.append(message)
+            self.buffer_bytes += message_bytes
+            if len(self.buffer) >= self.max_batch_size:
+                full_batches.append(self._take_buffer())
+        for messages in full_batches:
+            self._publish_batch(messages)
+
+    def _take_buffer(self):
+        """Empty the buffer and return its messages.  Caller must hold the lock."""
+        messages = self.buffer
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.buffer_started = None
+        return messages
+
+    def _flush_periodically(self):
+        """Background thread that publishes buffered messages once they are flush_interval old.
+        Messages that fail with an unexpected error are logged, and the thread keeps running."""
+        while not self.closed.wait(self.flush_interval / 2):
+            with self.lock:
+                messages = []
+                if self.buffer_started is not None and \
+                        time.monotonic() - self.buffer_started >= self.flush_interval:
+                    messages = self._take_buffer()
+            if messages:
+                try:
+                    self._publish_batch(messages)
+                except Exception as exc:  # pylint: disable=broad-except
+                    for message in messages:
+                        self._log_failure(exc, message)
+
+    def _publish_batch(self, messages):
+        """Publish messages with PublishBatch, retrying entries that failed on the SNS side"""
+        entries = {str(index): message for index, message in enumerate(messages)}
+        error = None
+
+        for attempt in range(self.max_attempts):
+            if attempt > 0:
+                time.sleep(0.2 * 2 ** attempt)
+            try:
+                response = self._call(
+                    self.client.publish_batch,
+                    TopicArn=self.topic_arn,
+                    PublishBatchRequestEntries=[
+                        {"Id": entry_id, "Message": message}
+                        for entry_id, message in entries.items()
+                    ]
+                )
+            except ClientError as exc:
+                error = exc
+                continue
+
+            with self.lock:
+                self.messages_sent += len(response.get("Successful", []))
+
+            retry_entries = {}
+            for failure in response.get("Failed", []):
+                message = entries[failure["Id"]]
+                error = f"{failure.get('Code')}: {failure.get('Message')}"
+                if failure.get("SenderFault"):
+                    self._log_failure(error, message)
+                else:
+                    retry_entries[failure["Id"]] = message
+            entries = retry_entries
+            if not entries:
+                return
+
+        for message in entries.values():
+            self._log_failure(error, message)
+
+    def _call(self, function, **kwargs):
+        """Call an SNS client function, through the adaptive limiter if there is one"""
+
+        if self.limiter is None:
+            return function(**kwargs)
+        return self.limiter.call(function, throttled_result=_has_throttled_entries, **kwargs)
+
+    def _log_failure(self, error, message):
+        """Log a message that could not be sent"""
+        self.logger.error(f"""
       SNS Message Sender Failure
-      {exc}
+      {error}
       -------------
       {message}
       """)
 
-    def close(self):
-        """Release resources"""
+
+def _has_throttled_entries(response):
+    """Returns True if any entry of a PublishBatch response failed because of throttling"""
+    return any(failure.get("Code") in THROTTLING_ERROR_CODES
+               for failure in response.get("Failed", []))
 
 
 class FileMessageSender:
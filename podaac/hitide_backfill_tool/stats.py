@@ -0,0 +1,126 @@
+"""Statistics for a backfill run, counted per thread so the granule hot path takes no shared lock"""
+
+import threading
+
+from podaac.hitide_backfill_tool.monthly_stats import MonthlyStats
+
+
+class _ThreadStats:
+    """Counters owned, and only written, by one thread"""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, counters):
+        # all keys exist up front so readers never see the dict change size
+        self.counters = dict.fromkeys(counters, 0)
+        self.monthly = MonthlyStats()
+        self.concept_ids = {}
+        self.range_start = None
+        self.range_end = None
+
+
+class BackfillStats:
+    """Counters of a backfill run.
+
+    Each thread increments its own counters; reads merge the counters of every thread.
+    Reads are only exact once the threads that increment have finished, which is how
+    log_stats and the monthly table use them (at the end of a page or of the run).
+    """
+
+    counters = (
+        "granules_analyzed",
+        "footprints_that_couldnt_be_processed", "images_that_couldnt_be_processed",
+        "dmrpp_that_couldnt_be_processed", "granules_needing_footprint", "granules_needing_image",
+        "granules_needing_dmrpp", "granules_with_footprint_and_bbox", "footprint_messages_sent",
+        "image_messages_sent", "dmrpp_messages_sent", "dmrpp_unprocessed", "dmrpp_missing_version",
+        "dmrpp_update_cmr_opendap", "dmrpp_older_version", "dmrpp_newer_version", "messages_sent"
+    )
+
+    # number of concept ids kept per list (per thread), for logging
+    concept_id_limit = 100
+
+    def __init__(self):
+        """Create BackfillStats with every counter at 0"""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _mine(self):
+        """Returns the calling thread's counters, creating them on first use"""
+        mine = getattr(self._local, "stats", None)
+        if mine is None:
+            mine = _ThreadStats(self.counters)
+            with self._lock:
+                self._threads.append(mine)
+            self._local.stats = mine
+        return mine
+
+    def _all(self):
+        """Returns the counters of every thread"""
+        with self._lock:
+            return list(self._threads)
+
+    def increment(self, name, amount=1):
+        """Add amount to counter name"""
+        self._mine().counters[name] += amount
+
+    def increment_monthly(self, month, field, amount=1):
+        """Add amount to a month's field in the monthly statistics"""
+        self._mine().monthly.increment(month, field, amount)
+
+    def add_concept_id(self, name, concept_id):
+        """Remember concept_id in list name (e.g. "needing_image"), up to concept_id_limit"""
+        concept_ids = self._mine().concept_ids.setdefault(name, [])
+        if len(concept_ids) < self.concept_id_limit:
+            concept_ids.append(concept_id)
+
+    def add_granule_range(self, start_date, end_date):
+        """Widen the range of granule dates analyzed to include start_date to end_date"""
+        mine = self._mine()
+        if start_date and (mine.range_start is None or start_date < mine.range_start):
+            mine.range_start = start_date
+        if end_date and (mine.range_end is None or end_date > mine.range_end):
+            mine.range_end = end_date
+
+    def get(self, name):
+        """Returns the total of counter name across threads"""
+        return sum(stats.counters[name] for stats in self._all())
+
+    def monthly(self):
+        """Returns MonthlyStats merged across threads"""
+        merged = MonthlyStats()
+        for stats in self._all():
+            months = dict(stats.monthly.months)
+            merged.update({month: dict(counts) for month, counts in months.items()})
+        return merged
+
+    def concept_ids(self, name):
+        """Returns up to concept_id_limit concept ids remembered in list name"""
+        concept_ids = []
+        for stats in self._all():
+            concept_ids += stats.concept_ids.get(name, [])
+        return concept_ids[:self.concept_id_limit]
+
+    def granule_range(self):
+        """Returns (earliest start date, latest end date) of the granules analyzed"""
+        starts = [stats.range_start for stats in self._all() if stats.range_start]
+        ends = [stats.range_end for stats in self._all() if stats.range_end]
+        return (min(starts) if starts else None), (max(ends) if ends else None)
+
+    def snapshot(self):
+        """Returns a json serializable copy of the statistics, e.g. for a checkpoint"""
+        range_start, range_end = self.granule_range()
+        return {
+            "counters": {name: self.get(name) for name in self.counters},
+            "monthly": self.monthly().to_dict(),
+            "granule_range": [range_start, range_end],
+        }
+
+    def restore(self, snapshot):
+        """Add the statistics from a snapshot() to the calling thread's counters"""
+        for name, amount in snapshot.get("counters", {}).items():
+            if name in self.counters:
+                self.increment(name, amount)
+        mine = self._mine()
+        mine.monthly.update(snapshot.get("monthly", {}))
+        self.add_granule_range(*snapshot.get("granule_range", [None, None]))
@@ -0,0 +1,142 @@
+"""Offline stand-in for the CMR granule search API, used in place of a requests.Session"""
+
+import io
+import json
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+
+def make_umm_granule(index, start_date="2002-07-04T00:00:00.000Z", end_date=None, image=False):
+    """Return a minimal umm_json granule"""
+
+    granule = {
+        "meta": {
+            "concept-id": f"G{index:010d}-POCLOUD",
+            "native-id": f"granule-{index}"
+        },
+        "umm": {
+            "TemporalExtent": {
+                "RangeDateTime": {
+                    "BeginningDateTime": start_date,
+                    "EndingDateTime": end_date or start_date
+                }
+            },
+            "RelatedUrls": [{
+                "URL": f"s3://bucket-name/directory1/granule-{index}.nc",
+                "Type": "GET DATA VIA DIRECT ACCESS"
+            }]
+        }
+    }
+    if image:
+        granule["umm"]["RelatedUrls"].append({
+            "URL": f"https://server-name.com/bucket-name/directory1/granule-{index}.png",
+            "Type": "GET RELATED VISUALIZATION"
+        })
+    return granule
+
+
+def atom_entry_from_umm(granule):
+    """Return the atom json (.json format) entry for a granule made by make_umm_granule"""
+
+    extent = granule["umm"]["TemporalExtent"]["RangeDateTime"]
+    return {
+        "id": granule["meta"]["concept-id"],
+        "title": granule["meta"]["native-id"],
+        "time_start": extent["BeginningDateTime"],
+        "time_end": extent["EndingDateTime"],
+        "links": [{"rel": "http://esipfed.org/ns/fedsearch/1.1/s3#", "href": url["URL"]}
+                  for url in granule["umm"]["RelatedUrls"]]
+    }
+
+
+class FakeResponse:
+    """Mimics the parts of requests.Response used by GranuleSearch"""
+
+    def __init__(self, body, status_code=200, headers=None):
+        self.text = json.dumps(body)
+        self.content = self.text.encode("utf-8")
+        self.raw = io.BytesIO(self.content)
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        """Mark the response closed, as the streamed body has been read"""
+        self.closed = True
+
+    def raise_for_status(self):
+        """Do nothing, errors are reported through status_code"""
+
+
+class FakeCmrSession:
+    """Serves granules in pages, using the cmr-search-after header like CMR does"""
+
+    def __init__(self, granules):
+        self.granules = granules
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False):  # pylint: disable=unused-argument
+        """Return the page of granules that follows the cmr-search-after header"""
+
+        headers = headers or {}
+        self.requests.append((url, dict(headers)))
+        params = parse_qs(urlparse(url).query)
+        page_size = int(params.get("page_size", ["10"])[0])
+        offset = int(headers.get("cmr-search-after") or 0)
+
+        granules = self.granules
+        if "temporal" in params:
+            granules = [granule for granule in granules if _overlaps(granule, *params["temporal"][0].split(","))]
+        if "browsable" in params:
+            browsable = params["browsable"][0] == "true"
+            granules = [granule for granule in granules if _has_image(granule) == browsable]
+
+        items = granules[offset:offset + page_size]
+        response_headers = {"CMR-Hits": str(len(granules))}
+        if offset + page_size < len(granules):
+            response_headers["cmr-search-after"] = str(offset + page_size)
+        if "/granules.json" in url:
+            return FakeResponse({"feed": {"entry": [atom_entry_from_umm(item) for item in items]}},
+                                headers=response_headers)
+        return FakeResponse({"hits": len(granules), "items": items},
+                            headers=response_headers)
+
+
+    def post(self, url, data=None, headers=None):
+        """Return the page of granules matching the concept_id[] or readable_granule_name[] form
+        params, following the cmr-search-after header"""
+
+        headers = headers or {}
+        self.requests.append((url, dict(headers), list(data or [])))
+        params = {}
+        for key, value in data or []:
+            params.setdefault(key, []).append(str(value))
+        page_size = int(params.get("page_size", ["10"])[0])
+        offset = int(headers.get("cmr-search-after") or 0)
+
+        if "concept_id[]" in params:
+            wanted = set(params["concept_id[]"])
+            granules = [granule for granule in self.granules if granule["meta"]["concept-id"] in wanted]
+        else:
+            wanted = set(params.get("readable_granule_name[]", []))
+            granules = [granule for granule in self.granules if granule["meta"]["native-id"] in wanted]
+
+        items = granules[offset:offset + page_size]
+        response_headers = {"CMR-Hits": str(len(granules))}
+        if offset + page_size < len(granules):
+            response_headers["cmr-search-after"] = str(offset + page_size)
+        return FakeResponse({"hits": len(granules), "items": items}, headers=response_headers)
+
+
+def _has_image(granule):
+    return any(url["Type"] == "GET RELATED VISUALIZATION" for url in granule["umm"]["RelatedUrls"])
+
+
+def _parse(date):
+    return datetime.fromisoformat(date.replace("Z", "+00:00"))
+
+
+def _overlaps(granule, start, end):
+    """True if the granule's temporal extent overlaps [start, end] like a CMR temporal query"""
+    extent = granule["umm"]["TemporalExtent"]["RangeDateTime"]
+    return _parse(extent["BeginningDateTime"]) <= _parse(end) and _parse(extent["EndingDateTime"]) >= _parse(start)
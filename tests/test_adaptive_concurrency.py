@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from podaac.hitide_backfill_tool import adaptive_concurrency
+from podaac.hitide_backfill_tool.adaptive_concurrency import AdaptiveLimiter, is_throttling_error
+from tests.test_rate_limit import FakeClock
+
+
+class FakeService:
+    """Throttles calls beyond `capacity` in flight, and slows down by `slowdown` seconds per
+    call in flight beyond `comfortable`"""
+
+    def __init__(self, capacity=1000, latency=0.001, comfortable=1000, slowdown=0.0):
+        self.capacity = capacity
+        self.latency = latency
+        self.comfortable = comfortable
+        self.slowdown = slowdown
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.throttled = 0
+
+    def call(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            in_flight = self.in_flight
+        try:
+            if in_flight > self.capacity:
+                with self.lock:
+                    self.throttled += 1
+                raise ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "Publish")
+            time.sleep(self.latency + self.slowdown * max(0, in_flight - self.comfortable))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def run_calls(limiter, service, calls, threads=32):
+    def call(_):
+        try:
+            limiter.call(service.call)
+        except ClientError:
+            pass
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, range(calls)))
+
+
+def test_limit_backs_off_when_throttled():
+    limiter = AdaptiveLimiter("sns", maximum=32, initial=16)
+    service = FakeService(capacity=4)
+
+    run_calls(limiter, service, 600)
+
+    assert limiter.limit <= 8
+    assert limiter.throttled_calls == service.throttled > 0
+    assert any(decision["reason"] == "throttled" and decision["to"] < decision["from"]
+               for decision in limiter.decisions)
+
+
+def test_limit_grows_without_congestion(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(adaptive_concurrency, "time", clock)
+    limiter = AdaptiveLimiter("s3", maximum=8, initial=2)
+
+    # rounds of as many calls as the limit allows, each taking exactly 10ms
+    for _ in range(20):
+        started = [limiter.acquire() for _ in range(limiter.limit)]
+        clock.now += 0.01
+        for start in started:
+            limiter.release(start)
+
+    assert limiter.limit == 8
+    assert limiter.calls == 2 + 3 + 4 + 5 + 6 + 7 + 8 * 14
+    assert [decision["to"] for decision in limiter.decisions] == list(range(3, 9))
+
+
+def test_limit_backs_off_when_latency_rises():
+    limiter = AdaptiveLimiter("cmr", maximum=32, initial=2, latency_tolerance=3.0)
+    service = FakeService(latency=0.002, comfortable=4, slowdown=0.004)
+
+    run_calls(limiter, service, 600)
+
+    # with 8 in flight the latency is 9x the uncongested latency
+    assert limiter.highest_limit <= 10
+    assert any("latency" in decision["reason"] for decision in limiter.decisions)
+
+
+def test_calls_in_flight_before_a_decrease_only_decrease_once():
+    limiter = AdaptiveLimiter("sns", maximum=32, initial=16)
+    started = [limiter.acquire() for _ in range(3)]
+
+    for start in started:
+        limiter.release(start, throttled=True)
+
+    assert limiter.limit == 8
+    assert len(limiter.decisions) == 1
+    assert limiter.summary().startswith("sns concurrency: 8 (range 8-16 of 1-32), 3 calls, 3 throttled")
+
+
+def test_throttling_errors_are_recognized():
+    class Response:
+        status_code = 429
+
+    class HttpError(Exception):
+        response = Response()
+
+    assert is_throttling_error(ClientError({"Error": {"Code": "SlowDown"}}, "GetObject"))
+    assert not is_throttling_error(ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject"))
+    assert is_throttling_error(HttpError())
+    assert not is_throttling_error(ValueError())
@@ -22,3 +22,12 @@ def test_parsing_args_with_config(tmp_path):
     assert config.image == "force"      # specified in config file, overridden in cli args
     assert config.preview == True       # flag specified in cli args
     assert config.use_data_url == True  # flag specified in config file, NOT overridden in cli args         
+
+
+def test_message_rate_from_config_or_cli(tmp_path):
+    config_path = os.path.join(tmp_path, "test_config.yml")
+    write_yaml_file(config_path, {"message_rate": {"forge": "5:10"}})
+
+    assert parse_args(["--config", config_path]).message_rate == {"forge": "5:10"}
+    assert parse_args(["--config", config_path, "--message-rate", "tig=2", "--message-rate", "dmrpp=1:3"]
+                      ).message_rate == ["tig=2", "dmrpp=1:3"]
@@ -0,0 +1,81 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from podaac.hitide_backfill_tool.cmr.async_search import AsyncGranuleSearch  # noqa: E402
+from tests.fake_cmr import FakeCmrSession, make_umm_granule  # noqa: E402
+
+
+def fake_transport(granules, failures=None):
+    """MockTransport serving pages like FakeCmrSession, and single granule lookups by concept_id.
+    failures maps a concept_id to the number of 503 responses to give before succeeding."""
+
+    session = FakeCmrSession(granules)
+    failures = dict(failures or {})
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        params = parse_qs(urlparse(str(request.url)).query)
+        if "concept_id" in params:
+            concept_id = params["concept_id"][0]
+            if failures.get(concept_id):
+                failures[concept_id] -= 1
+                return httpx.Response(503, headers={"Retry-After": "0"})
+            items = [granule for granule in granules if granule["meta"]["concept-id"] == concept_id]
+            return httpx.Response(200, json={"hits": len(items), "items": items})
+
+        response = session.get(str(request.url), headers=dict(request.headers))
+        return httpx.Response(response.status_code, headers=response.headers, text=response.text)
+
+    return httpx.MockTransport(handler), requests
+
+
+def async_search(transport, **kwargs):
+    return AsyncGranuleSearch(
+        base_url="https://cmr.uat.earthdata.nasa.gov",
+        collection_short_name="MODIS_A-JPL-L2P-v2019.0",
+        provider="pocloud",
+        transport=transport,
+        **kwargs
+    )
+
+
+def test_async_search_pages_like_granule_search():
+    transport, _ = fake_transport([make_umm_granule(i) for i in range(7)])
+    search = async_search(transport, page_size=3, page_limit=None)
+
+    concept_ids = []
+    while search.get_next_page():
+        concept_ids += [granule["meta"]["concept-id"] for granule in search.granules()]
+    search.close()
+
+    assert concept_ids == [make_umm_granule(i)["meta"]["concept-id"] for i in range(7)]
+    assert search.total_matching_granules() == 7
+
+
+def test_async_search_looks_up_granule_list_with_retries():
+    granules = [make_umm_granule(i) for i in range(50)]
+    transport, requests = fake_transport(granules, failures={"G0000000003-POCLOUD": 2})
+    search = async_search(transport, concurrency=5, edl_token="token")
+
+    granule_list = [granule["meta"]["concept-id"] for granule in granules] + ["G9999999999-POCLOUD"]
+    found = search.get_granules_in_list(granule_list)
+    search.close()
+
+    assert found == granules
+    assert len(requests) == 51 + 2
+    assert all(request.headers["Authorization"] == "Bearer token" for request in requests)
+
+
+def test_async_search_gives_up_after_max_attempts():
+    granules = [make_umm_granule(0)]
+    transport, requests = fake_transport(granules, failures={"G0000000000-POCLOUD": 10})
+    search = async_search(transport, max_attempts=3)
+
+    assert search.get_granules_in_list(["G0000000000-POCLOUD"]) == []
+    assert len(requests) == 3
+    search.close()
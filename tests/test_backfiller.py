@@ -0,0 +1,261 @@
+import csv
+import gzip
+import json
+import logging
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Event
+
+import pytest
+
+from podaac.hitide_backfill_tool import rate_limit
+from podaac.hitide_backfill_tool.cli import (Backfiller, browsable_filter_from_args, collection_summary,
+                                             collections_from_args)
+from podaac.hitide_backfill_tool.cmr.search import GranuleSearch
+from podaac.hitide_backfill_tool.cnm_message_writer import CnmMessageWriter
+from podaac.hitide_backfill_tool.config import get_message_config
+from podaac.hitide_backfill_tool.dmrpp_utils import parse_version
+from podaac.hitide_backfill_tool.file_util import load_json_file
+from podaac.hitide_backfill_tool.message_dispatcher import MessageDispatcher
+from podaac.hitide_backfill_tool.monthly_stats import GranuleDetailWriter
+from podaac.hitide_backfill_tool.rate_limit import MessageRateLimiter
+from tests.fake_cmr import FakeCmrSession, make_umm_granule
+from tests.test_rate_limit import FakeClock
+from tests.test_searching_cmr import fake_sharded_search, hourly_granules
+
+
+class ListMessageSender:
+    name = "list"
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append(json.loads(message))
+
+    def close(self):
+        pass
+
+
+def granule_options(footprint="on", image="off", dmrpp="off"):
+    return {
+        "footprint_geometries": ["GPolygons", "Lines"],
+        "footprint_processing": footprint,
+        "image_processing": image,
+        "dmrpp_processing": dmrpp,
+        "dmrpp_min_version": parse_version("3.21.1-367"),
+        "can_use_data_url_for_s3_bucket_info": False
+    }
+
+
+def make_backfiller(granule_count, page_size=3, message_limit=None, options=None, cmr_search_after=None,
+                    search=None, **kwargs):
+    if search is None:
+        search = GranuleSearch(
+            base_url="https://cmr.uat.earthdata.nasa.gov",
+            collection_short_name="MODIS_A-JPL-L2P-v2019.0",
+            page_size=page_size,
+            page_limit=None,
+            cmr_search_after=cmr_search_after
+        )
+        search.session = FakeCmrSession([make_umm_granule(i) for i in range(granule_count)])
+
+    message_config = get_message_config("uat", "tests/resources/default_message_config.json")
+    collection_config = load_json_file(
+        "resources/cumulus_configurations/uat/MODIS_A-JPL-L2P-v2019.0.json", relative_to=__file__)
+    writer = CnmMessageWriter(message_config, collection_config, None, None, "pocloud", "test-id", "tester")
+
+    sender = ListMessageSender()
+    if kwargs.pop("dispatch", False):
+        kwargs["dispatcher"] = MessageDispatcher([sender], workers=2, queue_size=2)
+    backfiller = Backfiller(search, writer, [sender], options or granule_options(), logging.getLogger("test"),
+                            message_limit, "test-id", None, "MODIS_A-JPL-L2P-v2019.0", None, **kwargs)
+    return backfiller, sender
+
+
+def test_backfiller_processes_every_page_with_one_worker_pool():
+    backfiller, sender = make_backfiller(10, workers=2)
+
+    backfiller.process_granules()
+
+    assert backfiller.stats.get("granules_analyzed") == 10
+    assert backfiller.stats.get("granules_needing_footprint") == 10
+    assert len(sender.messages) == 10
+    assert all(message["forge"] for message in sender.messages)
+    assert backfiller.stats.monthly().items() == [("2002-07", {
+        "granules": 10, "needs_image": 0, "needs_footprint": 10, "both_footprint_and_bbox": 0, "needs_dmrpp": 0
+    })]
+
+
+def test_backfiller_stops_at_message_limit():
+    backfiller, sender = make_backfiller(10, message_limit=4, workers=3)
+
+    backfiller.process_granules()
+
+    assert len(sender.messages) == 4
+    assert backfiller.message_limit_reached()
+
+
+def test_backfiller_combines_a_granules_actions_into_one_message():
+    backfiller, sender = make_backfiller(10, workers=3, options=granule_options(image="on"), combine_messages=True)
+
+    backfiller.process_granules()
+
+    assert len(sender.messages) == 10
+    assert all(message["forge"] and message["tig"] and not message["dmrpp"] for message in sender.messages)
+    assert backfiller.stats.get("messages_sent") == 10
+    assert backfiller.stats.get("footprint_messages_sent") == 10
+    assert backfiller.stats.get("image_messages_sent") == 10
+
+
+def test_combined_message_is_sent_when_a_later_action_fails():
+    backfiller, sender = make_backfiller(4, workers=2, options=granule_options(image="on", dmrpp="on"),
+                                         combine_messages=True)
+
+    def failing_check_dmrpp(granule, actions=None):
+        raise Exception("S3 read timed out")
+    backfiller.check_dmrpp = failing_check_dmrpp
+
+    backfiller.process_granules()
+
+    assert len(sender.messages) == 4
+    assert all(message["forge"] and message["tig"] and not message["dmrpp"] for message in sender.messages)
+    assert backfiller.stats.get("messages_sent") == 4
+    assert backfiller.stats.get("footprint_messages_sent") == backfiller.stats.get("image_messages_sent") == 4
+
+
+def test_combined_messages_count_once_against_the_message_limit():
+    separate, separate_sender = make_backfiller(10, message_limit=4, workers=1, options=granule_options(image="on"))
+    combined, combined_sender = make_backfiller(10, message_limit=4, workers=1, options=granule_options(image="on"),
+                                                combine_messages=True)
+
+    separate.process_granules()
+    combined.process_granules()
+
+    assert len(separate_sender.messages) == len(combined_sender.messages) == 4
+    assert combined.stats.get("image_messages_sent") == combined.stats.get("footprint_messages_sent") == 4
+    assert separate.stats.get("image_messages_sent") + separate.stats.get("footprint_messages_sent") == 4
+
+
+def test_backfiller_stops_at_the_next_granule_when_stop_is_set():
+    stop = Event()
+    backfiller, sender = make_backfiller(30, page_size=3, workers=1, stop=stop)
+    send = sender.send
+
+    def send_then_stop(message):
+        send(message)
+        stop.set()
+
+    sender.send = send_then_stop
+    backfiller.process_granules()
+
+    # the granules already queued on the first page are skipped, and no more pages are requested
+    assert len(sender.messages) == 1
+    assert backfiller.search._pages_loaded == 1
+
+
+def test_backfiller_sends_through_dispatcher():
+    backfiller, sender = make_backfiller(10, workers=4, dispatch=True)
+
+    backfiller.process_granules()
+    backfiller.dispatcher.close()
+
+    assert len(sender.messages) == 10
+    assert backfiller.dispatcher.messages_queued == 10
+    assert backfiller.dispatcher.messages_dispatched == 10
+
+
+def test_backfiller_message_limit_is_exact_with_sharded_search():
+    search = fake_sharded_search(3, hourly_granules(12))
+    backfiller, sender = make_backfiller(0, message_limit=5, workers=4, search=search)
+
+    backfiller.process_granules()
+    search.close()
+
+    assert len(sender.messages) == 5
+    assert backfiller.stats.get("footprint_messages_sent") == 5
+
+
+def test_backfiller_limits_the_message_rate_per_action(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    limiter = MessageRateLimiter({"forge": (50, 5), "tig": (1, 1)})
+    backfiller, sender = make_backfiller(20, workers=4, dispatch=True, rate_limiter=limiter)
+
+    backfiller.process_granules()
+    backfiller.dispatcher.close()
+
+    # 5 forge messages from the burst, then 15 at 50/s; the tig limit doesn't apply
+    assert len(sender.messages) == 20
+    assert sorted(clock.sleeps) == pytest.approx([i / 50 for i in range(1, 16)])
+    assert limiter.buckets["tig"].waited == 0
+
+
+def test_backfiller_writes_granule_detail_file(tmp_path):
+    detail_file = tmp_path / "detail.csv"
+    granule_detail = GranuleDetailWriter(str(detail_file))
+    backfiller, _ = make_backfiller(5, workers=2, granule_detail=granule_detail)
+
+    backfiller.process_granules()
+    granule_detail.close()
+
+    with open(detail_file, encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 5
+    assert {row["month"] for row in rows} == {"2002-07"}
+    assert {row["needs_footprint"] for row in rows} == {"True"}
+
+
+def test_cmr_filter_only_applies_when_images_are_the_only_work():
+    def filter_for(**kwargs):
+        args = Namespace(**{"cmr_filter": True, "image": "on", "footprint": "off", "dmrpp": "off", **kwargs})
+        return browsable_filter_from_args(args, logging)
+
+    assert filter_for() is False
+    assert filter_for(cmr_filter=None) is None
+    assert filter_for(footprint="on") is None
+    assert filter_for(image="force") is None
+
+
+def test_backfiller_streams_a_gzipped_granule_list(tmp_path):
+    granule_list_file = tmp_path / "granules.txt.gz"
+    names = [f"G{i:010d}-POCLOUD" for i in range(8)]
+    with gzip.open(granule_list_file, "wt", encoding="utf-8") as file:
+        file.write("\n".join(names + ["", names[0], names[3], "G9999999999-POCLOUD"]) + "\n")
+
+    backfiller, sender = make_backfiller(8, workers=2)
+    backfiller.search._lookup_batch_size = 3
+    backfiller.granule_list_file = str(granule_list_file)
+    backfiller.process_granules()
+
+    assert sorted(message["payload"]["granules"][0]["cmrConceptId"] for message in sender.messages) == names
+    assert backfiller.search.granules_not_found() == ["G9999999999-POCLOUD"]
+
+
+def test_collections_from_cli_or_config():
+    assert collections_from_args(Namespace(collections="A, B,,A,C")) == ["A", "B", "C"]
+    assert collections_from_args(Namespace(collections=["A", "B"])) == ["A", "B"]
+    assert collections_from_args(Namespace(collections=None)) == []
+
+
+def test_backfillers_share_one_worker_pool_and_report_per_collection():
+    executor = ThreadPoolExecutor(max_workers=3)
+    pending_granules = BoundedSemaphore(6)
+    backfillers = {
+        collection: make_backfiller(count, workers=3, executor=executor, pending_granules=pending_granules)
+        for collection, count in (("A", 7), ("B", 11))
+    }
+
+    with ThreadPoolExecutor(max_workers=2) as collection_executor:
+        list(collection_executor.map(lambda item: item[0].process_granules(), backfillers.values()))
+    executor.shutdown()
+
+    assert len(backfillers["A"][1].messages) == 7
+    assert len(backfillers["B"][1].messages) == 11
+    assert backfillers["A"][0].granules_in_flight == backfillers["B"][0].granules_in_flight == 0
+
+    summary = collection_summary(["A", "B", "C"], {name: item[0] for name, item in backfillers.items()},
+                                 {"A": "finished", "B": "finished", "C": "failed: no config"})
+    assert "A: finished, 7 granules analyzed, messages sent: 7 footprint, 0 image, 0 dmrpp" in summary
+    assert "B: finished, 11 granules analyzed" in summary
+    assert "C: failed: no config" in summary
@@ -0,0 +1,74 @@
+import logging
+
+import pytest
+
+from podaac.hitide_backfill_tool.args import parse_args
+from podaac.hitide_backfill_tool.checkpoint import CheckpointJournal
+from podaac.hitide_backfill_tool.cli import checkpoint_journal_from_args
+from tests.test_backfiller import make_backfiller
+
+
+def test_resume_point_is_first_incomplete_page(tmp_path):
+    journal = CheckpointJournal.create(tmp_path, "abc")
+    assert journal.resume_point() == (False, None)
+
+    first = journal.record_page(None, "3")
+    second = journal.record_page("3", "6")
+    journal.complete_page(first)
+    assert journal.resume_point() == (False, "3")
+
+    journal.complete_page(second)
+    assert journal.resume_point() == (False, "6")
+
+    journal.complete_page(journal.record_page("6", None))
+    assert journal.resume_point() == (True, None)
+    journal.close()
+
+
+def test_resumed_backfill_does_not_resend_messages(tmp_path):
+    journal = CheckpointJournal.create(tmp_path, "abc")
+    backfiller, sender = make_backfiller(10, message_limit=4, workers=1, journal=journal)
+    backfiller.process_granules()
+    backfiller.save_checkpoint()
+    journal.close()
+    first_run = [message["payload"]["granules"][0]["cmrConceptId"] for message in sender.messages]
+
+    journal = CheckpointJournal.resume(tmp_path, "abc")
+    done, search_after = journal.resume_point()
+    assert not done
+    backfiller, sender = make_backfiller(10, workers=2, journal=journal, cmr_search_after=search_after)
+    backfiller.process_granules()
+    second_run = [message["payload"]["granules"][0]["cmrConceptId"] for message in sender.messages]
+
+    assert len(first_run) == 4
+    assert len(second_run) == 6
+    assert sorted(first_run + second_run) == sorted(set(first_run + second_run))
+    assert backfiller.stats.get("footprint_messages_sent") == 10
+    assert backfiller.stats.get("granules_analyzed") == 10
+    assert backfiller.stats.monthly().get("2002-07", "granules") == 10
+
+
+def test_resume_with_different_run_options_is_refused(tmp_path):
+    options = {"collection": "MODIS_A-JPL-L2P-v2019.0", "start_date": "2020-01-01T00:00:00Z",
+               "footprint": "on", "geometries": ("GPolygons", "Lines")}
+    CheckpointJournal.create(tmp_path, "abc", options).close()
+
+    CheckpointJournal.resume(tmp_path, "abc", options).close()
+    with pytest.raises(Exception, match="different options: start_date \\(was '2020-01-01T00:00:00Z', "
+                                        "now '2021-01-01T00:00:00Z'\\), footprint \\(was 'on'"):
+        CheckpointJournal.resume(tmp_path, "abc", {**options, "start_date": "2021-01-01T00:00:00Z",
+                                                   "footprint": "force"})
+
+
+def test_resume_from_args_checks_the_collection_and_time_range(tmp_path):
+    arguments = ["--collection", "MODIS_A-JPL-L2P-v2019.0", "--checkpoint-dir", str(tmp_path),
+                 "--start-date", "2020-01-01T00:00:00Z", "--end-date", "2020-02-01T00:00:00Z"]
+    args = parse_args(arguments)
+    args.cli_execution_id = "abc"
+    checkpoint_journal_from_args(args, logging).close()
+
+    resumed = parse_args(arguments + ["--resume", "abc"])
+    checkpoint_journal_from_args(resumed, logging).close()
+    other_collection = parse_args(arguments + ["--resume", "abc", "--collection", "VIIRS_NPP-JPL-L2P-v2016.2"])
+    with pytest.raises(Exception, match="Cannot resume backfill abc with different options: collection"):
+        checkpoint_journal_from_args(other_collection, logging)
@@ -0,0 +1,140 @@
+import copy
+import json
+
+import pytest
+
+from podaac.hitide_backfill_tool import cnm_message_writer
+from podaac.hitide_backfill_tool.cmr.cmr_granule import CmrGranule
+from podaac.hitide_backfill_tool.cnm_message_writer import CnmMessageWriter
+from podaac.hitide_backfill_tool.config import get_message_config
+from podaac.hitide_backfill_tool.file_util import load_json_file
+from podaac.hitide_backfill_tool.cmr.atom_granule import umm_granule_from_atom
+from tests.fake_cmr import atom_entry_from_umm, make_umm_granule
+
+
+def collection_config():
+    return load_json_file("resources/cumulus_configurations/uat/MODIS_A-JPL-L2P-v2019.0.json",
+                          relative_to=__file__)
+
+
+def make_writer(config=None):
+    message_config = get_message_config("uat", "tests/resources/default_message_config.json")
+    return CnmMessageWriter(message_config, config or collection_config(), "2020-01-01", "2020-02-01",
+                            "pocloud", "test-id", "tester")
+
+
+def expected_message(writer, granule):
+    s3_info = granule.s3_bucket_info()
+    data_file = {"bucket": s3_info["bucket"], "key": s3_info["key"], "fileName": s3_info["filename"],
+                 "type": "data"}
+    if granule.size(s3_info["filename"]) is not None:
+        data_file["size"] = granule.size(s3_info["filename"])
+    return {
+        **copy.deepcopy(writer.template),
+        "payload": {"granules": [{
+            "cmrConceptId": granule.concept_id(),
+            "granuleId": granule.native_id(),
+            "dataType": "MODIS_A-JPL-L2P-v2019.0",
+            "files": [data_file]
+        }]},
+        "forge": True,
+        "tig": False,
+        "dmrpp": False,
+        "skip_cmr_opendap_update": True,
+        "cli_params": {
+            "uuid": "test-id",
+            "collection_short_name": "MODIS_A-JPL-L2P-v2019.0",
+            "collection_version": "2019.0",
+            "provider": "pocloud",
+            "cmr_search_start": "2020-01-01",
+            "cmr_search_end": "2020-02-01",
+            "granule_start": granule.start_date(),
+            "granule_end": granule.end_date(),
+            "username": "tester"
+        }
+    }
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_message_is_the_template_with_the_granule_fields(monkeypatch, use_orjson):
+    if use_orjson:
+        if cnm_message_writer.orjson is None:
+            pytest.skip("orjson isn't installed")
+    else:
+        monkeypatch.setattr(cnm_message_writer, "orjson", None)
+    writer = make_writer()
+    granule = CmrGranule(make_umm_granule(1))
+
+    message = writer.write(granule, True, False, False, True)
+
+    assert json.loads(message) == expected_message(writer, granule)
+    if not use_orjson:
+        assert message == json.dumps(expected_message(writer, granule))
+
+
+def test_messages_and_collection_config_are_not_shared():
+    config = collection_config()
+    original = copy.deepcopy(config)
+    writer = make_writer(config)
+    make_writer(config)
+
+    first = json.loads(writer.write(CmrGranule(make_umm_granule(1)), True, False, False, True))
+    second = json.loads(writer.write(CmrGranule(make_umm_granule(2)), False, True, False, True))
+
+    assert config == original
+    assert [file["regex"] for file in first["meta"]["collection"]["files"]].count("^.*\\.png$") == 1
+    assert first["payload"] != second["payload"]
+    assert (first["forge"], first["tig"]) == (True, False)
+    assert (second["forge"], second["tig"]) == (False, True)
+    assert "payload" not in writer.template
+
+
+class FakeS3:
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.heads = []
+
+    def get_size(self, s3_path):
+        self.heads.append(s3_path)
+        return self.sizes[s3_path]
+
+
+def test_atom_and_umm_json_granules_give_the_same_message():
+    umm_granule = make_umm_granule(1)
+    umm_granule["umm"]["DataGranule"] = {"ArchiveAndDistributionInformation": [
+        {"Name": "granule-1.nc", "SizeInBytes": 21495810}
+    ]}
+    entry = {**atom_entry_from_umm(umm_granule), "granule_size": "20.5"}
+    s3 = FakeS3({"s3://bucket-name/directory1/granule-1.nc": 21495810})
+    writer = make_writer()
+
+    umm_message = writer.write(CmrGranule(umm_granule, s3=s3), True, False, False, True)
+    atom_granule = CmrGranule(umm_granule_from_atom(entry), s3=s3)
+    atom_message = writer.write(atom_granule, True, False, False, True)
+    writer.write(atom_granule, True, False, False, True)
+
+    assert atom_message == umm_message
+    assert s3.heads == ["s3://bucket-name/directory1/granule-1.nc"]
+
+
+def test_unknown_size_is_left_out_of_the_message():
+    granule = CmrGranule(umm_granule_from_atom(atom_entry_from_umm(make_umm_granule(1))))
+
+    message = json.loads(make_writer().write(granule, True, False, False, True))
+
+    assert "size" not in message["payload"]["granules"][0]["files"][0]
+
+
+def test_umm_json_granule_size_is_sent_without_reading_s3():
+    listed = make_umm_granule(1)
+    listed["umm"]["DataGranule"] = {"ArchiveAndDistributionInformation": [
+        {"Name": "granule-1.nc", "SizeInBytes": 1234}
+    ]}
+    s3 = FakeS3({})
+    writer = make_writer()
+
+    sizes = [json.loads(writer.write(CmrGranule(granule, s3=s3), True, False, False, True))
+             ["payload"]["granules"][0]["files"][0]["size"] for granule in (listed, make_umm_granule(2))]
+
+    assert sizes == [1234, 0]
+    assert s3.heads == []
@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+
+import pytest
+
+from podaac.hitide_backfill_tool import config
+from podaac.hitide_backfill_tool.config import CollectionConfigIndex, get_collection_config
+
+
+@pytest.fixture
+def checkout(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_indexes", {})
+    for path, name in (("ghrsst/uat", "MODIS_A"), ("ghrsst/ops", "MODIS_A"), ("swot/sit/l2", "SWOT")):
+        os.makedirs(tmp_path / path)
+        (tmp_path / path / f"{name}.json").write_text(json.dumps({"name": name, "path": path}))
+    os.makedirs(tmp_path / ".git" / "uat")
+    (tmp_path / ".git" / "uat" / "HIDDEN.json").write_text("{}")
+    return tmp_path
+
+
+def test_collection_config_is_found_for_the_environment(checkout):
+    assert get_collection_config(str(checkout), "MODIS_A", "uat", logging)["path"] == "ghrsst/uat"
+    assert get_collection_config(str(checkout), "MODIS_A", "ops", logging)["path"] == "ghrsst/ops"
+    assert get_collection_config(str(checkout), "SWOT", "swot-sit", logging)["path"] == "swot/sit/l2"
+
+    for collection, env in (("SWOT", "uat"), ("HIDDEN", "uat"), ("MISSING", "ops")):
+        with pytest.raises(Exception, match="Could not find collection config"):
+            get_collection_config(str(checkout), collection, env, logging)
+
+
+def test_saved_index_is_reused_until_a_directory_changes(checkout, monkeypatch):
+    index_path = checkout / config.INDEX_DIR / config.INDEX_FILE
+    CollectionConfigIndex.load(str(checkout), logging)
+    assert index_path.exists()
+
+    def no_walk(*args):
+        raise AssertionError("the checkout was walked")
+
+    monkeypatch.setattr(config.os, "walk", no_walk)
+    assert CollectionConfigIndex.load(str(checkout), logging).find("SWOT", "sit").endswith("SWOT.json")
+
+    monkeypatch.undo()
+    (checkout / "ghrsst" / "uat" / "NEW.json").write_text("{}")
+    assert CollectionConfigIndex.load(str(checkout), logging).find("NEW", "uat").endswith("NEW.json")
+
+
+def test_index_works_when_the_checkout_is_read_only(checkout, monkeypatch):
+    def read_only(*args, **kwargs):
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr(CollectionConfigIndex, "save", read_only)
+    monkeypatch.setattr(config.os, "makedirs", read_only)
+
+    assert get_collection_config(str(checkout), "MODIS_A", "uat", logging)["name"] == "MODIS_A"
+    assert not (checkout / config.INDEX_DIR).exists()
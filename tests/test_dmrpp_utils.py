@@ -0,0 +1,130 @@
+import logging
+import os
+import boto3
+import pytest
+from moto import mock_aws
+from podaac.hitide_backfill_tool.cmr.cmr_granule import CmrGranule
+from podaac.hitide_backfill_tool.dmrpp_utils import DmrppInventory, DmrppState, DmrppVersionCache, get_dmrpp_version, parse_version
+from podaac.hitide_backfill_tool.file_util import make_absolute
+from podaac.hitide_backfill_tool.s3_reader import S3Reader
+
+DMRPP_URL = "s3://test-bucket/collection/sample.nc.dmrpp"
+
+
+@pytest.fixture(scope='function')
+def s3_reader():
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-west-2'
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket="test-bucket", CreateBucketConfiguration={"LocationConstraint": "us-west-2"})
+        with open(make_absolute('resources/sample.nc.dmrpp', relative_to=__file__), 'rb') as file:
+            s3.put_object(Bucket="test-bucket", Key="collection/sample.nc.dmrpp", Body=file)
+
+        reader = S3Reader(logging.getLogger("test"), None)
+        get_object = reader.client.get_object
+        reader.get_object_calls = []
+
+        def recording_get_object(**kwargs):
+            response = get_object(**kwargs)
+            reader.get_object_calls.append((kwargs.get("Range"), response["ContentLength"]))
+            return response
+        reader.client.get_object = recording_get_object
+        yield reader
+
+
+def test_dmrpp_version_is_read_from_the_start_of_the_file(s3_reader):
+    assert get_dmrpp_version(s3_reader, DMRPP_URL) == "3.20.9-91"
+    assert s3_reader.get_object_calls == [("bytes=0-8191", 8192)]
+
+
+def test_dmrpp_version_falls_back_to_full_read(s3_reader):
+    assert get_dmrpp_version(s3_reader, DMRPP_URL, probe_bytes=100) == "3.20.9-91"
+    assert s3_reader.get_object_calls == [("bytes=0-99", 100), (None, 176495)]
+
+
+def test_missing_dmrpp_has_no_version(s3_reader):
+    assert get_dmrpp_version(s3_reader, "s3://test-bucket/collection/missing.nc.dmrpp") == ""
+
+
+def test_inventory_lists_every_page_once(s3_reader):
+    for index in range(1001):
+        s3_reader.client.put_object(Bucket="test-bucket", Key=f"collection/granule-{index}.nc.dmrpp", Body=b"x")
+    list_objects_v2 = s3_reader.client.list_objects_v2
+    pages = []
+
+    def recording_list_objects_v2(**kwargs):
+        pages.append(kwargs)
+        return list_objects_v2(**kwargs)
+    s3_reader.client.list_objects_v2 = recording_list_objects_v2
+    inventory = DmrppInventory(s3_reader, logging.getLogger("test"))
+
+    listed, info = inventory.lookup("s3://test-bucket/collection/granule-1000.nc.dmrpp")
+    assert listed and info["size"] == 1
+    assert inventory.lookup("s3://test-bucket/collection/granule-1001.nc.dmrpp") == (True, None)
+    assert inventory.lookup(DMRPP_URL)[1]["size"] == 176495
+    assert len(pages) == 2
+    assert s3_reader.get_object_calls == []
+
+
+def test_cached_dmrpp_version_is_used_while_etag_is_unchanged(s3_reader, tmp_path):
+    cache = DmrppVersionCache(str(tmp_path / "dmrpp_cache.sqlite"))
+
+    def dmrpp_state():
+        granule = CmrGranule({}, s3_reader, dmrpp_processing="on", dmrpp_min_version=parse_version("3.20.9-91"),
+                             dmrpp_cache=cache)
+        return granule.get_dmrpp_state(DMRPP_URL)
+
+    assert dmrpp_state() == DmrppState.MATCHED_VERSION
+    assert dmrpp_state() == DmrppState.MATCHED_VERSION
+    assert len(s3_reader.get_object_calls) == 1
+
+    s3_reader.client.put_object(Bucket="test-bucket", Key="collection/sample.nc.dmrpp",
+                                Body=b'<Dataset xmlns:dmrpp="x" dmrpp:version="3.21.1-367"/>')
+    assert dmrpp_state() == DmrppState.NEWER_VERSION
+    assert len(s3_reader.get_object_calls) == 2
+    cache.close()
+
+
+def test_failed_dmrpp_read_is_not_cached(s3_reader, tmp_path):
+    cache = DmrppVersionCache(str(tmp_path / "dmrpp_cache.sqlite"))
+    granule = CmrGranule({}, s3_reader, dmrpp_processing="on", dmrpp_min_version=parse_version("3.20.9-91"),
+                         dmrpp_cache=cache)
+    etag = s3_reader.get_etag(DMRPP_URL)
+    read_file_head_from_s3 = s3_reader.read_file_head_from_s3
+
+    def throttled(*args):
+        raise Exception("S3Reader could not read file: SlowDown")
+    s3_reader.read_file_head_from_s3 = throttled
+
+    assert granule.get_dmrpp_version(DMRPP_URL, etag) == ""
+    assert cache.get(DMRPP_URL, etag) is None
+
+    s3_reader.read_file_head_from_s3 = read_file_head_from_s3
+    assert granule.get_dmrpp_version(DMRPP_URL, etag) == "3.20.9-91"
+    assert cache.get(DMRPP_URL, etag) == "3.20.9-91"
+
+    s3_reader.client.put_object(Bucket="test-bucket", Key="collection/no-version.nc.dmrpp", Body=b"<Dataset/>")
+    no_version_url = "s3://test-bucket/collection/no-version.nc.dmrpp"
+    no_version_etag = s3_reader.get_etag(no_version_url)
+    assert granule.get_dmrpp_version(no_version_url, no_version_etag) == ""
+    assert cache.get(no_version_url, no_version_etag) == ""
+    cache.close()
+
+
+def test_dmrpp_cache_persists_and_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "dmrpp_cache.sqlite")
+    cache = DmrppVersionCache(path, max_entries=10)
+    for index in range(10):
+        cache.put(f"s3://bucket/{index}.dmrpp", "etag", f"3.21.1-{index}")
+    cache.get("s3://bucket/0.dmrpp", "etag")
+    cache.put("s3://bucket/10.dmrpp", "etag", "3.21.1-10")
+    cache.close()
+
+    cache = DmrppVersionCache(path, max_entries=10)
+    assert cache.get("s3://bucket/0.dmrpp", "etag") == "3.21.1-0"
+    assert cache.get("s3://bucket/10.dmrpp", "etag") == "3.21.1-10"
+    assert cache.get("s3://bucket/10.dmrpp", "other-etag") is None
+    assert cache.entries == 9
+    cache.close()
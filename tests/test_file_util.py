@@ -1,7 +1,21 @@
-from podaac.hitide_backfill_tool.file_util import load_json_file
+import gzip
+
+from podaac.hitide_backfill_tool.file_util import load_json_file, open_text_file
 
 
 def test_loading_a_json_file():
     a = load_json_file("resources/sample_granules_1.json",
                        relative_to=__file__)
     assert a["hits"] == 998700
+
+
+def test_opening_plain_and_gzipped_text_files(tmp_path):
+    plain = tmp_path / "granules.txt"
+    plain.write_text("granule-1\ngranule-2\n", encoding="utf-8")
+    compressed = tmp_path / "granules.txt.gz"
+    with gzip.open(compressed, "wt", encoding="utf-8") as file:
+        file.write("granule-1\ngranule-2\n")
+
+    for path in (plain, compressed):
+        with open_text_file(str(path)) as file:
+            assert file.read().splitlines() == ["granule-1", "granule-2"]
@@ -1,4 +1,5 @@
 
+from podaac.hitide_backfill_tool.cmr.atom_granule import umm_granule_from_atom
 from podaac.hitide_backfill_tool.cmr.cmr_granule import CmrGranule
 from podaac.hitide_backfill_tool.file_util import load_json_file
 
@@ -93,3 +94,75 @@ def test_gets_s3_bucket_info__from_data_url__with_two_directories():
     assert bucket_info["bucket"] == "bucket-name"
     assert bucket_info["key"] == "directory1/directory2/filename.nc"
     assert bucket_info["filename"] == "filename.nc"
+
+
+def test_granule_record_matches_granule_accessors():
+    granule = CmrGranule(sample_granules["granule_that_has_s3_url_with_two_directories"])
+    record = granule.record
+
+    assert record.s3_url == "s3://bucket-name/directory1/directory2/filename.nc"
+    assert record.s3_url == granule.s3_url()
+    assert record.start_date == granule.start_date()
+    assert record.end_date == granule.end_date()
+    assert not hasattr(record, "__dict__")
+
+
+def test_s3_bucket_info_is_parsed_once():
+    granule = CmrGranule(sample_granules["granule_that_has_s3_url_with_one_directory"])
+
+    assert granule.s3_bucket_info() is granule.s3_bucket_info()
+
+
+def test_granule_size_is_read_from_archive_information():
+    umm_granule = {"umm": {"DataGranule": {"ArchiveAndDistributionInformation": [
+        {"Name": "granule.nc", "SizeInBytes": 1234},
+        {"Name": "granule.nc.md5", "SizeInBytes": 32}
+    ]}}}
+    granule = CmrGranule(umm_granule)
+
+    assert granule.size("granule.nc") == 1234
+    assert granule.size("missing.nc") == 0
+
+
+def test_atom_granule_is_converted_to_umm():
+    entry = {
+        "id": "G1234567890-POCLOUD",
+        "title": "20200101000000-JPL-L2P_GHRSST-SSTskin-MODIS_A-D-v02.0-fv01.0",
+        "time_start": "2020-01-01T00:00:00.000Z",
+        "time_end": "2020-01-01T00:04:59.000Z",
+        "granule_size": "20.5",
+        "boxes": ["-10 20 10 40"],
+        "polygons": [["-10 20 -10 40 10 40 10 20 -10 20"]],
+        "links": [
+            {"rel": "http://esipfed.org/ns/fedsearch/1.1/s3#",
+             "href": "s3://bucket-name/directory1/granule.nc"},
+            {"rel": "http://esipfed.org/ns/fedsearch/1.1/data#",
+             "href": "https://server-name.com/bucket-name/directory1/granule.nc"},
+            {"rel": "http://esipfed.org/ns/fedsearch/1.1/browse#",
+             "href": "https://server-name.com/bucket-name/directory1/granule.png"},
+            {"rel": "http://esipfed.org/ns/fedsearch/1.1/service#",
+             "href": "https://opendap.earthdata.nasa.gov/collections/C1-POCLOUD/granules/granule"},
+            {"rel": "http://esipfed.org/ns/fedsearch/1.1/browse#", "inherited": True,
+             "href": "https://server-name.com/collection.png"}
+        ]
+    }
+    granule = CmrGranule(umm_granule_from_atom(entry))
+
+    assert granule.concept_id() == "G1234567890-POCLOUD"
+    assert granule.native_id() == entry["title"]
+    assert granule.end_date() == "2020-01-01T00:04:59.000Z"
+    assert granule.has_footprint_and_bbox()
+    assert granule.has_image()
+    assert granule.has_opendap_url()
+    assert granule.data_url() == "https://server-name.com/bucket-name/directory1/granule.nc"
+    assert granule.s3_bucket_info()["filename"] == "granule.nc"
+    assert granule.size("granule.nc") is None
+    assert len(granule.umm_granule["umm"]["RelatedUrls"]) == 4
+
+
+def test_atom_granule_without_geometry_or_image():
+    granule = CmrGranule(umm_granule_from_atom({"id": "G1234567890-POCLOUD", "links": []}))
+
+    assert not granule.has_footprint()
+    assert not granule.has_image()
+    assert granule.size("granule.nc") is None
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from podaac.hitide_backfill_tool import rate_limit
+from podaac.hitide_backfill_tool.rate_limit import MessageRateLimiter, TokenBucket, parse_message_rates
+
+
+def test_parse_message_rates():
+    assert parse_message_rates(None) == {}
+    assert parse_message_rates(["forge=5", "tig=2.5:10"]) == {"forge": (5.0, None), "tig": (2.5, 10.0)}
+    assert parse_message_rates({"dmrpp": 20, "tig": "1:4"}) == {"dmrpp": (20.0, None), "tig": (1.0, 4.0)}
+
+    for value in ("image=5", "forge", "forge=fast", "forge=0", "forge=5:0"):
+        with pytest.raises(Exception, match="Invalid message rate"):
+            parse_message_rates([value])
+
+
+class FakeClock:
+    """Stands in for the time module in rate_limit (and adaptive_concurrency): records the
+    sleeps, and only advances when advance is True, so the waits don't depend on how long the
+    test takes"""
+
+    def __init__(self, advance=False):
+        self.now = 1000.0
+        self.advance = advance
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        if self.advance:
+            self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", fake_clock)
+    return fake_clock
+
+
+def test_token_bucket_allows_a_burst_then_holds_the_rate_across_threads(clock):
+    bucket = TokenBucket(rate=100, burst=10)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: bucket.acquire(), range(40)))
+
+    # 10 tokens from the burst, then each waiting thread reserves the next token at 100/s
+    assert sorted(clock.sleeps) == pytest.approx([i / 100 for i in range(1, 31)])
+    assert bucket.waited == pytest.approx(sum(i / 100 for i in range(1, 31)))
+
+
+def test_token_bucket_refills_up_to_the_burst(clock):
+    clock.advance = True
+    bucket = TokenBucket(rate=2, burst=2)
+
+    for _ in range(4):
+        bucket.acquire()
+    clock.now += 10
+    for _ in range(3):
+        bucket.acquire()
+
+    assert clock.sleeps == pytest.approx([0.5, 0.5, 0.5])
+    assert bucket.waited == pytest.approx(1.5)
+
+
+def test_message_rate_limiter_only_waits_for_limited_actions(clock):
+    limiter = MessageRateLimiter({"tig": (1, 1)})
+
+    for _ in range(50):
+        limiter.wait("forge")
+    limiter.wait("tig")
+    assert clock.sleeps == []
+    limiter.wait("forge", "tig")
+    assert clock.sleeps == [1.0]
+
+    assert "tig messages limited to 1/s (burst 1), waited 1.0s" in limiter.summary()
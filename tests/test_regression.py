@@ -0,0 +1,72 @@
+import json
+
+from podaac.hitide_backfill_tool import regression
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def fake_github(files, requested):
+    def get(url, timeout=None):
+        requested.append(url)
+        if url == regression.CONFIG_FILES_URL:
+            return FakeResponse(json.dumps([
+                {"name": name, "type": "file", "sha": sha, "download_url": f"https://raw/{name}"}
+                for name, (sha, _) in files.items()
+            ]).encode())
+        return FakeResponse(files[url.rpartition("/")[2]][1])
+    return get
+
+
+def test_download_configs_only_downloads_changed_files(tmp_path, monkeypatch):
+    (tmp_path / "a.cfg").write_bytes(b'{"footprint": true}')
+    (tmp_path / "b.cfg").write_bytes(b'{"old": true}')
+    (tmp_path / "removed.cfg").write_bytes(b"{}")
+    files = {
+        "a.cfg": (regression.git_blob_sha(tmp_path / "a.cfg"), b'{"footprint": true}'),
+        "b.cfg": ("changed", b'{"imgVariables": []}'),
+        "c.cfg": ("new", b'{"footprint": false}'),
+    }
+    requested = []
+    monkeypatch.setattr(regression.requests, "get", fake_github(files, requested))
+
+    regression.download_configs(tmp_path)
+
+    assert sorted(requested) == sorted([regression.CONFIG_FILES_URL, "https://raw/b.cfg", "https://raw/c.cfg"])
+    assert sorted(path.name for path in tmp_path.glob("*.cfg")) == ["a.cfg", "b.cfg", "c.cfg"]
+    assert (tmp_path / "b.cfg").read_bytes() == b'{"imgVariables": []}'
+
+
+def test_parse_output_takes_the_final_counts():
+    output = "\n".join([
+        "Matching granules: 120", "Granules analyzed: 100", "5 footprint messages were sent",
+        "Matching granules: 120", "Granules analyzed: 120", "7 footprint messages were sent",
+        "0 image messages were sent", "Error: Could not process footprint for granule G1",
+    ])
+
+    assert regression.parse_output(output) == {
+        "matching_granules": 120, "granules_analyzed": 120, "footprint_messages_sent": 7,
+        "image_messages_sent": 0, "error": "Error: Could not process footprint for granule G1"
+    }
+    assert regression.parse_output("")["granules_analyzed"] is None
+
+
+def test_backfill_that_cannot_start_is_a_failed_collection(monkeypatch):
+    def missing_backfill(command, stderr=None):
+        raise FileNotFoundError(2, "No such file or directory", command[0])
+    monkeypatch.setattr(regression.subprocess, "check_output", missing_backfill)
+
+    output, result = regression.run_collection("MODIS_A-JPL-L2P-v2019.0", "backfill.yaml", "--footprint force")
+
+    assert output.startswith("Error running backfill for MODIS_A-JPL-L2P-v2019.0")
+    assert result["status"] == "failed"
+    assert result["error"] == output
+    assert result["granules_analyzed"] is None
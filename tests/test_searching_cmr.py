@@ -1,4 +1,8 @@
-from podaac.hitide_backfill_tool.cmr.search import GranuleSearch
+import pytest
+
+from podaac.hitide_backfill_tool.cmr.cmr_granule import CmrGranule
+from podaac.hitide_backfill_tool.cmr.search import GranuleSearch, ShardedGranuleSearch
+from tests.fake_cmr import FakeCmrSession, FakeResponse, make_umm_granule
 
 
 def test_granule_search_with_multiple_pages():
@@ -35,3 +39,186 @@ def test_granule_search_generator():
 
   assert granule_count == 6
 
+
+
+def fake_search(granule_count, **kwargs):
+  search = GranuleSearch(
+    base_url="https://cmr.uat.earthdata.nasa.gov",
+    collection_short_name="MODIS_A-JPL-L2P-v2019.0",
+    provider="pocloud",
+    **kwargs
+  )
+  search.session = FakeCmrSession([make_umm_granule(i) for i in range(granule_count)])
+  return search
+
+
+def test_granule_search_pages_offline():
+  search = fake_search(7, page_size=3, page_limit=None)
+
+  concept_ids = []
+  while search.get_next_page():
+    concept_ids += [granule["meta"]["concept-id"] for granule in search.granules()]
+
+  assert len(concept_ids) == 7
+  assert search.pages_loaded() == 3
+  assert search.total_matching_granules() == 7
+
+
+def test_granule_search_with_prefetch_returns_the_same_pages():
+  search = fake_search(7, page_size=3, page_limit=None, prefetch_pages=2)
+
+  concept_ids = []
+  while search.get_next_page():
+    concept_ids += [granule["meta"]["concept-id"] for granule in search.granules()]
+  search.close()
+
+  assert concept_ids == [make_umm_granule(i)["meta"]["concept-id"] for i in range(7)]
+  assert search.pages_loaded() == 3
+  assert [headers.get("cmr-search-after") for _, headers in search.session.requests] == [None, "3", "6"]
+
+
+def test_granule_search_with_prefetch_respects_page_limit():
+  search = fake_search(20, page_size=3, page_limit=2, prefetch_pages=5)
+
+  count = 0
+  while search.get_next_page():
+    count += len(search.granules())
+  search.close()
+
+  assert count == 6
+  assert len(search.session.requests) == 2
+
+
+def test_granule_search_streams_the_same_granules():
+  pytest.importorskip("ijson")
+  search = fake_search(7, page_size=3, page_limit=None, stream_pages=True)
+
+  granules = []
+  while search.get_next_page():
+    granules += list(search.granules())
+
+  assert granules == [make_umm_granule(i) for i in range(7)]
+  assert search.total_matching_granules() == 7
+  assert search.pages_loaded() == 3
+
+
+@pytest.mark.parametrize("stream_pages", [False, True])
+def test_granule_search_in_atom_format_returns_umm_granules(stream_pages):
+  if stream_pages:
+    pytest.importorskip("ijson")
+  search = fake_search(5, page_size=2, page_limit=None, result_format="atom", stream_pages=stream_pages)
+
+  granules = []
+  while search.get_next_page():
+    granules += [CmrGranule(granule) for granule in search.granules()]
+
+  assert "/search/granules.json?" in search.session.requests[0][0]
+  assert search.total_matching_granules() == 5
+  assert [granule.concept_id() for granule in granules] == [f"G{i:010d}-POCLOUD" for i in range(5)]
+  assert granules[0].native_id() == "granule-0"
+  assert granules[0].start_date() == "2002-07-04T00:00:00.000Z"
+  assert granules[0].s3_bucket_info()["key"] == "directory1/granule-0.nc"
+
+
+def test_granule_search_filters_browsable_granules_in_cmr():
+  search = fake_search(0, page_size=10, page_limit=None, browsable=False)
+  search.session.granules = [make_umm_granule(i, image=i % 4 != 0) for i in range(20)]
+
+  granules = []
+  while search.get_next_page():
+    granules += [CmrGranule(granule) for granule in search.granules()]
+
+  assert "&browsable=false" in search.session.requests[0][0]
+  assert [granule.concept_id() for granule in granules] == [f"G{i:010d}-POCLOUD" for i in range(0, 20, 4)]
+  assert search.pruned_granules() == 15
+  assert "browsable" not in search.session.requests[-1][0]
+  assert "page_size=0" in search.session.requests[-1][0]
+
+
+def test_granule_search_without_filter_prunes_nothing():
+  search = fake_search(3, page_size=10, page_limit=None)
+  search.get_next_page()
+
+  assert search.pruned_granules() == 0
+  assert "browsable" not in search.session.requests[0][0]
+
+
+def test_granule_list_is_looked_up_in_batches():
+  search = fake_search(30, page_size=4, lookup_batch_size=10)
+  granule_list = ([f"G{i:010d}-POCLOUD" for i in range(0, 15)] + ["G9999999999-POCLOUD"] +
+                  [f"granule-{i}" for i in range(15, 30)] + ["missing-granule"])
+
+  granules = search.get_granules_in_list(granule_list)
+
+  assert [granule["meta"]["concept-id"] for granule in granules] == [f"G{i:010d}-POCLOUD" for i in range(30)]
+  assert search.granules_not_found() == ["G9999999999-POCLOUD", "missing-granule"]
+  # 4 batches of up to 10 entries (the second split into concept ids and granule URs), with up
+  # to 10 results paged 4 at a time: 3 + (2 + 1) + 3 + 1 requests
+  assert all(url.endswith("/search/granules.umm_json") for url, _, _ in search.session.requests)
+  assert len(search.session.requests) == 10
+
+
+def test_granule_search_reports_bad_json():
+  search = fake_search(3, page_size=3, page_limit=None)
+  search.session.get = lambda url, headers=None, stream=False: FakeResponse({"hits": 3})
+
+  with pytest.raises(Exception, match="CMR error"):
+    search.get_next_page()
+
+
+def hourly_granules(count):
+  # each granule lasts 90 minutes, so granules overlap the shard boundaries
+  return [make_umm_granule(i, f"2002-07-04T{i:02d}:00:00.000Z", f"2002-07-04T{i:02d}:30:00.000Z"
+                           if i == count - 1 else f"2002-07-04T{i + 1:02d}:30:00.000Z")
+          for i in range(count)]
+
+
+def fake_sharded_search(shards, granules, page_limit=None, **kwargs):
+  search = ShardedGranuleSearch.create(
+    shards,
+    base_url="https://cmr.uat.earthdata.nasa.gov",
+    collection_short_name="MODIS_A-JPL-L2P-v2019.0",
+    start_date="2002-07-04T00:00:00Z",
+    end_date="2002-07-04T12:00:00Z",
+    page_size=2,
+    page_limit=page_limit,
+    **kwargs
+  )
+  for shard, _ in search._shards:
+    shard.session = FakeCmrSession(granules)
+  return search
+
+
+def test_sharded_search_returns_each_granule_once():
+  search = fake_sharded_search(3, hourly_granules(12))
+
+  concept_ids = []
+  while search.get_next_page():
+    concept_ids += [granule["meta"]["concept-id"] for granule in search.granules()]
+  search.close()
+
+  assert sorted(concept_ids) == [make_umm_granule(i)["meta"]["concept-id"] for i in range(12)]
+  assert search.is_done()
+
+
+def test_sharded_search_page_limit_applies_to_all_shards():
+  search = fake_sharded_search(3, hourly_granules(12), page_limit=4)
+
+  while search.get_next_page():
+    pass
+  search.close()
+
+  assert sum(shard.pages_loaded() for shard, _ in search._shards) == 4
+  assert search.pages_loaded() <= 4
+  assert search.is_done()
+
+
+def test_sharded_search_splits_by_cycle():
+  search = ShardedGranuleSearch.create(
+    2,
+    base_url="https://cmr.uat.earthdata.nasa.gov",
+    collection_short_name="SWOT",
+    cycles="[1, 2, 3]"
+  )
+
+  assert [shard.cycles for shard, _ in search._shards] == ["1", "2", "3"]
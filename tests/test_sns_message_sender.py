@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import time
+import boto3
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from moto import mock_aws
+from moto.core import DEFAULT_ACCOUNT_ID
+from moto.sns import sns_backends
+from podaac.hitide_backfill_tool.sns_message_sender import SnsMessageSender
+
+
+@pytest.fixture(scope='function')
+def sns_topic():
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-west-2'
+    with mock_aws():
+        topic_arn = boto3.client('sns').create_topic(Name="test")['TopicArn']
+        yield sns_backends[DEFAULT_ACCOUNT_ID]["us-west-2"].topics[topic_arn]
+
+
+def test_batched_sender_publishes_every_message(sns_topic):
+    sender = SnsMessageSender(sns_topic.arn, logging.getLogger("test"), None, batch=True, flush_interval=60)
+    publish_batch = sender.client.publish_batch
+    calls = []
+
+    def counting_publish_batch(**kwargs):
+        calls.append(len(kwargs["PublishBatchRequestEntries"]))
+        return publish_batch(**kwargs)
+    sender.client.publish_batch = counting_publish_batch
+
+    for index in range(25):
+        sender.send(json.dumps({"index": index}))
+    sender.close()
+
+    assert calls == [10, 10, 5]
+    assert sender.messages_sent == 25
+    assert sorted(json.loads(n[1])["index"] for n in sns_topic.sent_notifications) == list(range(25))
+
+
+def test_batched_sender_flushes_on_interval(sns_topic):
+    sender = SnsMessageSender(sns_topic.arn, logging.getLogger("test"), None, batch=True, flush_interval=0.1)
+
+    for index in range(3):
+        sender.send(json.dumps({"index": index}))
+    time.sleep(0.5)
+
+    assert len(sns_topic.sent_notifications) == 3
+    sender.close()
+
+
+def test_batched_sender_keeps_flushing_after_an_unexpected_error(sns_topic, caplog):
+    sender = SnsMessageSender(sns_topic.arn, logging.getLogger("test"), None, batch=True, flush_interval=0.1)
+    publish_batch = sender.client.publish_batch
+    calls = []
+
+    def disconnected_publish_batch(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise EndpointConnectionError(endpoint_url="https://sns.us-west-2.amazonaws.com")
+        return publish_batch(**kwargs)
+    sender.client.publish_batch = disconnected_publish_batch
+
+    sender.send(json.dumps({"index": 0}))
+    time.sleep(0.5)
+    sender.send(json.dumps({"index": 1}))
+    time.sleep(0.5)
+
+    assert sender.flush_thread.is_alive()
+    assert [json.loads(n[1])["index"] for n in sns_topic.sent_notifications] == [1]
+    assert "Could not connect to the endpoint URL" in caplog.text
+    sender.close()
+
+
+def test_batched_sender_retries_failed_entries(sns_topic):
+    sender = SnsMessageSender(sns_topic.arn, logging.getLogger("test"), None, batch=True, flush_interval=60)
+    publish_batch = sender.client.publish_batch
+    attempts = []
+
+    def flaky_publish_batch(**kwargs):
+        entries = kwargs["PublishBatchRequestEntries"]
+        attempts.append([entry["Id"] for entry in entries])
+        if len(attempts) > 1:
+            return publish_batch(**kwargs)
+        response = publish_batch(TopicArn=kwargs["TopicArn"], PublishBatchRequestEntries=entries[:2])
+        response["Failed"] = [
+            {"Id": entries[2]["Id"], "Code": "InternalError", "SenderFault": False},
+            {"Id": entries[3]["Id"], "Code": "InvalidParameter", "SenderFault": True},
+        ]
+        return response
+    sender.client.publish_batch = flaky_publish_batch
+
+    for index in range(4):
+        sender.send(json.dumps({"index": index}))
+    sender.close()
+
+    assert attempts == [["0", "1", "2", "3"], ["2"]]
+    assert sender.messages_sent == 3
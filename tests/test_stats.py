@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+from podaac.hitide_backfill_tool.stats import BackfillStats
+
+
+def test_counts_from_many_threads_are_merged():
+    stats = BackfillStats()
+
+    def work(index):
+        stats.increment("granules_analyzed")
+        stats.increment_monthly(f"2002-0{index % 2 + 1}", "granules")
+        stats.add_granule_range(f"2002-01-01T00:00:{index:02d}Z", f"2002-02-01T00:00:{index:02d}Z")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(work, range(50)))
+
+    assert stats.get("granules_analyzed") == 50
+    assert stats.monthly().get("2002-01", "granules") == 25
+    assert stats.monthly().get("2002-02", "granules") == 25
+    assert stats.granule_range() == ("2002-01-01T00:00:00Z", "2002-02-01T00:00:49Z")
+
+
+def test_snapshot_can_be_restored():
+    stats = BackfillStats()
+    stats.increment("footprint_messages_sent", 3)
+    stats.increment_monthly("2002-07", "needs_footprint", 3)
+
+    restored = BackfillStats()
+    restored.restore(stats.snapshot())
+    restored.increment("footprint_messages_sent")
+
+    assert restored.get("footprint_messages_sent") == 4
+    assert restored.monthly().get("2002-07", "needs_footprint") == 3
+
+
+def test_concept_ids_are_capped():
+    stats = BackfillStats()
+    for index in range(150):
+        stats.add_concept_id("needing_image", f"G{index}")
+
+    assert len(stats.concept_ids("needing_image")) == 100